@@ -282,7 +282,7 @@ elif [ "$1" = "healthcheck" ]; then
 import requests
 import sys
 try:
-    response = requests.get('http://localhost:${SERVER_PORT:-8089}/health', timeout=10)
+    response = requests.get('http://localhost:${SERVER_PORT:-8089}/health/live', timeout=5)
     if response.status_code == 200:
         print('✅ 健康檢查通過')
         sys.exit(0)
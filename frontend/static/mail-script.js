@@ -69,13 +69,37 @@ function bindEvents() {
     });
 }
 
+// 以 ETag 重新驗證：報告未更新時伺服器返回 304，沿用上次的結果
+const etagCache = new Map();
+
+async function fetchWithETag(url) {
+    const cached = etagCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(url, { headers, cache: 'no-store' });
+
+    if (response.status === 304 && cached) {
+        return { response, result: cached.result, notModified: true };
+    }
+
+    const result = await response.json();
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        etagCache.set(url, { etag, result });
+    }
+    return { response, result, notModified: false };
+}
+
 // 載入市場數據
 async function loadMarketData() {
     try {
         updateStatus('loading', '載入市場數據...');
 
-        const response = await fetch('/api/current-data');
-        const result = await response.json();
+        const { result, notModified } = await fetchWithETag('/api/current-data');
+
+        if (notModified && currentMarketData) {
+            updateStatus('connected', '數據已更新');
+            return;
+        }
 
         if (result.data && Object.keys(result.data).length > 0) {
             currentMarketData = result.data;
@@ -347,12 +371,28 @@ async function handleSubmit(e) {
 
         const result = await response.json();
 
-        if (response.ok) {
+        if (response.status === 202) {
+            // 已排入發送佇列，追蹤投遞結果
+            const job = await waitForMailJob(result.status_url);
+            if (job.status === 'delivered') {
+                showModal('success', '發送成功',
+                    `郵件已成功發送至 ${formData.get('recipient')}`,
+                    `發送時間: ${job.delivered_at}`);
+            } else if (job.status === 'dead') {
+                showModal('error', '發送失敗',
+                    `多次重試後仍無法發送至 N8N：${job.last_error || '未知錯誤'}`,
+                    `工作 ID: ${result.job_id}`);
+            } else {
+                showModal('success', '已排入發送佇列',
+                    `N8N 暫時無法回應，系統將自動重試發送至 ${formData.get('recipient')}`,
+                    `工作 ID: ${result.job_id}`);
+            }
+        } else if (response.ok) {
             showModal('success', '發送成功',
                 `郵件已成功發送至 ${formData.get('recipient')}`,
                 `發送時間: ${result.sent_time}`);
         } else {
-            throw new Error(result.detail || '發送失敗');
+            throw new Error(result.message || result.detail || '發送失敗');
         }
 
     } catch (error) {
@@ -371,6 +411,27 @@ async function handleSubmit(e) {
     }
 }
 
+// 輪詢郵件投遞狀態，直到送達、失敗或逾時
+async function waitForMailJob(statusUrl, timeoutMs = 20000, intervalMs = 1000) {
+    const deadline = Date.now() + timeoutMs;
+    let job = { status: 'queued' };
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        try {
+            const response = await fetch(statusUrl);
+            if (response.ok) {
+                job = (await response.json()).job;
+                if (job.status === 'delivered' || job.status === 'dead') {
+                    break;
+                }
+            }
+        } catch (error) {
+            console.warn('查詢郵件狀態失敗:', error);
+        }
+    }
+    return job;
+}
+
 // 輔助函數
 function updateStatus(status, text) {
     const dot = document.querySelector('#status-indicator .indicator-dot');
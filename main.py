@@ -11,43 +11,91 @@
 
 import os
 import sys
+import io
+import csv
 import json
+import time
+import uuid
+import random
+import sqlite3
+import gzip
+import queue
+import shutil
+import atexit
+import mimetypes
+import hashlib
 import logging
+import logging.handlers
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial, wraps
+from urllib.parse import urlparse
 
 # 第三方套件
 try:
     from fastapi import FastAPI, Request, HTTPException
-    from fastapi.responses import JSONResponse, HTMLResponse
+    from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, Response
+    from fastapi.routing import APIRoute
+    from fastapi.datastructures import DefaultPlaceholder
     from fastapi.staticfiles import StaticFiles
+    from starlette.datastructures import Headers, MutableHeaders
+    from starlette.responses import FileResponse
     from fastapi.middleware.cors import CORSMiddleware
-    from pydantic import BaseModel, EmailStr, field_validator
+    from pydantic import BaseModel, EmailStr, TypeAdapter, ValidationError, field_validator
     import uvicorn
-    import requests
+    import httpx
     import yfinance as yf
     import pandas as pd
     import numpy as np
+    import orjson
 except ImportError as e:
     print(f"❌ 缺少必要的套件: {e}")
     print("請執行: pip install -r requirements.txt")
     sys.exit(1)
 
-# 設定日誌 - 增強版本
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('logs/market_analysis.log', encoding='utf-8')
-    ]
-)
+# 選用套件 - 安裝 h2 時對外連線使用 HTTP/2
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 選用套件 - 安裝 brotli 時回應壓縮優先使用 br
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# 選用套件 - 安裝 redis 時可使用 Redis 協定的共享狀態後端
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# 平台相依 - fcntl 只在 POSIX 系統提供，用於多 worker 行程之間的檔案鎖
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# 日誌 - 處理器在 setup_logging() 設定（背景執行緒寫入）
 logger = logging.getLogger(__name__)
+# 高頻路徑使用獨立的 logger，可個別限制輸出頻率（名稱固定，不受以腳本或模組執行影響）
+indicator_logger = logging.getLogger("market_analysis.indicators")
+market_logger = logging.getLogger("market_analysis.market_data")
+ingestion_logger = logging.getLogger("market_analysis.ingestion")
 
 # 確保目錄存在
-Path("logs").mkdir(exist_ok=True)
 Path("data").mkdir(exist_ok=True)
 Path("frontend/static").mkdir(parents=True, exist_ok=True)
 
@@ -58,7 +106,21 @@ def load_config():
         'SERVER_CONFIG': {
             'host': os.getenv('SERVER_HOST', '0.0.0.0'),
             'port': int(os.getenv('SERVER_PORT', 8089)),
-            'debug': os.getenv('DEBUG', 'False').lower() == 'true'
+            'debug': os.getenv('DEBUG', 'False').lower() == 'true',
+            # uvicorn worker 行程數；大於 1 時需使用共享狀態後端 (STATE_BACKEND=sqlite 或 redis)
+            'workers': max(1, int(os.getenv('WORKERS', 1)))
+        },
+        'STATE_CONFIG': {
+            # 最新報告、系統計數器與市場數據快取的存放位置: memory（單一行程）、sqlite（同一主機多 worker）、
+            # redis（多主機，需安裝 redis 套件，可指向任何相容 Redis 協定的服務）
+            'backend': os.getenv('STATE_BACKEND', 'memory').lower(),
+            'sqlite_path': os.path.join(os.getenv('DATA_DIR', 'data'), 'state.db'),
+            'redis_url': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+            'key_prefix': os.getenv('STATE_KEY_PREFIX', 'market_analysis:'),
+            # 計數器增量寫回與其他 worker 新報告的檢查間隔
+            'sync_interval': float(os.getenv('STATE_SYNC_INTERVAL', 1)),
+            # 跨 worker 下載鎖的最長持有時間，持有者逾時未完成時其他 worker 自行下載
+            'lock_ttl': float(os.getenv('STATE_LOCK_TTL', 30))
         },
         'WEBHOOK_CONFIG': {
             'send_url': os.getenv(
@@ -68,6 +130,137 @@ def load_config():
             'n8n_webhook_url': 'https://beloved-swine-sensibly.ngrok-free.app/webhook/Webhook_Preview',
             'timeout': int(os.getenv('WEBHOOK_TIMEOUT', 30))
         },
+        'INGESTION_CONFIG': {
+            # N8N 資料接收 - 讀取時即檢查大小上限
+            'max_body_bytes': int(os.getenv('N8N_MAX_BODY_BYTES', 20 * 1024 * 1024)),
+            # DEBUG 詳細日誌每 N 份報告輸出一次
+            'log_sample_every': max(1, int(os.getenv('N8N_LOG_SAMPLE_EVERY', 10))),
+            # 回應是否包含完整資料（含大型 HTML 報告），關閉時只回傳摘要欄位
+            'echo_data': os.getenv('N8N_INGEST_ECHO', 'True').lower() == 'true'
+        },
+        'REPORT_HISTORY_CONFIG': {
+            # 每份 N8N 報告保存到 SQLite，供 /api/reports 查詢歷史
+            'enabled': os.getenv('REPORT_HISTORY_ENABLED', 'True').lower() == 'true',
+            'db_path': os.path.join(os.getenv('DATA_DIR', 'data'), 'reports.db'),
+            'max_page_size': int(os.getenv('REPORT_PAGE_MAX', 200))
+        },
+        'MAIL_QUEUE_CONFIG': {
+            # 郵件發送佇列 (SQLite) - 請求只負責排入佇列，背景 worker 以指數退避重試投遞到 N8N
+            'db_path': os.path.join(os.getenv('DATA_DIR', 'data'), 'mail_jobs.db'),
+            'concurrency': int(os.getenv('MAIL_QUEUE_CONCURRENCY', 2)),
+            'max_attempts': int(os.getenv('MAIL_MAX_ATTEMPTS', 6)),
+            'retry_base': float(os.getenv('MAIL_RETRY_BASE', 2)),
+            'retry_max': float(os.getenv('MAIL_RETRY_MAX', 300)),
+            # 待投遞數量上限，超過時返回 503 (backpressure)
+            'max_pending': int(os.getenv('MAIL_QUEUE_MAX_PENDING', 1000)),
+            'poll_interval': float(os.getenv('MAIL_QUEUE_POLL_INTERVAL', 1)),
+            # sending 狀態的租約（秒），須大於 webhook 逾時；超過時視為投遞中的 worker 已中斷並重新排入
+            'sending_lease': float(os.getenv('MAIL_SENDING_LEASE', 300))
+        },
+        'MAIL_BULK_CONFIG': {
+            # 批次發送 - 同時進行的 webhook 呼叫數、單次呼叫收件人上限與總收件人上限
+            'concurrency': int(os.getenv('MAIL_BULK_CONCURRENCY', 8)),
+            'max_batch_size': int(os.getenv('MAIL_BULK_MAX_BATCH_SIZE', 100)),
+            'max_recipients': int(os.getenv('MAIL_BULK_MAX_RECIPIENTS', 10000))
+        },
+        'HTTP_CLIENT_CONFIG': {
+            # 對外 HTTP 連線池 - 所有 N8N 呼叫共用同一個 keep-alive 連線池
+            'max_connections': int(os.getenv('HTTP_MAX_CONNECTIONS', 20)),
+            'max_keepalive_connections': int(os.getenv('HTTP_MAX_KEEPALIVE', 10)),
+            'keepalive_expiry': float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30)),
+            # 需安裝 h2 套件才會啟用
+            'http2': os.getenv('HTTP2_ENABLED', 'True').lower() == 'true'
+        },
+        'STREAM_CONFIG': {
+            # /api/stream 伺服器推送 (SSE) - 每個訂閱者的待送事件上限，塞滿時丟棄積壓並要求客戶端重新同步
+            'queue_size': int(os.getenv('STREAM_QUEUE_SIZE', 32)),
+            'max_subscribers': int(os.getenv('STREAM_MAX_SUBSCRIBERS', 1000)),
+            # 無事件時的心跳間隔，避免代理伺服器關閉閒置連線
+            'heartbeat_seconds': float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15)),
+            # 斷線後瀏覽器重新連線的等待時間 (ms)
+            'retry_ms': int(os.getenv('STREAM_RETRY_MS', 3000))
+        },
+        'COMPRESSION_CONFIG': {
+            # 動態回應依 Accept-Encoding 壓縮（br 需安裝 brotli 套件，否則 gzip），小於門檻不壓縮
+            'enabled': os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true',
+            'minimum_size': int(os.getenv('COMPRESSION_MIN_SIZE', 1024)),
+            'gzip_level': int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),
+            'brotli_quality': int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5)),
+            # 靜態檔案啟動時以最高壓縮率預先壓縮一次，存放於 CACHE_DIR/static
+            'static_precompress': os.getenv('STATIC_PRECOMPRESS', 'True').lower() == 'true',
+            'static_cache_dir': os.path.join(os.getenv('CACHE_DIR', 'cache'), 'static')
+        },
+        'PAGE_CACHE_CONFIG': {
+            # 首頁與郵件頁面啟動時載入記憶體並預先壓縮；開發模式下每次請求檢查檔案修改時間並重新載入
+            'watch': os.getenv('PAGE_CACHE_WATCH', os.getenv('DEBUG', 'False')).lower() == 'true'
+        },
+        'MARKET_DATA_CONFIG': {
+            # 同一 (symbol, period, interval) 在 TTL 內共用一次上游下載
+            'cache_ttl': float(os.getenv('MARKET_CACHE_TTL', 60)),
+            # 市場資訊 (.info) 幾乎不變，使用較長的 TTL
+            'info_cache_ttl': float(os.getenv('MARKET_INFO_CACHE_TTL', 3600)),
+            # 本地K線儲存 - 重啟後保留歷史，上游只下載最後一筆之後的新K線
+            'store_enabled': os.getenv('MARKET_STORE_ENABLED', 'True').lower() == 'true',
+            'store_dir': os.path.join(os.getenv('DATA_DIR', 'data'), 'bars'),
+            # 背景排程追蹤的商品（逗號分隔，可使用代號或別名），同一批次下載
+            'symbols': [
+                symbol.strip() for symbol in os.getenv('MARKET_SYMBOLS', 'GC=F,SI=F,DX-Y.NYB,^TNX').split(',')
+                if symbol.strip()
+            ]
+        },
+        'MARKET_REFRESH_CONFIG': {
+            # 背景排程定期刷新所有支援的 period/interval，請求只讀取記憶體快照
+            'enabled': os.getenv('MARKET_REFRESH_ENABLED', 'True').lower() == 'true',
+            'interval': float(os.getenv('MARKET_REFRESH_INTERVAL', 60)),
+            'concurrency': int(os.getenv('MARKET_REFRESH_CONCURRENCY', 4)),
+            # 未被背景追蹤、依請求即時計算的快照（其他商品或 period/interval）最多保留的組合數 (LRU)
+            'max_on_demand': int(os.getenv('MARKET_REFRESH_MAX_ON_DEMAND', 64)),
+            # 啟動後背景預熱的常用期間（日線），完成前 readiness 為 warming
+            'warmup_periods': [
+                period.strip() for period in os.getenv('MARKET_WARMUP_PERIODS', '1y,6mo,1mo').split(',')
+                if period.strip()
+            ],
+            'warmup_timeout': float(os.getenv('MARKET_WARMUP_TIMEOUT', 120))
+        },
+        'INDICATOR_CONFIG': {
+            # RSI 副圖輸出的週期，例如 "7,14,21"
+            'rsi_periods': tuple(
+                int(period) for period in os.getenv('RSI_PERIODS', '7,14,21').split(',') if period.strip()
+            )
+        },
+        'EXECUTOR_CONFIG': {
+            # 網路 I/O (yfinance 下載) 執行緒池大小
+            'io_workers': int(os.getenv('IO_WORKERS', 8)),
+            # 指標計算 process pool 大小，0 表示不啟用（改用 I/O 執行緒池）
+            'cpu_workers': int(os.getenv('CPU_WORKERS', 0))
+        },
+        'HEALTH_CONFIG': {
+            # 依賴服務 (Yahoo Finance、N8N) 的背景探測間隔與逾時，/health 只讀取快取結果
+            'probe_interval': float(os.getenv('HEALTH_PROBE_INTERVAL', 60)),
+            'probe_timeout': float(os.getenv('HEALTH_PROBE_TIMEOUT', 10))
+        },
+        'LOGGING_CONFIG': {
+            'level': os.getenv('LOG_LEVEL', 'INFO').upper(),
+            'file': os.getenv('LOG_FILE', 'logs/market_analysis.log'),
+            # 檔案超過大小或跨日時輪替並以 gzip 壓縮
+            'max_bytes': int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            'backup_count': int(os.getenv('LOG_BACKUP_COUNT', 14)),
+            'rotate_daily': os.getenv('LOG_ROTATE_DAILY', 'True').lower() == 'true',
+            # 各 logger 每秒最多輸出的筆數（ERROR 以上不限制，設定同時套用到子 logger）
+            'rate_limits': {
+                name.strip(): float(rate)
+                for name, rate in (
+                    item.split('=', 1) for item in os.getenv(
+                        'LOG_RATE_LIMITS',
+                        'market_analysis.indicators=2,market_analysis.market_data=5,market_analysis.ingestion=10'
+                    ).split(',') if '=' in item
+                )
+            },
+            # 允許的瞬間突發量（秒數 × 速率）
+            'rate_burst_seconds': float(os.getenv('LOG_RATE_BURST_SECONDS', 10)),
+            # 多 worker 時各行程寫入自己的日誌檔，避免多個行程輪替與刪除同一個檔案
+            'per_worker_files': max(1, int(os.getenv('WORKERS', 1))) > 1
+        },
         'SYSTEM_INFO': {
             'name': 'Market Analysis API',
             'version': '2.2.0',
@@ -79,15 +272,258 @@ def load_config():
 CONFIG = load_config()
 
 
+# 日誌管線
+class RateLimitFilter(logging.Filter):
+    """依 logger 名稱的 token bucket 限流 - 超過速率的 ERROR 以下紀錄直接丟棄，下一筆放行的紀錄附上略過數量
+
+    設定的名稱同時套用到子 logger（例如 market_analysis 涵蓋 market_analysis.indicators）。
+    """
+
+    def __init__(self, rate_limits: Dict[str, float], burst_seconds: float):
+        super().__init__()
+        self.rate_limits = rate_limits
+        self.burst_seconds = burst_seconds
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def _limit_for(self, name: str) -> Optional[tuple]:
+        while name:
+            if name in self.rate_limits:
+                return name, self.rate_limits[name]
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        limit = self._limit_for(record.name)
+        if limit is None:
+            return True
+
+        name, rate = limit
+        capacity = max(1.0, rate * self.burst_seconds)
+        now = time.monotonic()
+        with self._lock:
+            # bucket: [可用 tokens, 上次補充時間, 已略過筆數]
+            bucket = self._buckets.setdefault(name, [capacity, now, 0])
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] -= 1
+            skipped, bucket[2] = bucket[2], 0
+
+        if skipped:
+            record.msg = f"{record.getMessage()} （已略過 {skipped} 則 {name} 日誌）"
+            record.args = None
+        return True
+
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """依大小或每日輪替的日誌檔 - 舊檔以 gzip 壓縮為 .1.gz、.2.gz …"""
+
+    def __init__(self, filename, max_bytes: int, backup_count: int, rotate_daily: bool):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.rotate_daily = rotate_daily
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+        self._next_rollover = self._next_midnight()
+
+    @staticmethod
+    def _next_midnight() -> float:
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.rotate_daily and time.time() >= self._next_rollover:
+            self._next_rollover = self._next_midnight()
+            # 空檔案不需要輪替
+            return os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0
+        return False
+
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_log_rate_filter: Optional[RateLimitFilter] = None
+_log_worker_file: Optional[str] = None
+_log_worker_slot = None
+
+
+def worker_log_file(filename: str) -> str:
+    """本行程的日誌檔名 - 以 flock 取得第一個空閒的編號 (xxx.worker0.log …)，重啟後沿用相同檔名
+
+    編號鎖在行程結束前持續持有；不支援 flock 的平台以 pid 區分。
+    """
+    global _log_worker_file, _log_worker_slot
+    if _log_worker_file is not None:
+        return _log_worker_file
+    base, ext = os.path.splitext(filename)
+    if not FCNTL_AVAILABLE:
+        _log_worker_file = f"{base}.{os.getpid()}{ext}"
+        return _log_worker_file
+
+    slot = 0
+    while True:
+        slot_lock = open(f"{base}.worker{slot}.lock", 'a+b')
+        try:
+            fcntl.flock(slot_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            slot_lock.close()
+            slot += 1
+            continue
+        _log_worker_slot = slot_lock
+        _log_worker_file = f"{base}.worker{slot}{ext}"
+        return _log_worker_file
+
+
+def setup_logging(config: Dict[str, Any]):
+    """設定非同步日誌 - 呼叫端只把紀錄放入佇列，格式化與寫檔在 QueueListener 的背景執行緒進行"""
+    global _log_listener, _log_rate_filter
+    Path(config['file']).parent.mkdir(parents=True, exist_ok=True)
+    log_file = worker_log_file(config['file']) if config.get('per_worker_files') else config['file']
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stream_handler = logging.StreamHandler(sys.stdout)
+    file_handler = CompressedRotatingFileHandler(
+        log_file, config['max_bytes'], config['backup_count'], config['rotate_daily']
+    )
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    _log_rate_filter = RateLimitFilter(config['rate_limits'], config['rate_burst_seconds'])
+    queue_handler.addFilter(_log_rate_filter)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config['level'])
+
+    if _log_listener is not None:
+        _log_listener.stop()
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, file_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+
+
+def shutdown_logging():
+    """停止背景寫入執行緒並寫完佇列中剩餘的紀錄"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    return {
+        "file": CONFIG['LOGGING_CONFIG']['file'],
+        "rate_limits": CONFIG['LOGGING_CONFIG']['rate_limits'],
+        "suppressed": _log_rate_filter.suppressed if _log_rate_filter is not None else 0
+    }
+
+
+setup_logging(CONFIG['LOGGING_CONFIG'])
+atexit.register(shutdown_logging)
+
+# 黃金價格 API 支援的參數
+SUPPORTED_PERIODS = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y"]
+SUPPORTED_INTERVALS = ["1m", "5m", "15m", "30m", "1h", "1d"]
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 30, '3mo': 90,
+    '6mo': 180, '1y': 365, '2y': 730, '5y': 1825
+}
+# Yahoo Finance 分鐘/小時級數據可回溯的最長天數
+INTERVAL_MAX_DAYS = {'1m': 7, '5m': 60, '15m': 60, '30m': 60, '1h': 730}
+
+# 支援的商品 - 報價單位、交易所時區與別名
+DEFAULT_SYMBOL = "GC=F"
+SYMBOL_REGISTRY = {
+    'GC=F': {'name': 'Gold Futures (GC=F)', 'aliases': ['gold', 'xau'], 'currency': 'USD',
+             'unit': 'per ounce', 'timezone': 'America/New_York'},
+    'SI=F': {'name': 'Silver Futures (SI=F)', 'aliases': ['silver', 'xag'], 'currency': 'USD',
+             'unit': 'per ounce', 'timezone': 'America/New_York'},
+    'DX-Y.NYB': {'name': 'US Dollar Index (DXY)', 'aliases': ['dxy', 'usd'], 'currency': 'USD',
+                 'unit': 'index', 'timezone': 'America/New_York'},
+    '^TNX': {'name': 'US 10-Year Treasury Yield', 'aliases': ['us10y', 'tnx'], 'currency': 'USD',
+             'unit': 'percent', 'timezone': 'America/Chicago'},
+    '^FVX': {'name': 'US 5-Year Treasury Yield', 'aliases': ['us5y', 'fvx'], 'currency': 'USD',
+             'unit': 'percent', 'timezone': 'America/Chicago'},
+    'EURUSD=X': {'name': 'EUR/USD', 'aliases': ['eurusd'], 'currency': 'USD',
+                 'unit': 'per euro', 'timezone': 'Europe/London'},
+    'JPY=X': {'name': 'USD/JPY', 'aliases': ['usdjpy'], 'currency': 'JPY',
+              'unit': 'per dollar', 'timezone': 'Europe/London'},
+    'TWD=X': {'name': 'USD/TWD', 'aliases': ['usdtwd'], 'currency': 'TWD',
+              'unit': 'per dollar', 'timezone': 'Europe/London'},
+}
+SYMBOL_ALIASES = {
+    alias: symbol
+    for symbol, meta in SYMBOL_REGISTRY.items()
+    for alias in [symbol.lower()] + meta['aliases']
+}
+
+
+def resolve_symbol(value: str) -> Optional[str]:
+    """將代號或別名解析為登錄的商品代號，不支援時返回 None"""
+    return SYMBOL_ALIASES.get(value.strip().lower()) if value else None
+
+
+def get_tracked_symbols():
+    """背景排程追蹤的商品 - 一定包含預設的黃金期貨"""
+    symbols = [DEFAULT_SYMBOL]
+    for value in CONFIG['MARKET_DATA_CONFIG']['symbols']:
+        symbol = resolve_symbol(value)
+        if symbol is None:
+            logger.warning(f"⚠️ 忽略不支援的商品: {value}")
+        elif symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+
+def get_refresh_combinations():
+    """列出背景刷新的 (period, interval) 組合 - 排除 Yahoo Finance 不提供的範圍"""
+    return [
+        (period, interval)
+        for interval in SUPPORTED_INTERVALS
+        for period in SUPPORTED_PERIODS
+        if PERIOD_DAYS[period] <= INTERVAL_MAX_DAYS.get(interval, PERIOD_DAYS[period])
+    ]
+
+
 # 資料模型 - 修正版本
 class N8NDataExtended(BaseModel):
-    positive: int
-    neutral: int
-    negative: int
-    summary: str
-    score: int
-    label: str
-    emailReportHtml: str
+    positive: int = 0
+    neutral: int = 0
+    negative: int = 0
+    summary: str = ""
+    score: int = 0
+    label: str = ""
+    emailReportHtml: str = ""
+
+    @field_validator('positive', 'neutral', 'negative', 'score', mode='before')
+    @classmethod
+    def coerce_int_fields(cls, v):
+        """安全地轉換為整數 - 無法轉換時使用 0"""
+        try:
+            if v is None:
+                return 0
+            return int(float(v))
+        except (ValueError, TypeError):
+            return 0
 
     @field_validator('score')
     @classmethod
@@ -109,7 +545,7 @@ class N8NDataExtended(BaseModel):
             raise ValueError('情感數量不能為負數')
         return int(v)
 
-    @field_validator('summary', 'label', 'emailReportHtml')
+    @field_validator('summary', 'label', 'emailReportHtml', mode='before')
     @classmethod
     def validate_text_fields(cls, v):
         """驗證文字欄位"""
@@ -118,8 +554,7 @@ class N8NDataExtended(BaseModel):
         return str(v).strip()
 
 
-class MailSenderRequest(BaseModel):
-    recipient_email: EmailStr
+class MailOptions(BaseModel):
     sender_name: Optional[str] = "市場分析系統"
     subject: Optional[str] = "市場分析報告"
     priority: Optional[str] = "normal"
@@ -130,6 +565,1335 @@ class MailSenderRequest(BaseModel):
     include_risk_warning: bool = False
 
 
+class MailSenderRequest(MailOptions):
+    recipient_email: EmailStr
+
+
+class BulkMailRequest(MailOptions):
+    """批次發送 - recipients 與 recipients_csv (CSV 文字，每列第一個含 @ 的欄位) 可同時提供"""
+    recipients: List[str] = []
+    recipients_csv: Optional[str] = None
+    # 每次 webhook 呼叫包含的收件人數，1 表示每位收件人各一封
+    batch_size: int = 1
+    concurrency: Optional[int] = None
+
+
+# 市場數據快取
+# 共享狀態後端
+class MemoryStateBackend:
+    """單一行程的記憶體狀態（預設）- 多 worker 時每個 worker 各有一份"""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._values: Dict[str, tuple] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None or (entry[0] is not None and entry[0] <= time.time()):
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._values[key] = (time.time() + ttl if ttl else None, value)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """key 不存在（或已過期）時才寫入，返回是否寫入"""
+        with self._lock:
+            if self.get(key) is not None:
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key: str):
+        self._values.pop(key, None)
+
+    def incr(self, amounts: Dict[str, int]) -> Dict[str, int]:
+        """遞增多個計數器並返回遞增後的值（遞增 0 即讀取目前值）"""
+        with self._lock:
+            for name, amount in amounts.items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+            return {name: self._counters[name] for name in amounts}
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, (expires_at, _) in self._values.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            self._values.pop(key, None)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"keys": len(self._values), "counters": len(self._counters)}
+
+    def close(self):
+        pass
+
+
+class SQLiteStateBackend:
+    """SQLite 共享狀態 - 同一主機的多個 worker 共用同一個資料庫檔案（WAL），寫入由 SQLite 跨行程鎖序列化"""
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS state_values (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS state_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM state_values WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO state_values (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()]
+            )
+            conn.commit()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # 刪除過期值與寫入在同一個交易中，其他行程的寫入被 SQLite 鎖擋住，因此只有一個行程會成功
+            conn.execute("DELETE FROM state_values WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO state_values (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM state_values WHERE key = ?", (key,))
+            conn.commit()
+
+    def incr(self, amounts: Dict[str, int]) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO state_counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                list(amounts.items())
+            )
+            rows = conn.execute(
+                f"SELECT name, value FROM state_counters WHERE name IN ({','.join('?' * len(amounts))})",
+                list(amounts)
+            ).fetchall()
+            conn.commit()
+        return dict(rows)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute("DELETE FROM state_values WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = self._connect().execute("SELECT COUNT(*) FROM state_values").fetchone()[0]
+        return {"path": str(self.db_path), "keys": keys}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisStateBackend:
+    """Redis 協定的共享狀態 - 適用多主機部署（Redis、Valkey、KeyDB 等相容服務）
+
+    client 可傳入任何相容 redis-py 介面的連線（例如測試用的本地替身），未傳入時依 url 建立。
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "", client=None):
+        self.url = url
+        self.prefix = prefix
+        self.client = client if client is not None else redis.Redis.from_url(
+            url, socket_timeout=5, socket_connect_timeout=5, health_check_interval=30
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+        pipe.execute()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, amounts: Dict[str, int]) -> Dict[str, int]:
+        pipe = self.client.pipeline(transaction=True)
+        for name, amount in amounts.items():
+            pipe.hincrby(self.prefix + "counters", name, amount)
+        return dict(zip(amounts, (int(value) for value in pipe.execute())))
+
+    def purge_expired(self) -> int:
+        # 過期由 Redis 自行處理
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        # 不顯示連線字串中的密碼
+        parsed = urlparse(self.url)
+        return {"host": parsed.hostname, "port": parsed.port, "db": parsed.path.lstrip('/') or "0",
+                "prefix": self.prefix}
+
+    def close(self):
+        self.client.close()
+
+
+def create_state_backend(state_config: Dict[str, Any]):
+    """依 STATE_BACKEND 建立狀態後端；redis 套件未安裝時改用 SQLite"""
+    backend = state_config['backend']
+    if backend == 'redis':
+        if REDIS_AVAILABLE:
+            return RedisStateBackend(state_config['redis_url'], state_config['key_prefix'])
+        logger.warning("⚠️ 未安裝 redis 套件，狀態後端改用 SQLite (pip install redis)")
+        backend = 'sqlite'
+    if backend == 'sqlite':
+        return SQLiteStateBackend(state_config['sqlite_path'])
+    if backend != 'memory':
+        logger.warning(f"⚠️ 不支援的狀態後端: {backend}，改用 memory")
+    return MemoryStateBackend()
+
+
+state_backend = create_state_backend(CONFIG['STATE_CONFIG'])
+
+
+# 共享快取的序列化 - 只保存資料（JSON 與數值陣列），讀取其他行程寫入的內容時不會執行任意程式碼
+SHARED_NUMERIC_KINDS = 'biuf'
+
+
+def encode_shared_value(value) -> Any:
+    """將快取值轉為可 JSON 序列化的結構 - 支援 DataFrame（時間索引、數值欄位）、tuple、list、dict 與純量"""
+    if isinstance(value, pd.DataFrame):
+        if not isinstance(value.index, pd.DatetimeIndex):
+            raise TypeError(f"共享快取只支援時間索引的 DataFrame: {type(value.index).__name__}")
+        columns = [value.iloc[:, position].to_numpy() for position in range(value.shape[1])]
+        for column in columns:
+            if column.dtype.kind not in SHARED_NUMERIC_KINDS:
+                raise TypeError(f"共享快取不支援的欄位型別: {column.dtype}")
+        return {"__frame__": {
+            # 有時區時 asi8 為 UTC 時間
+            "index": value.index.asi8,
+            "unit": value.index.unit,
+            "tz": str(value.index.tz) if value.index.tz is not None else None,
+            "index_name": value.index.name,
+            "columns": [str(name) for name in value.columns],
+            "dtypes": [column.dtype.str for column in columns],
+            "values": [np.ascontiguousarray(column) for column in columns]
+        }}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_shared_value(item) for item in value]}
+    if isinstance(value, list):
+        return [encode_shared_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: encode_shared_value(item) for key, item in value.items()}
+    return value
+
+
+def decode_shared_value(data) -> Any:
+    """encode_shared_value 的反向轉換"""
+    if isinstance(data, dict):
+        if "__frame__" in data:
+            frame = data["__frame__"]
+            unit = frame["unit"]
+            if unit not in ('s', 'ms', 'us', 'ns'):
+                raise ValueError(f"共享快取不支援的時間單位: {unit}")
+            index = pd.DatetimeIndex(np.asarray(frame["index"], dtype='<i8').astype(f'datetime64[{unit}]'))
+            if frame["tz"]:
+                index = index.tz_localize('UTC').tz_convert(frame["tz"])
+            index.name = frame["index_name"]
+            columns = {}
+            for name, dtype, values in zip(frame["columns"], frame["dtypes"], frame["values"]):
+                dtype = np.dtype(dtype)
+                if dtype.kind not in SHARED_NUMERIC_KINDS:
+                    raise ValueError(f"共享快取不支援的欄位型別: {dtype}")
+                # NaN 以 null 保存
+                columns[name] = np.array(values, dtype=float if dtype.kind == 'f' else dtype)
+            return pd.DataFrame(columns, index=index)
+        if "__tuple__" in data:
+            return tuple(decode_shared_value(item) for item in data["__tuple__"])
+        return {key: decode_shared_value(item) for key, item in data.items()}
+    if isinstance(data, list):
+        return [decode_shared_value(item) for item in data]
+    return data
+
+
+def dumps_shared_entry(stored_at: float, value) -> bytes:
+    return orjson.dumps({"stored_at": stored_at, "value": encode_shared_value(value)},
+                        option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def loads_shared_entry(raw: bytes) -> tuple:
+    """返回 (stored_at, value)"""
+    entry = orjson.loads(raw)
+    return entry["stored_at"], decode_shared_value(entry["value"])
+
+
+class MarketDataCache:
+    """市場數據 TTL 快取 - 同一 key 的並發未命中只觸發一次上游下載 (single-flight)
+
+    設定共享狀態後端時，下載結果同時寫入後端供其他 worker 使用；多個 worker 同時未命中時
+    以後端的鎖協調，只有一個 worker 向上游下載，其他 worker 等待其結果。
+    """
+
+    SHARED_POLL_SECONDS = 0.2
+
+    def __init__(self, ttl: float, shared=None, lock_ttl: float = 30.0):
+        self.ttl = ttl
+        self.shared = shared if shared is not None and shared.shared else None
+        self.lock_ttl = lock_ttl
+        self._entries: Dict[Any, tuple] = {}
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.shared_hits = 0
+        self.peer_waits = 0
+        self.shared_errors = 0
+
+    async def get_or_load(self, key, loader, ttl: Optional[float] = None, force: bool = False,
+                          max_age: Optional[float] = None):
+        """取得快取值；過期或不存在時呼叫 loader，並讓同時到達的請求共用同一次下載
+
+        force 略過本行程的快取；max_age 為可接受其他 worker 共享結果的最長時間（預設為 TTL）
+        """
+        if not force:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, self.ttl if ttl is None else ttl, max_age))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # shield: 單一請求被取消時不影響其他等待同一次下載的請求
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader, ttl: float, max_age: Optional[float] = None):
+        try:
+            if self.shared is None:
+                value, age = await loader(), 0.0
+            else:
+                value, age = await self._load_shared(key, loader, ttl, ttl if max_age is None else max_age)
+            self._entries[key] = (time.monotonic() + ttl - age, value)
+            return value
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _shared_key(key) -> str:
+        return "market:" + repr(key)
+
+    async def _shared_call(self, func, *args, default=None):
+        """呼叫共享後端 - 後端不可用時記錄並返回 default，退回本行程自行下載"""
+        try:
+            return await blocking_executor.run_io(func, *args)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"⚠️ 共享狀態後端操作失敗: {e}")
+            return default
+
+    def _read_shared(self, shared_key: str, max_age: float) -> Optional[tuple]:
+        """讀取共享結果，返回 (value, age)；不存在或超過 max_age 時返回 None（阻塞呼叫）"""
+        raw = self.shared.get(shared_key)
+        if raw is None:
+            return None
+        stored_at, value = loads_shared_entry(raw)
+        age = max(0.0, time.time() - stored_at)
+        return (value, age) if age <= max_age else None
+
+    def _write_shared(self, values: Dict[str, Any], ttl: float):
+        """序列化並寫入共享後端（阻塞呼叫，在 I/O 執行緒池中序列化大型 DataFrame）"""
+        stored_at = time.time()
+        self.shared.set_many({
+            shared_key: dumps_shared_entry(stored_at, value) for shared_key, value in values.items()
+        }, ttl)
+
+    async def _load_shared(self, key, loader, ttl: float, max_age: float) -> tuple:
+        shared_key = self._shared_key(key)
+        cached = await self._shared_call(self._read_shared, shared_key, max_age)
+        if cached is not None:
+            self.shared_hits += 1
+            return cached
+
+        lock_key = "lock:" + shared_key
+        deadline = time.monotonic() + self.lock_ttl
+        acquired = False
+        while True:
+            acquired = await self._shared_call(self.shared.add, lock_key, b"1", self.lock_ttl, default=True)
+            if acquired or time.monotonic() >= deadline:
+                break
+            # 其他 worker 正在下載，等待其結果
+            await asyncio.sleep(self.SHARED_POLL_SECONDS)
+            cached = await self._shared_call(self._read_shared, shared_key, max_age)
+            if cached is not None:
+                self.peer_waits += 1
+                return cached
+
+        try:
+            value = await loader()
+            await self._shared_call(self._write_shared, {shared_key: value}, ttl)
+            return value, 0.0
+        finally:
+            if acquired:
+                await self._shared_call(self.shared.delete, lock_key)
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """直接寫入快取 - 供批次下載一次填入多個 key"""
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    async def set_many(self, items: Dict[Any, Any], ttl: Optional[float] = None):
+        """寫入多個 key，設定共享後端時同時寫入後端"""
+        ttl = self.ttl if ttl is None else ttl
+        for key, value in items.items():
+            self.set(key, value, ttl)
+        if self.shared is not None and items:
+            await self._shared_call(
+                self._write_shared, {self._shared_key(key): value for key, value in items.items()}, ttl
+            )
+
+    def invalidate(self, key=None):
+        """清除指定 key 或全部快取"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "shared": self.shared is not None,
+            "shared_hits": self.shared_hits,
+            "peer_waits": self.peer_waits,
+            "shared_errors": self.shared_errors
+        }
+
+
+market_data_cache = MarketDataCache(
+    CONFIG['MARKET_DATA_CONFIG']['cache_ttl'], shared=state_backend, lock_ttl=CONFIG['STATE_CONFIG']['lock_ttl']
+)
+
+
+# 阻塞工作執行層
+class BlockingExecutor:
+    """阻塞工作執行層 - 網路 I/O 使用有界執行緒池，指標計算可選用 process pool"""
+
+    def __init__(self, io_workers: int, cpu_workers: int = 0):
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = max(0, cpu_workers)
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._inflight = {"io": 0, "cpu": 0}
+        self._completed = {"io": 0, "cpu": 0}
+        self._failed = {"io": 0, "cpu": 0}
+
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="market-io")
+        return self._io_pool
+
+    def _get_cpu_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._cpu_pool is None and self.cpu_workers > 0:
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        return self._cpu_pool
+
+    async def _submit(self, kind: str, pool, func, *args, **kwargs):
+        self._inflight[kind] += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, partial(func, *args, **kwargs))
+            self._completed[kind] += 1
+            return result
+        except Exception:
+            self._failed[kind] += 1
+            raise
+        finally:
+            self._inflight[kind] -= 1
+
+    async def run_io(self, func, *args, **kwargs):
+        """在 I/O 執行緒池中執行阻塞的網路呼叫"""
+        return await self._submit("io", self._get_io_pool(), func, *args, **kwargs)
+
+    @property
+    def cpu_pool_enabled(self) -> bool:
+        return self.cpu_workers > 0
+
+    async def run_cpu(self, func, *args, **kwargs):
+        """在 process pool 中執行 CPU 密集計算；未啟用時退回 I/O 執行緒池
+
+        子行程中的模組層級快取（例如轉折點的月份彙總）不會回到主行程，依賴快取的計算應在主行程完成後傳入。
+        """
+        cpu_pool = self._get_cpu_pool()
+        if cpu_pool is None:
+            return await self._submit("io", self._get_io_pool(), func, *args, **kwargs)
+        return await self._submit("cpu", cpu_pool, func, *args, **kwargs)
+
+    def shutdown(self):
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False, cancel_futures=True)
+            self._io_pool = None
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        def pool_stats(kind: str, workers: int) -> Dict[str, Any]:
+            inflight = self._inflight[kind]
+            return {
+                "workers": workers,
+                "inflight": inflight,
+                "queue_depth": max(0, inflight - workers),
+                "completed": self._completed[kind],
+                "failed": self._failed[kind]
+            }
+
+        return {
+            "io": pool_stats("io", self.io_workers),
+            "cpu": pool_stats("cpu", self.cpu_workers) if self.cpu_workers > 0 else {"enabled": False}
+        }
+
+
+blocking_executor = BlockingExecutor(
+    CONFIG['EXECUTOR_CONFIG']['io_workers'],
+    CONFIG['EXECUTOR_CONFIG']['cpu_workers']
+)
+
+
+# 增量指標狀態
+def wilder_average(values, period: int) -> np.ndarray:
+    """Wilder 平滑平均 - 前 period 筆取簡單平均作為起點，之後 avg = avg + (x - avg) / period"""
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    # Wilder 平滑等同 alpha = 1/period 的非調整 EMA，交由 pandas 以 C 迴圈計算
+    result[period - 1:] = pd.Series(seeded).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+    return result
+
+
+def rsi_from_averages(avg_gain: float, avg_loss: float) -> float:
+    """由平均漲幅/跌幅計算 RSI，無跌幅時返回 100（無變化時返回 50）"""
+    if avg_loss == 0:
+        return 50.0 if avg_gain == 0 else 100.0
+    return round(float(100 - (100 / (1 + avg_gain / avg_loss))), 1)
+
+
+class IncrementalIndicatorState:
+    """單一商品/週期的增量指標狀態（統計與技術指標的當前值）
+
+    狀態分為「已確認K線」與「最後一根K線」：修正最後一根只替換其收盤價（O(1)），新K線到達時才把
+    最後一根併入已確認狀態（每根 O(1)）。已確認部分維護移動平均的滾動和、RSI 的 Wilder 平均、
+    Welford 平均/變異數，以及最大/最小值的單調佇列。只納入有效（非 NaN）收盤價。
+
+    sync() 只讀取上次最後一根K線之後的尾端；視窗起點前移時由完整序列重建，因為 Wilder RSI 的
+    起始平均取決於序列起點，逐筆移除舊K線無法與重建結果一致。圖表用的完整 MA/RSI 序列本身就是
+    O(n) 的輸出，仍由 build_gold_price_payload 向量化計算。
+    """
+
+    # 一次同步最多逐筆追加的新K線數，超過時直接重建
+    MAX_INCREMENTAL_BARS = 1000
+
+    def __init__(self, ma_windows=(5, 20, 50), rsi_periods=(14,)):
+        self.ma_windows = tuple(ma_windows)
+        self.rsi_periods = tuple(rsi_periods)
+        self.rebuilds = 0
+        self.incremental_updates = 0
+        self._reset()
+
+    def _reset(self):
+        # 已確認K線: (timestamp ns, close)
+        self._bars: deque = deque()
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._max_queue: deque = deque()
+        self._min_queue: deque = deque()
+        self._ma_queues = {window: deque() for window in self.ma_windows}
+        self._ma_sums = {window: 0.0 for window in self.ma_windows}
+        # RSI: 已確認的差值數量、起點前的漲跌總和、Wilder 平均
+        self._rsi = {
+            period: {"deltas": 0, "gain_sum": 0.0, "loss_sum": 0.0, "avg_gain": None, "avg_loss": None}
+            for period in self.rsi_periods
+        }
+        self._last_ts: Optional[int] = None
+        self._last_close: Optional[float] = None
+        self._latest_date = None
+        # 上次同步時第一列的時間與最後一根有效K線的列位置，用來確認之前的K線沒有變動
+        self._first_ts: Optional[int] = None
+        self._last_row: Optional[int] = None
+
+    # --- 同步 ---
+    def sync(self, hist_data):
+        """與最新K線數據同步 - 起點與最後一根K線的位置不變時只處理尾端（修正或新增的K線），否則重建"""
+        if hist_data.empty:
+            self._reset()
+            return
+
+        # 奈秒時間陣列是索引底層資料的 view，不複製整個序列
+        timestamps = pd.DatetimeIndex(hist_data.index).as_unit('ns').asi8
+
+        if self._last_ts is not None and timestamps[0] == self._first_ts:
+            position = int(np.searchsorted(timestamps, self._last_ts))
+            if position == self._last_row and position < len(timestamps) \
+                    and timestamps[position] == self._last_ts \
+                    and len(timestamps) - position - 1 <= self.MAX_INCREMENTAL_BARS:
+                tail = hist_data['Close'].iloc[position:].to_numpy(dtype=float)
+                tail_ts = timestamps[position:]
+                if not np.isnan(tail[0]):
+                    self.revise_last(tail[0])
+                    for offset in np.flatnonzero(~np.isnan(tail[1:])) + 1:
+                        self.append(tail_ts[offset], tail[offset])
+                        self._last_row = position + int(offset)
+                    self._latest_date = hist_data.index[self._last_row]
+                    self.incremental_updates += 1
+                    return
+
+        valid_mask = hist_data['Close'].notna().to_numpy()
+        if not valid_mask.any():
+            self._reset()
+            return
+        self._rebuild(timestamps[valid_mask], hist_data['Close'].to_numpy(dtype=float)[valid_mask])
+        self._first_ts = int(timestamps[0])
+        self._last_row = int(np.flatnonzero(valid_mask)[-1])
+        self._latest_date = hist_data.index[self._last_row]
+
+    def _rebuild(self, timestamps, closes):
+        """以向量化方式由完整序列重建狀態"""
+        self._reset()
+        self.rebuilds += 1
+        committed = closes[:-1]
+        self._bars = deque(zip(timestamps[:-1].tolist(), committed.tolist()))
+
+        if len(committed) > 0:
+            self._count = len(committed)
+            self._mean = float(committed.mean())
+            self._m2 = float(((committed - self._mean) ** 2).sum())
+            # 單調佇列只需保留「之後沒有更大(小)值」的K線
+            suffix_max = np.maximum.accumulate(committed[::-1])[::-1]
+            suffix_min = np.minimum.accumulate(committed[::-1])[::-1]
+            keep_max = np.append(committed[:-1] > suffix_max[1:], True)
+            keep_min = np.append(committed[:-1] < suffix_min[1:], True)
+            self._max_queue = deque(zip(timestamps[:-1][keep_max].tolist(), committed[keep_max].tolist()))
+            self._min_queue = deque(zip(timestamps[:-1][keep_min].tolist(), committed[keep_min].tolist()))
+
+        for window in self.ma_windows:
+            tail = committed[-window:] if len(committed) else committed
+            self._ma_queues[window] = deque(tail.tolist())
+            self._ma_sums[window] = float(tail.sum())
+
+        deltas = np.diff(committed)
+        gains = np.where(deltas > 0, deltas, 0.0)
+        losses = np.where(deltas < 0, -deltas, 0.0)
+        for period, rsi in self._rsi.items():
+            rsi["deltas"] = len(deltas)
+            if len(deltas) >= period:
+                rsi["avg_gain"] = float(wilder_average(gains, period)[-1])
+                rsi["avg_loss"] = float(wilder_average(losses, period)[-1])
+            else:
+                rsi["gain_sum"] = float(gains.sum())
+                rsi["loss_sum"] = float(losses.sum())
+
+        self._last_ts = int(timestamps[-1])
+        self._last_close = float(closes[-1])
+
+    # --- O(1) 更新 ---
+    def revise_last(self, close: float):
+        """修正最後一根K線的收盤價"""
+        self._last_close = float(close)
+
+    def append(self, timestamp: int, close: float):
+        """新K線到達 - 將目前最後一根併入已確認狀態"""
+        if self._last_ts is not None:
+            self._commit(self._last_ts, self._last_close)
+        self._last_ts = int(timestamp)
+        self._last_close = float(close)
+
+    def _commit(self, timestamp: int, close: float):
+        previous = self._bars[-1][1] if self._bars else None
+        self._bars.append((timestamp, close))
+
+        # Welford 新增
+        self._count += 1
+        delta = close - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (close - self._mean)
+
+        while self._max_queue and self._max_queue[-1][1] <= close:
+            self._max_queue.pop()
+        self._max_queue.append((timestamp, close))
+        while self._min_queue and self._min_queue[-1][1] >= close:
+            self._min_queue.pop()
+        self._min_queue.append((timestamp, close))
+
+        for window, queue in self._ma_queues.items():
+            queue.append(close)
+            self._ma_sums[window] += close
+            if len(queue) > window:
+                self._ma_sums[window] -= queue.popleft()
+
+        if previous is not None:
+            gain, loss = max(close - previous, 0.0), max(previous - close, 0.0)
+            for period, rsi in self._rsi.items():
+                rsi["deltas"] += 1
+                if rsi["avg_gain"] is None:
+                    rsi["gain_sum"] += gain
+                    rsi["loss_sum"] += loss
+                    if rsi["deltas"] == period:
+                        rsi["avg_gain"] = rsi["gain_sum"] / period
+                        rsi["avg_loss"] = rsi["loss_sum"] / period
+                else:
+                    rsi["avg_gain"] += (gain - rsi["avg_gain"]) / period
+                    rsi["avg_loss"] += (loss - rsi["avg_loss"]) / period
+
+    # --- 讀取當前值 ---
+    def snapshot(self) -> Dict[str, Any]:
+        """當前指標值（含最後一根K線），ma/rsi 為 (當前值, 前一根K線的值)"""
+        if self._last_close is None:
+            return {"count": 0}
+
+        last = self._last_close
+        count = self._count + 1
+        delta = last - self._mean
+        mean = self._mean + delta / count
+        m2 = self._m2 + delta * (last - mean)
+        previous = self._bars[-1][1] if self._bars else None
+
+        ma = {}
+        for window, queue in self._ma_queues.items():
+            current_value = None
+            if len(queue) >= window - 1 and count >= window:
+                dropped = queue[0] if len(queue) == window else 0.0
+                current_value = (self._ma_sums[window] - dropped + last) / window
+            previous_value = self._ma_sums[window] / window if len(queue) == window else None
+            ma[window] = (current_value, previous_value)
+
+        rsi = {}
+        for period, state in self._rsi.items():
+            previous_value = None
+            if state["avg_gain"] is not None:
+                previous_value = rsi_from_averages(state["avg_gain"], state["avg_loss"])
+            current_value = None
+            if previous is not None:
+                gain, loss = max(last - previous, 0.0), max(previous - last, 0.0)
+                if state["avg_gain"] is not None:
+                    current_value = rsi_from_averages(
+                        state["avg_gain"] + (gain - state["avg_gain"]) / period,
+                        state["avg_loss"] + (loss - state["avg_loss"]) / period
+                    )
+                elif state["deltas"] + 1 == period:
+                    current_value = rsi_from_averages(
+                        (state["gain_sum"] + gain) / period, (state["loss_sum"] + loss) / period
+                    )
+            rsi[period] = (current_value, previous_value)
+
+        return {
+            "count": count,
+            "current_price": last,
+            "prev_price": previous,
+            "latest_date": self._latest_date,
+            "mean": mean,
+            "std": float(np.sqrt(m2 / (count - 1))) if count > 1 else float('nan'),
+            "max": max(self._max_queue[0][1], last) if self._max_queue else last,
+            "min": min(self._min_queue[0][1], last) if self._min_queue else last,
+            "ma": ma,
+            "rsi": rsi
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bars": len(self._bars) + (1 if self._last_close is not None else 0),
+            "rebuilds": self.rebuilds,
+            "incremental_updates": self.incremental_updates
+        }
+
+
+# 本地K線儲存
+class OHLCVStore:
+    """本地 OHLCV 儲存 - 每個 symbol/interval 一個目錄，各欄位為可 memory-map 的 NumPy 二進位檔
+
+    時間以 UTC 奈秒 (int64) 保存，原始時區記錄在 meta.json；寫入時覆蓋與新數據重疊的尾端後追加，
+    因此最後一根未完成的K線會被新下載的版本取代。
+    壓縮舊數據時寫入新一代 (generation) 的欄位檔，再以 meta.json 的原子替換切換，中斷時各欄位仍對齊。
+    """
+
+    COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+    # 保留的歷史長度為該 interval 可查詢範圍的倍數，超過時壓縮檔案
+    RETENTION_FACTOR = 1.5
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.delta_fetches = 0
+        self.full_fetches = 0
+        self.full_fallbacks = 0
+        self.bars_written = 0
+        self.compactions = 0
+        self.fetch_errors = 0
+
+    @contextmanager
+    def _lock(self, symbol: str, interval: str, exclusive: bool = True):
+        """同一行程以 threading.Lock 互斥，多個 worker 行程之間再以目錄中的 .lock 檔 flock
+
+        讀取使用共用鎖，寫入（追加、壓縮）使用獨佔鎖。
+        """
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault((symbol, interval), threading.Lock())
+        with thread_lock:
+            path = self._path(symbol, interval)
+            if not FCNTL_AVAILABLE or (not exclusive and not path.exists()):
+                yield
+                return
+            path.mkdir(parents=True, exist_ok=True)
+            with open(path / ".lock", 'a+b') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _path(self, symbol: str, interval: str) -> Path:
+        safe_symbol = "".join(c if c.isalnum() or c in "-_." else "_" for c in symbol)
+        return self.root / safe_symbol / interval
+
+    @staticmethod
+    def _column_file(path: Path, name: str, generation: int = 0) -> Path:
+        return path / (f"{name}.g{generation}.bin" if generation else f"{name}.bin")
+
+    def _row_count(self, path: Path, generation: int = 0) -> int:
+        # 追加時各欄位依序截斷再寫入，中斷時檔案長度可能不同；共同前綴仍對齊，以最短者為準
+        sizes = []
+        for name in ('timestamp',) + self.COLUMNS:
+            column_file = self._column_file(path, name, generation)
+            sizes.append(column_file.stat().st_size // 8 if column_file.exists() else 0)
+        return min(sizes)
+
+    def _read_meta(self, path: Path) -> Dict[str, Any]:
+        meta_file = path / "meta.json"
+        if meta_file.exists():
+            return json.loads(meta_file.read_text(encoding='utf-8'))
+        return {}
+
+    @staticmethod
+    def _write_meta(path: Path, meta: Dict[str, Any]):
+        temp = path / "meta.json.tmp"
+        temp.write_text(json.dumps(meta), encoding='utf-8')
+        os.replace(temp, path / "meta.json")
+
+    def _timestamps(self, path: Path, rows: int, generation: int = 0) -> np.ndarray:
+        if rows == 0:
+            return np.empty(0, dtype='<i8')
+        return np.memmap(self._column_file(path, 'timestamp', generation), dtype='<i8', mode='r', shape=(rows,))
+
+    def _remove_other_generations(self, path: Path, generation: int):
+        """刪除非目前世代的欄位檔（壓縮完成後的舊檔，或中斷的壓縮留下的檔案）"""
+        current = {self._column_file(path, name, generation).name for name in ('timestamp',) + self.COLUMNS}
+        for column_file in path.glob("*.bin"):
+            if column_file.name not in current:
+                column_file.unlink(missing_ok=True)
+
+    def load(self, symbol: str, interval: str, start=None) -> Optional[pd.DataFrame]:
+        """讀取儲存的K線（start 之後），沒有數據時返回 None"""
+        path = self._path(symbol, interval)
+        with self._lock(symbol, interval, exclusive=False):
+            meta = self._read_meta(path)
+            generation = meta.get('generation', 0)
+            rows = self._row_count(path, generation)
+            if rows == 0:
+                return None
+            timestamps = self._timestamps(path, rows, generation)
+            position = 0
+            if start is not None:
+                position = int(np.searchsorted(timestamps, self._to_utc_ns(start, meta.get('tz'))))
+            data = {
+                column: np.array(np.memmap(
+                    self._column_file(path, column, generation), dtype='<f8', mode='r', shape=(rows,)
+                )[position:])
+                for column in self.COLUMNS
+            }
+            index = pd.DatetimeIndex(np.array(timestamps[position:]).astype('datetime64[ns]'))
+
+        if meta.get('tz'):
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        return pd.DataFrame(data, index=index)
+
+    def first_last(self, symbol: str, interval: str):
+        """返回已儲存的第一筆與最後一筆時間 (pd.Timestamp)，沒有數據時為 (None, None)"""
+        path = self._path(symbol, interval)
+        with self._lock(symbol, interval, exclusive=False):
+            meta = self._read_meta(path)
+            generation = meta.get('generation', 0)
+            rows = self._row_count(path, generation)
+            if rows == 0:
+                return None, None
+            timestamps = self._timestamps(path, rows, generation)
+            first, last = int(timestamps[0]), int(timestamps[-1])
+
+        def to_timestamp(value):
+            ts = pd.Timestamp(value)
+            return ts.tz_localize('UTC').tz_convert(meta['tz']) if meta.get('tz') else ts
+
+        return to_timestamp(first), to_timestamp(last)
+
+    @staticmethod
+    def _to_utc_ns(value, tz: Optional[str]) -> int:
+        ts = pd.Timestamp(value)
+        if tz:
+            ts = ts.tz_localize(tz) if ts.tz is None else ts
+            return ts.tz_convert('UTC').value
+        return ts.tz_localize(None).value if ts.tz is not None else ts.value
+
+    def upsert(self, symbol: str, interval: str, frame: pd.DataFrame, retention_days: Optional[int] = None):
+        """寫入K線 - 截斷與新數據重疊的尾端後追加，必要時壓縮超過保留期限的舊數據"""
+        if frame is None or frame.empty:
+            return
+        frame = frame.sort_index()
+        tz = str(frame.index.tz) if frame.index.tz is not None else None
+        index = frame.index.tz_convert('UTC').tz_localize(None) if tz else frame.index
+        new_timestamps = index.as_unit('ns').asi8.astype('<i8')
+        new_columns = {column: frame[column].to_numpy(dtype='<f8') for column in self.COLUMNS}
+
+        path = self._path(symbol, interval)
+        with self._lock(symbol, interval):
+            path.mkdir(parents=True, exist_ok=True)
+            generation = self._read_meta(path).get('generation', 0)
+            rows = self._row_count(path, generation)
+            timestamps = self._timestamps(path, rows, generation)
+            keep = int(np.searchsorted(timestamps, new_timestamps[0])) if rows else 0
+
+            drop_before = 0
+            if retention_days and keep:
+                cutoff = new_timestamps[-1] - int(retention_days * self.RETENTION_FACTOR * 86400 * 1e9)
+                drop_before = int(np.searchsorted(timestamps, cutoff))
+            del timestamps
+
+            meta = {'tz': tz, 'symbol': symbol, 'interval': interval, 'generation': generation}
+            if drop_before:
+                # 壓縮：期限內的舊數據與新數據寫入下一代檔案，全部寫完後才以 meta.json 切換
+                columns = {'timestamp': (new_timestamps, '<i8')}
+                columns.update({column: (values, '<f8') for column, values in new_columns.items()})
+                meta['generation'] = generation + 1
+                for name, (values, dtype) in columns.items():
+                    kept = np.fromfile(self._column_file(path, name, generation), dtype=dtype, count=keep)
+                    np.concatenate([kept[drop_before:], values]).astype(dtype).tofile(
+                        self._column_file(path, name, meta['generation'])
+                    )
+                self._write_meta(path, meta)
+                self._remove_other_generations(path, meta['generation'])
+                self.compactions += 1
+            else:
+                for name, values in [('timestamp', new_timestamps)] + list(new_columns.items()):
+                    with open(self._column_file(path, name, generation), 'ab') as f:
+                        f.truncate(keep * 8)
+                        values.tofile(f)
+                self._write_meta(path, meta)
+        self.bars_written += len(new_timestamps)
+
+    def _plan_fetch(self, symbol: str, interval: str, start_date: datetime) -> tuple:
+        """決定下載起點，返回 (start, 是否為增量下載, 是否已有本地數據)
+
+        本地已涵蓋 start_date 且最後一筆仍在上游可查詢的範圍內時，只下載最後一筆之後的數據；
+        停機超過上游回溯範圍（例如 5m 超過 60 天）時增量下載必定失敗，改為完整下載。
+        """
+        first, last = self.first_last(symbol, interval)
+        full_start = start_date.strftime('%Y-%m-%d')
+        if first is None:
+            return full_start, False, False
+        if first.tz_localize(None).date() > start_date.date():
+            return full_start, False, True
+        lookback_days = INTERVAL_MAX_DAYS.get(interval)
+        if lookback_days is not None and (pd.Timestamp.now(tz=last.tz) - last).days >= lookback_days - 1:
+            self.full_fallbacks += 1
+            return full_start, False, True
+        return last.strftime('%Y-%m-%d'), True, True
+
+    def sync(self, symbol: str, interval: str, start_date: datetime, fetch, retention_days: Optional[int] = None):
+        """取得 start_date 之後的K線 - 本地已有足夠歷史時只向上游下載最後一筆之後的數據
+
+        fetch(start: str) 為實際的上游下載函式，返回 DataFrame
+        """
+        start, delta, has_local = self._plan_fetch(symbol, interval, start_date)
+
+        if delta:
+            self.delta_fetches += 1
+            try:
+                # 從最後一筆的日期重新下載，以便更新尚未完成的最後一根K線
+                self.upsert(symbol, interval, fetch(start), retention_days)
+            except Exception as e:
+                self.fetch_errors += 1
+                self.full_fallbacks += 1
+                logger.warning(f"⚠️ {symbol} {interval} 增量下載失敗，改為完整下載: {e}")
+                delta = False
+
+        if not delta:
+            self.full_fetches += 1
+            try:
+                self.upsert(symbol, interval, fetch(start_date.strftime('%Y-%m-%d')), retention_days)
+            except Exception as e:
+                if not has_local:
+                    raise
+                # 上游暫時失敗時仍以本地數據回應
+                self.fetch_errors += 1
+                logger.warning(f"⚠️ {symbol} {interval} 完整下載失敗，使用本地數據（可能已過時）: {e}")
+
+        hist_data = self.load(symbol, interval, start=start_date.strftime('%Y-%m-%d'))
+        return hist_data if hist_data is not None else pd.DataFrame(columns=list(self.COLUMNS))
+
+    def sync_batch(self, symbols, interval: str, start_date: datetime, fetch,
+                   retention_days: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """多個商品的 sync - 需要相同起始日期的商品合併成一次上游批次下載
+
+        fetch(symbols: list, start: str) 返回 {symbol: DataFrame}
+        """
+        groups: Dict[str, list] = {}
+        full_group = []
+        for symbol in symbols:
+            start, delta, _ = self._plan_fetch(symbol, interval, start_date)
+            if delta:
+                self.delta_fetches += 1
+                groups.setdefault(start, []).append(symbol)
+            else:
+                full_group.append(symbol)
+
+        for start, group in groups.items():
+            try:
+                frames = fetch(group, start)
+            except Exception as e:
+                # 增量下載失敗時改為完整下載
+                self.fetch_errors += 1
+                self.full_fallbacks += len(group)
+                logger.warning(f"⚠️ {', '.join(group)} {interval} 增量批次下載失敗，改為完整下載: {e}")
+                full_group.extend(group)
+                continue
+            for symbol, frame in frames.items():
+                self.upsert(symbol, interval, frame, retention_days)
+
+        if full_group:
+            self.full_fetches += len(full_group)
+            try:
+                frames = fetch(full_group, start_date.strftime('%Y-%m-%d'))
+            except Exception as e:
+                # 上游暫時失敗時仍以本地數據回應
+                self.fetch_errors += 1
+                logger.warning(f"⚠️ {', '.join(full_group)} {interval} 批次下載失敗，使用本地數據（可能已過時）: {e}")
+                frames = {}
+            for symbol, frame in frames.items():
+                self.upsert(symbol, interval, frame, retention_days)
+
+        results = {}
+        for symbol in symbols:
+            hist_data = self.load(symbol, interval, start=start_date.strftime('%Y-%m-%d'))
+            if hist_data is not None and not hist_data.empty:
+                results[symbol] = hist_data
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": str(self.root),
+            "series": sum(1 for _ in self.root.glob("*/*")) if self.root.exists() else 0,
+            "delta_fetches": self.delta_fetches,
+            "full_fetches": self.full_fetches,
+            "full_fallbacks": self.full_fallbacks,
+            "bars_written": self.bars_written,
+            "compactions": self.compactions,
+            "fetch_errors": self.fetch_errors
+        }
+
+
+ohlcv_store = OHLCVStore(CONFIG['MARKET_DATA_CONFIG']['store_dir']) \
+    if CONFIG['MARKET_DATA_CONFIG']['store_enabled'] else None
+
+
+# 背景市場數據刷新
+class MarketDataRefresher:
+    """背景排程 - 定期刷新各商品、各 period/interval 的報價快照，請求直接由記憶體回應
+
+    同一 period/interval 的所有商品以一次批次下載取得，再分別計算指標與回應內容。
+    未追蹤的組合依請求即時計算，快照只在快取 TTL 內有效，並以 LRU 限制保留的數量。
+    """
+
+    def __init__(self, symbols, combinations, interval_seconds: float, concurrency: int, max_on_demand: int = 64):
+        self.symbols = list(symbols)
+        self.combinations = list(combinations)
+        self.interval_seconds = interval_seconds
+        self.concurrency = max(1, concurrency)
+        self.max_on_demand = max(1, max_on_demand)
+        self._snapshots: Dict[tuple, Dict[str, Any]] = {}
+        self._indicator_states: Dict[tuple, IncrementalIndicatorState] = {}
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        # 數據版本計數器 - K線或市場狀態改變時遞增，作為報價回應的 ETag
+        self.version = 0
+        self.cycles = 0
+        self.refreshes = 0
+        self.unchanged = 0
+        self.failures = 0
+        self.evictions = 0
+        self.last_cycle_at: Optional[datetime] = None
+        self.last_cycle_seconds: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def is_tracked(self, symbol: str, period: str, interval: str) -> bool:
+        """該組合是否由背景排程定期刷新"""
+        return symbol in self.symbols and (period, interval) in self.combinations
+
+    def refreshed_by_schedule(self, symbol: str, period: str, interval: str) -> bool:
+        return self.running and self.is_tracked(symbol, period, interval)
+
+    def get_snapshot(self, symbol: str, period: str, interval: str) -> Optional[Dict[str, Any]]:
+        """取得最新快照；不由背景排程刷新的組合（排程未運行或未追蹤）只在快取 TTL 內有效"""
+        key = (symbol, period, interval)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            return None
+        if not self.refreshed_by_schedule(*key):
+            if time.monotonic() - snapshot["refreshed_at"] > market_data_cache.ttl:
+                return None
+            # 最近使用的移到最後 (LRU)
+            self._snapshots[key] = self._snapshots.pop(key)
+        return snapshot
+
+    def _evict_on_demand(self):
+        """未追蹤的組合超過 max_on_demand 時，移除最久未使用的快照與指標狀態"""
+        on_demand = [key for key in self._snapshots if not self.is_tracked(*key)]
+        for key in on_demand[:max(0, len(on_demand) - self.max_on_demand)]:
+            self._snapshots.pop(key, None)
+            self._indicator_states.pop(key, None)
+            _pivot_month_memo.pop(key, None)
+            self.evictions += 1
+
+    async def refresh(self, symbol: str, period: str, interval: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """刷新單一組合的快照 - 同一組合的並發刷新共用一次計算"""
+        key = (symbol, period, interval)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(symbol, period, interval, force))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, symbol: str, period: str, interval: str, force: bool) -> Optional[Dict[str, Any]]:
+        key = (symbol, period, interval)
+        hist_data, info, current_price, latest_processing_time = await get_gold_futures_data_enhanced(
+            period, interval, symbol=symbol, force=force
+        )
+        if hist_data is None or hist_data.empty:
+            self.failures += 1
+            return None
+
+        # 增量更新指標狀態（通常只有最後一根K線變動），統計與技術指標直接讀取當前值
+        state = self._indicator_states.get(key)
+        if state is None:
+            state = self._indicator_states[key] = IncrementalIndicatorState()
+        state.sync(hist_data)
+
+        # 轉折點依賴本行程的月份彙總快取，啟用 process pool 時先在執行緒池計算再傳入子行程
+        quarterly_average_line = None
+        if blocking_executor.cpu_pool_enabled:
+            quarterly_average_line = await blocking_executor.run_io(
+                calculate_quarterly_average_line, hist_data, memo_key=key
+            )
+
+        payload = await blocking_executor.run_cpu(
+            build_gold_price_payload, hist_data, info, latest_processing_time, period, interval,
+            state.snapshot(), symbol, quarterly_average_line
+        )
+        if payload is None:
+            self.failures += 1
+            return None
+
+        # K線與市場狀態都沒變時沿用原版本，輪詢的客戶端可收到 304
+        fingerprint = (market_data_fingerprint(hist_data), payload["data"]["market_status"])
+        previous = self._snapshots.get(key)
+        if previous is not None and previous["fingerprint"] == fingerprint:
+            version = previous["version"]
+            self.unchanged += 1
+        else:
+            self.version += 1
+            version = self.version
+
+        snapshot = {
+            "series": payload.pop("series", None),
+            "payload": payload,
+            "version": version,
+            "fingerprint": fingerprint,
+            # 由數據內容決定，相同K線在每個 worker 得到相同的 ETag
+            "digest": hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:12],
+            "refreshed_at": time.monotonic(),
+            "refreshed_time": datetime.now()
+        }
+        self._snapshots.pop(key, None)
+        self._snapshots[key] = snapshot
+        self._evict_on_demand()
+        self.refreshes += 1
+        if previous is not None and version != previous["version"]:
+            event_broadcaster.publish("price", price_event(symbol, period, interval, snapshot))
+        return snapshot
+
+    async def refresh_all(self):
+        """刷新所有組合 - 以 concurrency 限制同時進行的上游下載"""
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh_one(period: str, interval: str):
+            async with semaphore:
+                try:
+                    # 一次批次下載所有商品並填入快取，之後各商品的刷新直接命中快取
+                    await prefetch_market_data(self.symbols, period, interval)
+                except Exception as e:
+                    logger.warning(f"⚠️ 背景批次下載 {period}/{interval} 失敗: {e}")
+                for symbol in self.symbols:
+                    try:
+                        await self.refresh(symbol, period, interval)
+                    except Exception as e:
+                        self.failures += 1
+                        logger.warning(f"⚠️ 背景刷新 {symbol} {period}/{interval} 失敗: {e}")
+
+        await asyncio.gather(*(refresh_one(period, interval) for period, interval in self.combinations))
+
+        self.cycles += 1
+        self.last_cycle_at = datetime.now()
+        self.last_cycle_seconds = time.perf_counter() - started
+        logger.debug(
+            f"🔄 背景刷新完成: {len(self.symbols)} 個商品 × {len(self.combinations)} 組，"
+            f"耗時 {self.last_cycle_seconds:.2f}s"
+        )
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 背景刷新循環錯誤: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"🔄 背景市場數據刷新已啟動: {', '.join(self.symbols)} × {len(self.combinations)} 組，"
+                f"每 {self.interval_seconds:g} 秒"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "symbols": self.symbols,
+            "interval_seconds": self.interval_seconds,
+            "combinations": len(self.combinations),
+            "snapshots": len(self._snapshots),
+            "max_on_demand": self.max_on_demand,
+            "evictions": self.evictions,
+            "indicator_states": {
+                f"{symbol} {period}/{interval}": state.stats()
+                for (symbol, period, interval), state in self._indicator_states.items()
+            },
+            "cycles": self.cycles,
+            "refreshes": self.refreshes,
+            "unchanged_refreshes": self.unchanged,
+            "failures": self.failures,
+            "data_version": self.version,
+            "last_cycle_at": self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+            "last_cycle_seconds": round(self.last_cycle_seconds, 3) if self.last_cycle_seconds is not None else None
+        }
+
+
+market_data_refresher = MarketDataRefresher(
+    get_tracked_symbols(),
+    get_refresh_combinations(),
+    CONFIG['MARKET_REFRESH_CONFIG']['interval'],
+    CONFIG['MARKET_REFRESH_CONFIG']['concurrency'],
+    CONFIG['MARKET_REFRESH_CONFIG']['max_on_demand']
+)
+
+
 # 生命週期管理
 from contextlib import asynccontextmanager
 
@@ -138,132 +1902,1606 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     """應用生命週期管理"""
     # 啟動時
+    startup_started = time.perf_counter()
     logger.info("🚀 市場分析系統啟動 - 修正版")
+    try:
+        await shared_state.start()
+    except Exception as e:
+        logger.error(f"❌ 共享狀態後端無法使用，各 worker 的狀態將不一致: {e}")
+    outbound_http.start()
+    await mail_job_queue.start()
+    if CONFIG['COMPRESSION_CONFIG']['enabled'] and CONFIG['COMPRESSION_CONFIG']['static_precompress']:
+        try:
+            count = await blocking_executor.run_io(static_files.precompress)
+            logger.info(f"🗜️ 靜態檔案預先壓縮: {count} 個檔案，耗時 {compression_stats.precompress_seconds:.2f}s")
+        except Exception as e:
+            logger.warning(f"⚠️ 靜態檔案預先壓縮失敗，改送原始檔案: {e}")
+    try:
+        pages = await blocking_executor.run_io(page_cache.load_all)
+        logger.info(f"📄 頁面快取: 載入 {pages} 個頁面{'（監看檔案變更）' if page_cache.watch else ''}")
+    except Exception as e:
+        logger.warning(f"⚠️ 頁面快取載入失敗，改於首次請求時載入: {e}")
     logger.info(f"📡 N8N Webhook: {CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url']}")
     logger.info(f"🌐 主網站: http://{CONFIG['SERVER_CONFIG']['host']}:{CONFIG['SERVER_CONFIG']['port']}")
     logger.info(f"📧 郵件頁面: http://{CONFIG['SERVER_CONFIG']['host']}:{CONFIG['SERVER_CONFIG']['port']}/mail")
     logger.info(f"📖 API文檔: http://{CONFIG['SERVER_CONFIG']['host']}:{CONFIG['SERVER_CONFIG']['port']}/api/docs")
 
-    # 測試黃金價格 API
-    try:
-        logger.info("🔍 測試黃金價格 API...")
-        import yfinance as yf
-        test_ticker = yf.Ticker("GC=F")
-        test_data = test_ticker.history(period="1d")
-        if not test_data.empty:
-            logger.info("✅ 黃金價格 API 連接正常")
-        else:
-            logger.warning("⚠️ 黃金價格 API 可能有問題，將使用模擬數據")
-    except Exception as e:
-        logger.warning(f"⚠️ 黃金價格 API 測試失敗: {str(e)}，將使用模擬數據")
+    # 上游探測與數據預熱在背景進行，啟動不等待 Yahoo Finance
+    warmup_task = asyncio.create_task(warm_up())
+
+    startup_state["startup_ms"] = round((time.perf_counter() - startup_started) * 1000, 1)
+    logger.info(f"⏱️ 啟動完成，耗時 {startup_state['startup_ms']:.1f} ms（背景預熱進行中）")
 
     yield
 
     # 關閉時
     logger.info("🛑 市場分析系統關閉中...")
+    if not warmup_task.done():
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+    event_broadcaster.close()
+    await dependency_prober.stop()
+    await mail_job_queue.stop()
+    await market_data_refresher.stop()
+    await shared_state.stop()
+    state_backend.close()
+    await outbound_http.close()
+    blocking_executor.shutdown()
+
+
+def summarize_latencies(latencies) -> Dict[str, Optional[float]]:
+    """延遲樣本 (ms) 的摘要統計"""
+    values = np.array(latencies, dtype=float)
+    if not len(values):
+        return {"last_ms": None, "avg_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+    return {
+        "last_ms": round(float(values[-1]), 1),
+        "avg_ms": round(float(values.mean()), 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "max_ms": round(float(values.max()), 1)
+    }
 
 
-# 初始化 FastAPI
-app = FastAPI(
-    title=CONFIG['SYSTEM_INFO']['name'],
-    description=CONFIG['SYSTEM_INFO']['description'],
-    version=CONFIG['SYSTEM_INFO']['version'],
-    docs_url="/api/docs",
-    redoc_url="/api/redoc",
-    lifespan=lifespan
-)
-
-# CORS 設定
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# 掛載靜態檔案
-app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
+# 對外 HTTP 連線
+class OutboundHTTPClient:
+    """共用的 httpx.AsyncClient - 連線池與 keep-alive 重複使用 TLS 連線，並記錄各目標的延遲"""
 
+    # 每個目標保留最近的延遲樣本數
+    LATENCY_SAMPLES = 200
 
-# Web 路由
-@app.get("/", response_class=HTMLResponse)
-async def home():
-    """主頁面 - 顯示市場數據和黃金價格"""
-    html_file = Path("frontend") / "index.html"
-    if html_file.exists():
-        with open(html_file, 'r', encoding='utf-8') as f:
-            return HTMLResponse(content=f.read())
-    return HTMLResponse(content="<h1>首頁檔案不存在</h1>", status_code=404)
+    def __init__(self, max_connections: int, max_keepalive_connections: int, keepalive_expiry: float, http2: bool):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._targets: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 在 lifespan 之外（例如測試腳本）使用時延遲建立
+        if self._client is None or self._client.is_closed:
+            self.start()
+        return self._client
+
+    def start(self):
+        self._client = httpx.AsyncClient(
+            limits=self.limits,
+            http2=self.http2,
+            timeout=CONFIG['WEBHOOK_CONFIG']['timeout']
+        )
+        logger.info(f"🔌 對外 HTTP 連線池已建立 (HTTP/2: {'啟用' if self.http2 else '未啟用'})")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, target: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """發送請求並以 target 名稱記錄延遲與錯誤，本次請求的延遲附在 response.extensions["latency_ms"]"""
+        stats = self._targets.setdefault(target, {
+            "requests": 0,
+            "errors": 0,
+            "latencies": deque(maxlen=self.LATENCY_SAMPLES),
+            "last_status": None,
+            "last_at": None
+        })
+        stats["requests"] += 1
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            stats["errors"] += 1
+            stats["last_status"] = "error"
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            stats["latencies"].append(latency_ms)
+            stats["last_at"] = datetime.now().isoformat()
+        stats["last_status"] = response.status_code
+        # 同一目標可能有並行請求，延遲隨回應返回而不是從共用的樣本中讀取
+        response.extensions["latency_ms"] = latency_ms
+        return response
+
+    @staticmethod
+    def latency_ms(response: httpx.Response) -> Optional[float]:
+        latency = response.extensions.get("latency_ms")
+        return round(latency, 1) if latency is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        targets = {}
+        for target, stats in self._targets.items():
+            targets[target] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "last_status": stats["last_status"],
+                "last_at": stats["last_at"],
+                **summarize_latencies(stats["latencies"])
+            }
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "targets": targets
+        }
 
 
-@app.get("/mail", response_class=HTMLResponse)
-async def mail_page():
-    """郵件發送頁面"""
-    html_file = Path("frontend") / "mail.html"
-    if html_file.exists():
-        with open(html_file, 'r', encoding='utf-8') as f:
-            return HTMLResponse(content=f.read())
-    return HTMLResponse(content="<h1>郵件頁面檔案不存在</h1>", status_code=404)
+outbound_http = OutboundHTTPClient(**CONFIG['HTTP_CLIENT_CONFIG'])
 
 
-# 全域變數 - 增強版本
-stored_data = {}
-system_stats = {
-    "total_reports": 0,
-    "today_reports": 0,
-    "last_reset": datetime.now().date(),
-    "uptime_start": datetime.now(),
-    "last_data_received": None,
-    "api_calls": 0,
-    "gold_price_calls": 0,
-    "errors": 0
-}
+# 郵件發送佇列
+class MailQueueFull(Exception):
+    """待投遞的郵件數量已達上限"""
 
 
-# API 路由
-@app.post("/api/n8n-data")
-async def receive_n8n_data(request: Request):
-    """接收來自 N8N 的市場分析資料 - 修正版本"""
-    try:
-        global stored_data, system_stats
+class MailJobQueue:
+    """持久化的 N8N 郵件投遞佇列 - SQLite 保存工作，重啟後繼續投遞
 
-        raw_data = await request.json()
-        logger.info(f"📨 收到 N8N 原始資料大小: {len(json.dumps(raw_data, ensure_ascii=False))} 字元")
-        logger.info(f"📨 收到 N8N 資料: {json.dumps(raw_data, ensure_ascii=False)[:500]}...")
+    狀態: queued → sending → delivered；失敗時 retrying（指數退避），超過次數後 dead 並寫入 dead-letter 表。
+    sending 帶有租約 (claimed_at)，只有租約過期的工作會被重新排入，多個 worker 共用佇列時不會重複投遞。
+    """
 
-        # 增強的數據處理邏輯
+    PENDING_STATUSES = ('queued', 'sending', 'retrying')
+
+    def __init__(self, db_path, concurrency: int, max_attempts: int, retry_base: float, retry_max: float,
+                 max_pending: int, poll_interval: float, sending_lease: float):
+        self.db_path = Path(db_path)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.sending_lease = sending_lease
+        self._last_recover = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers = []
+        self.delivered = 0
+        self.retries = 0
+        self.dead = 0
+        self.rejected = 0
+        self.recovered = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS mail_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    recipient TEXT,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    delivered_at TEXT,
+                    last_error TEXT,
+                    response_status INTEGER,
+                    response_text TEXT,
+                    claimed_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_mail_jobs_due ON mail_jobs (status, next_attempt_at);
+                CREATE TABLE IF NOT EXISTS mail_dead_letters (
+                    job_id TEXT PRIMARY KEY,
+                    recipient TEXT,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    failed_at TEXT NOT NULL
+                );
+            """)
+            # 舊版資料庫沒有租約欄位
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(mail_jobs)")}
+            if 'claimed_at' not in columns:
+                conn.execute("ALTER TABLE mail_jobs ADD COLUMN claimed_at REAL")
+                conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _enqueue(self, payload, recipient: str) -> str:
+        now = datetime.now().isoformat()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connect()
+            pending = conn.execute(
+                f"SELECT COUNT(*) FROM mail_jobs WHERE status IN ({','.join('?' * len(self.PENDING_STATUSES))})",
+                self.PENDING_STATUSES
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                raise MailQueueFull(f"郵件佇列已滿 ({pending}/{self.max_pending})")
+            conn.execute(
+                "INSERT INTO mail_jobs (id, status, recipient, payload, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, recipient, payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False),
+                 time.time(), now, now)
+            )
+            conn.commit()
+        return job_id
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """取出一個到期的工作並標記為 sending（記錄租約開始時間）"""
+        # 其他 worker 中斷時留下的 sending 工作在租約過期後重新排入
+        if time.time() - self._last_recover >= self.sending_lease / 2:
+            self.recovered += self._recover()
+        with self._lock:
+            conn = self._connect()
+            job = conn.execute(
+                "SELECT * FROM mail_jobs WHERE status IN ('queued', 'retrying') AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+            if job is None:
+                return None
+            # 多個 worker 共用同一個佇列時，只有狀態仍未被改變的一方取得工作
+            cursor = conn.execute(
+                "UPDATE mail_jobs SET status = 'sending', attempts = attempts + 1, updated_at = ?, claimed_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'retrying')",
+                (datetime.now().isoformat(), time.time(), job['id'])
+            )
+            conn.commit()
+            return job if cursor.rowcount == 1 else None
+
+    def _complete(self, job_id: str, response_status: int, response_text: str):
+        now = datetime.now().isoformat()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE mail_jobs SET status = 'delivered', delivered_at = ?, updated_at = ?, last_error = NULL, "
+                "response_status = ?, response_text = ? WHERE id = ?",
+                (now, now, response_status, response_text, job_id)
+            )
+            conn.commit()
+
+    def _fail(self, job: sqlite3.Row, error: str, response_status: Optional[int] = None) -> str:
+        """記錄失敗 - 未達上限時以指數退避重新排程，否則移入 dead-letter"""
+        attempts = job['attempts'] + 1
+        now = datetime.now().isoformat()
+        with self._lock:
+            conn = self._connect()
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE mail_jobs SET status = 'dead', updated_at = ?, last_error = ?, response_status = ? "
+                    "WHERE id = ?",
+                    (now, error, response_status, job['id'])
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO mail_dead_letters (job_id, recipient, payload, attempts, last_error, "
+                    "failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job['id'], job['recipient'], job['payload'], attempts, error, now)
+                )
+                status = 'dead'
+            else:
+                delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                conn.execute(
+                    "UPDATE mail_jobs SET status = 'retrying', next_attempt_at = ?, updated_at = ?, last_error = ?, "
+                    "response_status = ? WHERE id = ?",
+                    (time.time() + delay, now, error, response_status, job['id'])
+                )
+                status = 'retrying'
+            conn.commit()
+        return status
+
+    def _recover(self) -> int:
+        """將租約已過期的 sending 工作重新排入佇列 - 其他 worker 仍在投遞中的工作不受影響"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            recovered = conn.execute(
+                "UPDATE mail_jobs SET status = 'retrying', next_attempt_at = ?, updated_at = ? "
+                "WHERE status = 'sending' AND (claimed_at IS NULL OR claimed_at < ?)",
+                (now, datetime.now().isoformat(), now - self.sending_lease)
+            ).rowcount
+            conn.commit()
+            self._last_recover = now
+        return recovered
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._connect().execute(
+                "SELECT id, status, recipient, attempts, next_attempt_at, created_at, updated_at, delivered_at, "
+                "last_error, response_status, response_text FROM mail_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if job is None:
+            return None
+        job = dict(job)
+        job['max_attempts'] = self.max_attempts
+        next_attempt_at = job.pop('next_attempt_at')
+        job['next_attempt_at'] = datetime.fromtimestamp(next_attempt_at).isoformat() \
+            if job['status'] in ('queued', 'retrying') else None
+        return job
+
+    def _counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM mail_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    async def enqueue(self, payload, recipient: str) -> str:
+        """排入投遞佇列 - payload 為 dict 或已序列化的 JSON 字串"""
+        try:
+            job_id = await blocking_executor.run_io(self._enqueue, payload, recipient)
+        except MailQueueFull:
+            self.rejected += 1
+            raise
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await blocking_executor.run_io(self._get, job_id)
+
+    async def _deliver(self, job: sqlite3.Row):
+        response_status = None
+        try:
+            response = await outbound_http.request(
+                "n8n_webhook",
+                "POST",
+                CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url'],
+                content=job['payload'].encode('utf-8'),
+                headers={'Content-Type': 'application/json'}
+            )
+            response_status = response.status_code
+            if 200 <= response.status_code < 300:
+                await blocking_executor.run_io(
+                    self._complete, job['id'], response.status_code, response.text[:100] if response.text else ""
+                )
+                self.delivered += 1
+                logger.info(f"📧 郵件已投遞到 N8N: {job['recipient']} (job {job['id']})")
+                return
+            error = f"N8N webhook 回應錯誤: {response.status_code} - {response.text[:200]}"
+        except httpx.TimeoutException:
+            error = "請求超時"
+        except httpx.ConnectError:
+            error = "無法連接到 N8N webhook"
+        except Exception as e:
+            error = str(e)
+
+        status = await blocking_executor.run_io(self._fail, job, error, response_status)
+        if status == 'dead':
+            self.dead += 1
+            logger.error(f"❌ 郵件投遞失敗已達上限，移入 dead-letter: {job['recipient']} (job {job['id']}) - {error}")
+        else:
+            self.retries += 1
+            logger.warning(f"⚠️ 郵件投遞失敗，稍後重試: {job['recipient']} (job {job['id']}) - {error}")
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await blocking_executor.run_io(self._claim)
+                if job is not None:
+                    await self._deliver(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 郵件佇列 worker 錯誤: {e}")
+
+            # 沒有到期工作時等待新工作或下一次輪詢
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def start(self):
+        if self._workers:
+            return
+        recovered = await blocking_executor.run_io(self._recover)
+        if recovered:
+            self.recovered += recovered
+            logger.info(f"📬 重新排入 {recovered} 封租約過期的中斷郵件")
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"📬 郵件投遞佇列已啟動: {self.concurrency} 個 worker")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "max_attempts": self.max_attempts,
+            "max_pending": self.max_pending,
+            "jobs": await blocking_executor.run_io(self._counts),
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "dead": self.dead,
+            "rejected": self.rejected,
+            "recovered": self.recovered,
+            "sending_lease": self.sending_lease
+        }
+
+
+mail_job_queue = MailJobQueue(**CONFIG['MAIL_QUEUE_CONFIG'])
+
+
+# 市場分析報告歷史
+class ReportHistoryStore:
+    """保存每一份 N8N 報告的 SQLite 歷史 - 摘要欄位與大型 HTML 內容分表存放
+
+    reports 只有小欄位並以 (received_ts) 與 (label, received_ts) 建立索引，時間範圍查詢以 keyset 分頁，
+    資料量大時仍只讀取一頁；HTML 報告與原始資料放在 report_bodies，只有查詢單筆時才讀取。
+    """
+
+    SUMMARY_COLUMNS = ('id', 'received_time', 'received_timestamp', 'score', 'label', 'positive', 'neutral',
+                       'negative', 'summary', 'data_source')
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    received_ts REAL NOT NULL,
+                    received_time TEXT NOT NULL,
+                    received_timestamp TEXT NOT NULL,
+                    score INTEGER,
+                    label TEXT,
+                    positive INTEGER,
+                    neutral INTEGER,
+                    negative INTEGER,
+                    summary TEXT,
+                    data_source TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_reports_received ON reports (received_ts);
+                CREATE INDEX IF NOT EXISTS idx_reports_label_received ON reports (label, received_ts);
+                CREATE TABLE IF NOT EXISTS report_bodies (
+                    report_id INTEGER PRIMARY KEY REFERENCES reports (id),
+                    email_report_html TEXT,
+                    email_report TEXT,
+                    raw_data TEXT
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _add(self, report: Dict[str, Any]) -> int:
+        received = datetime.fromisoformat(report['received_timestamp'])
+        # 原始資料中的 HTML 已另存，不重複保存
+        raw_data = {key: value for key, value in report.get('raw_data', {}).items() if key != 'emailReportHtml'}
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "INSERT INTO reports (received_ts, received_time, received_timestamp, score, label, positive, "
+                "neutral, negative, summary, data_source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (received.timestamp(), report['received_time'], report['received_timestamp'], report['score'],
+                 report['label'], report['positive'], report['neutral'], report['negative'], report['summary'],
+                 report.get('data_source'))
+            )
+            conn.execute(
+                "INSERT INTO report_bodies (report_id, email_report_html, email_report, raw_data) VALUES (?, ?, ?, ?)",
+                (cursor.lastrowid, report.get('emailReportHtml', ''), report.get('email_report', ''),
+                 json.dumps(raw_data, ensure_ascii=False))
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def _query(self, start: Optional[datetime], end: Optional[datetime], label: Optional[str], limit: int,
+               cursor: Optional[tuple]) -> List[Dict[str, Any]]:
+        conditions, params = [], []
+        if label:
+            conditions.append("label = ?")
+            params.append(label)
+        if start is not None:
+            conditions.append("received_ts >= ?")
+            params.append(start.timestamp())
+        if end is not None:
+            conditions.append("received_ts <= ?")
+            params.append(end.timestamp())
+        if cursor is not None:
+            # keyset 分頁：從上一頁最後一筆之後繼續，不受 OFFSET 深度影響
+            # 以 row value 比較，SQLite 才能把游標當作索引範圍的上界
+            conditions.append("(received_ts, id) < (?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT received_ts, {', '.join(self.SUMMARY_COLUMNS)} FROM reports {where} "
+                f"ORDER BY received_ts DESC, id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _get(self, report_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join('r.' + column for column in self.SUMMARY_COLUMNS)}, "
+                f"b.email_report_html, b.email_report, b.raw_data "
+                f"FROM reports r LEFT JOIN report_bodies b ON b.report_id = r.id WHERE r.id = ?",
+                (report_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        report = dict(row)
+        report['emailReportHtml'] = report.pop('email_report_html') or ""
+        report['raw_data'] = json.loads(report['raw_data']) if report['raw_data'] else {}
+        return report
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    async def add(self, report: Dict[str, Any]) -> int:
+        return await blocking_executor.run_io(self._add, report)
+
+    async def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    label: Optional[str] = None, limit: int = 50, cursor: Optional[tuple] = None):
+        """查詢一頁報告摘要（新到舊），返回 (reports, next_cursor)"""
+        rows = await blocking_executor.run_io(self._query, start, end, label, limit + 1, cursor)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['received_ts']!r}_{rows[-1]['id']}"
+        for row in rows:
+            row.pop('received_ts')
+        return rows, next_cursor
+
+    async def get(self, report_id: int) -> Optional[Dict[str, Any]]:
+        return await blocking_executor.run_io(self._get, report_id)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"db_path": str(self.db_path), "reports": await blocking_executor.run_io(self._count)}
+
+
+report_history = ReportHistoryStore(CONFIG['REPORT_HISTORY_CONFIG']['db_path']) \
+    if CONFIG['REPORT_HISTORY_CONFIG']['enabled'] else None
+
+
+# 依賴服務健康探測
+class DependencyProber:
+    """背景探測依賴服務並快取結果 - 健康檢查端點不再於請求中進行網路 I/O"""
+
+    def __init__(self, interval_seconds: float, timeout: float):
+        self.interval_seconds = interval_seconds
+        self.timeout = timeout
+        self.probes = {
+            "yfinance": self._probe_yfinance,
+            "n8n_webhook": self._probe_n8n_webhook
+        }
+        # 必要依賴異常時 readiness 為 degraded
+        self.required = {"yfinance"}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _probe_yfinance(self) -> str:
+        test_data = await blocking_executor.run_io(
+            lambda: yf.Ticker(DEFAULT_SYMBOL).history(period="1d", interval="1d")
+        )
+        return "healthy" if not test_data.empty else "degraded"
+
+    async def _probe_n8n_webhook(self) -> str:
+        # 只建立 TCP 連線，不呼叫 webhook 以免觸發 N8N 工作流程
+        url = urlparse(CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url'])
+        port = url.port or (443 if url.scheme == 'https' else 80)
+        _, writer = await asyncio.open_connection(url.hostname, port)
+        writer.close()
+        return "healthy"
+
+    async def _probe(self, name: str, probe):
+        started = time.perf_counter()
+        error = None
+        try:
+            status = await asyncio.wait_for(probe(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            status, error = "unhealthy", f"逾時 ({self.timeout:g}s)"
+        except Exception as e:
+            status, error = "unhealthy", str(e)
+        self.results[name] = {
+            "status": status,
+            "checked_at": datetime.now().isoformat(),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": error
+        }
+
+    async def probe_all(self):
+        """並行探測所有依賴服務"""
+        await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+        self.cycles += 1
+
+    def status(self, name: str) -> str:
+        return self.results.get(name, {}).get("status", "unknown")
+
+    def readiness(self) -> str:
+        """warming: 啟動預熱尚未完成；starting: 尚未完成第一次探測；degraded: 必要依賴異常；ready: 正常"""
+        if not startup_state["warmup_done"]:
+            return "warming"
+        if not self.results:
+            return "starting"
+        if any(self.status(name) != "healthy" for name in self.required):
+            return "degraded"
+        return "ready"
+
+    async def _run(self, initial_delay: float):
+        await asyncio.sleep(initial_delay)
+        while True:
+            try:
+                await self.probe_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 依賴服務探測錯誤: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self, initial_delay: float = 0):
+        if not self.running:
+            self._task = asyncio.create_task(self._run(initial_delay))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+dependency_prober = DependencyProber(
+    CONFIG['HEALTH_CONFIG']['probe_interval'],
+    CONFIG['HEALTH_CONFIG']['probe_timeout']
+)
+
+
+# 啟動狀態 - 啟動本身不等待上游，預熱在背景進行
+startup_state = {
+    "startup_ms": None,
+    "warmup_done": False,
+    "warmup_seconds": None,
+    "warmed_snapshots": 0
+}
+
+
+async def warm_up():
+    """啟動預熱 - 探測依賴服務並預先填入常用期間的市場數據快照，完成後啟動背景刷新"""
+    started = time.perf_counter()
+    try:
+        # 測試黃金價格 API - 第一次依賴探測的結果同時作為健康檢查快取
+        logger.info("🔍 測試黃金價格 API...")
+        await dependency_prober.probe_all()
+        yfinance_probe = dependency_prober.results["yfinance"]
+        if yfinance_probe["status"] == "healthy":
+            logger.info("✅ 黃金價格 API 連接正常")
+        elif yfinance_probe["error"]:
+            logger.warning(f"⚠️ 黃金價格 API 測試失敗: {yfinance_probe['error']}，將使用模擬數據")
+        else:
+            logger.warning("⚠️ 黃金價格 API 可能有問題，將使用模擬數據")
+        dependency_prober.start(initial_delay=dependency_prober.interval_seconds)
+
+        if yfinance_probe["status"] != "unhealthy":
+            periods = [
+                period for period in CONFIG['MARKET_REFRESH_CONFIG']['warmup_periods'] if period in SUPPORTED_PERIODS
+            ]
+            await asyncio.wait_for(_warm_snapshots(periods), timeout=CONFIG['MARKET_REFRESH_CONFIG']['warmup_timeout'])
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ 市場數據預熱逾時，其餘數據將於請求或背景刷新時載入")
+    except Exception as e:
+        logger.warning(f"⚠️ 市場數據預熱失敗: {e}")
+    finally:
+        startup_state["warmup_done"] = True
+        startup_state["warmup_seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"🔥 預熱完成: {startup_state['warmed_snapshots']} 個快照，耗時 {startup_state['warmup_seconds']:.2f}s"
+        )
+
+    if CONFIG['MARKET_REFRESH_CONFIG']['enabled']:
+        market_data_refresher.start()
+
+
+async def _warm_snapshots(periods):
+    symbols = market_data_refresher.symbols
+    for period in periods:
+        # 每個期間一次批次下載所有追蹤商品
+        try:
+            await prefetch_market_data(symbols, period, "1d")
+        except Exception as e:
+            logger.warning(f"⚠️ 預熱 {period} 批次下載失敗: {e}")
+            continue
+        for symbol in symbols:
+            if await market_data_refresher.refresh(symbol, period, "1d") is not None:
+                startup_state["warmed_snapshots"] += 1
+
+
+# orjson 選項: NumPy 陣列與純量原生序列化、允許非字串鍵（如以整數週期為鍵的字典）
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _json_default(value: Any):
+    """orjson 無法原生處理的型別 - pandas 時間、NumPy 其他純量、Pydantic 模型等"""
+    if value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, pd.Timedelta):
+        return value.total_seconds()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    if isinstance(value, (set, frozenset, deque)):
+        return list(value)
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"無法序列化的型別: {type(value).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    """序列化為 UTF-8 JSON - 原生支援 NumPy、datetime 與 pandas Timestamp，NaN 輸出為 null"""
+    return orjson.dumps(content, default=_json_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """以 orjson 序列化的 JSON 回應（應用程式預設回應類別）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class FastJSONRoute(APIRoute):
+    """端點返回 dict/list 時直接以 FastJSONResponse 回應，略過 jsonable_encoder 的逐值遞迴轉換
+
+    FastAPI 對未宣告 response_model 的返回值一律先經 jsonable_encoder，
+    大型巢狀回應（圖表序列、報告 HTML）的主要成本在此；NumPy 與 pandas 型別交給 orjson 處理
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        status_code = kwargs.get("status_code") or 200
+        original_endpoint = endpoint
+
+        @wraps(original_endpoint)
+        async def fast_json_endpoint(*args, **values):
+            result = await original_endpoint(*args, **values)
+            if isinstance(result, (dict, list)):
+                return FastJSONResponse(result, status_code=status_code)
+            return result
+
+        response_model = kwargs.get("response_model")
+        if asyncio.iscoroutinefunction(endpoint) and (
+            response_model is None or isinstance(response_model, DefaultPlaceholder)
+        ):
+            endpoint = fast_json_endpoint
+        super().__init__(path, endpoint, **kwargs)
+
+
+# 每次啟動不同，避免重啟後版本計數器重新起算時與舊 ETag 相撞
+BOOT_ID = uuid.uuid4().hex[:8]
+# 條件式 GET 統計: 端點 -> {'requests', 'conditional', 'not_modified'}
+conditional_get_stats: Dict[str, Dict[str, int]] = {}
+
+
+def make_etag(*parts) -> str:
+    """由數據版本組成強 ETag"""
+    return '"' + "-".join(str(part) for part in (BOOT_ID, *parts)) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否包含 etag（弱比較；忽略壓縮中介層附加的 -br/-gzip 後綴）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip().removeprefix('W/')
+        # 只移除一個後綴
+        for suffix in ('-br"', '-gzip"'):
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    # no-cache: 瀏覽器每次都需以 If-None-Match 重新驗證
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def check_not_modified(request: Request, endpoint: str, etag: str) -> Optional[Response]:
+    """處理 If-None-Match - 版本未變時返回 304（不組裝也不序列化回應內容），否則返回 None"""
+    stats = conditional_get_stats.setdefault(endpoint, {"requests": 0, "conditional": 0, "not_modified": 0})
+    stats["requests"] += 1
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        stats["conditional"] += 1
+    if etag_matches(if_none_match, etag):
+        stats["not_modified"] += 1
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
+
+
+def conditional_get_summary() -> Dict[str, Any]:
+    endpoints = {
+        endpoint: {
+            **stats,
+            "not_modified_ratio": round(stats["not_modified"] / stats["requests"], 3) if stats["requests"] else None
+        }
+        for endpoint, stats in conditional_get_stats.items()
+    }
+    requests_total = sum(stats["requests"] for stats in conditional_get_stats.values())
+    not_modified_total = sum(stats["not_modified"] for stats in conditional_get_stats.values())
+    return {
+        "requests": requests_total,
+        "not_modified": not_modified_total,
+        "not_modified_ratio": round(not_modified_total / requests_total, 3) if requests_total else None,
+        "endpoints": endpoints
+    }
+
+
+# 伺服器推送
+class StreamSubscriberLimit(Exception):
+    """訂閱者數量已達上限"""
+
+
+class EventBroadcaster:
+    """SSE 事件廣播 - 每個事件只序列化一次，再放入所有訂閱者的有界佇列
+
+    慢速客戶端的佇列塞滿時不阻塞發布者：丟棄其積壓的事件，改送一個 resync 事件，
+    客戶端收到後以一般 API 重新載入（搭配 ETag，未變更的部分只會得到 304）。
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = max(2, queue_size)
+        self.max_subscribers = max_subscribers
+        self._subscribers: set = set()
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+        self.rejected = 0
+        self.connections = 0
+        self.last_event: Dict[str, Any] = {}
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        if len(self._subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            raise StreamSubscriberLimit()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        self.connections += 1
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @staticmethod
+    def format_event(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+        frame = f"event: {event}\n".encode()
+        if event_id is not None:
+            frame += f"id: {event_id}\n".encode()
+        return frame + b"data: " + dumps_json(data) + b"\n\n"
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """廣播事件到所有訂閱者（不等待，須在事件迴圈執行緒呼叫）"""
+        self.published += 1
+        self.last_event[event] = data
+        if not self._subscribers:
+            return
+        frame = self.format_event(event, data, self.published)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # 背壓: 丟棄積壓的舊事件，只留一個 resync
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.format_event("resync", {"reason": "slow_consumer"}))
+                self.resyncs += 1
+
+    def close(self):
+        """關閉所有串流（服務關閉時），讓連線中的回應結束"""
+        for queue in self._subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self.subscribers,
+            "max_subscribers": self.max_subscribers,
+            "queue_size": self.queue_size,
+            "connections": self.connections,
+            "published": self.published,
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+            "rejected": self.rejected
+        }
+
+
+event_broadcaster = EventBroadcaster(
+    CONFIG['STREAM_CONFIG']['queue_size'], CONFIG['STREAM_CONFIG']['max_subscribers']
+)
+
+
+def price_event(symbol: str, period: str, interval: str, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """報價更新的推送內容 - 只含最新價格欄位與數據版本，完整圖表數據由客戶端以 ETag 重新取得"""
+    data = snapshot["payload"]["data"]
+    return {
+        "symbol": symbol,
+        "period": period,
+        "interval": interval,
+        "version": snapshot["version"],
+        **{key: data.get(key) for key in ("current_price", "change", "change_percent", "market_status",
+                                          "last_updated_formatted")}
+    }
+
+
+def report_event(report: Dict[str, Any]) -> Dict[str, Any]:
+    """N8N 報告的推送內容 - 摘要欄位，不含 HTML 報告"""
+    return {
+        "version": data_versions["stored_data"],
+        **{key: report.get(key) for key in ("report_id", "received_time", "score", "label",
+                                            "positive", "neutral", "negative", "summary")}
+    }
+
+
+# 可壓縮的內容類型；串流回應（SSE、NDJSON 進度）逐段送出，不緩衝壓縮
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+# 超過此大小的回應在執行緒池壓縮，避免阻塞事件循環
+COMPRESSION_OFFLOAD_BYTES = 256 * 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """依 Accept-Encoding 選擇 q 值最高的壓縮格式 - q 值相同時依伺服器偏好（br 優先於 gzip，需安裝 brotli），
+    未列出的格式沿用 * 的 q 值；都不接受時返回 None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        token, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in (("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        # 嚴格大於：q 值相同時保留較偏好的格式
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5):
+    """壓縮回應內容，返回 (壓縮後內容, 消耗的 CPU 秒數)"""
+    started = time.thread_time()
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=brotli_quality)
+    else:
+        compressed = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    return compressed, time.thread_time() - started
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(STREAMING_TYPES)
+
+
+class CompressionStats:
+    """回應壓縮統計 - 各編碼的回應數、壓縮前後位元組與 CPU 成本"""
+
+    def __init__(self):
+        self.encodings: Dict[str, Dict[str, float]] = {}
+        self.skipped = {"small": 0, "not_compressible": 0, "streaming": 0}
+        self.static_served = {"br": 0, "gzip": 0, "identity": 0}
+        self.static_bytes_saved = 0
+        self.precompressed_files = 0
+        self.precompress_seconds: Optional[float] = None
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        entry = self.encodings.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_ms": 0.0})
+        entry["responses"] += 1
+        entry["bytes_in"] += bytes_in
+        entry["bytes_out"] += bytes_out
+        entry["cpu_ms"] += cpu_seconds * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        encodings = {
+            encoding: {
+                "responses": entry["responses"],
+                "bytes_in": entry["bytes_in"],
+                "bytes_out": entry["bytes_out"],
+                "ratio": round(entry["bytes_out"] / entry["bytes_in"], 3) if entry["bytes_in"] else None,
+                "cpu_ms_total": round(entry["cpu_ms"], 1),
+                "cpu_ms_per_response": round(entry["cpu_ms"] / entry["responses"], 3) if entry["responses"] else None
+            }
+            for encoding, entry in self.encodings.items()
+        }
+        return {
+            "enabled": CONFIG['COMPRESSION_CONFIG']['enabled'],
+            "brotli_available": BROTLI_AVAILABLE,
+            "minimum_size": CONFIG['COMPRESSION_CONFIG']['minimum_size'],
+            "encodings": encodings,
+            "bytes_saved": sum(entry["bytes_in"] - entry["bytes_out"] for entry in self.encodings.values()),
+            "skipped": dict(self.skipped),
+            "static": {
+                "precompressed_files": self.precompressed_files,
+                "precompress_seconds": self.precompress_seconds,
+                "served": dict(self.static_served),
+                "bytes_saved": self.static_bytes_saved
+            }
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """動態回應壓縮（ASGI 中介層）- 依 Accept-Encoding 協商 br/gzip
+
+    只壓縮單段回應：串流回應（StreamingResponse、分段送出的檔案）、已帶 Content-Encoding
+    （預先壓縮的靜態檔案）、非文字類型或小於 minimum_size 的回應原樣送出
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # 延後送出標頭，等第一段內容決定是否壓縮
+                start_message = message
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            compress = self._should_compress(start_message["status"], headers, body, message.get("more_body", False))
+            if compress:
+                if len(body) >= COMPRESSION_OFFLOAD_BYTES:
+                    compressed, cpu_seconds = await blocking_executor.run_io(
+                        compress_body, body, encoding, self.gzip_level, self.brotli_quality
+                    )
+                else:
+                    compressed, cpu_seconds = compress_body(body, encoding, self.gzip_level, self.brotli_quality)
+                compression_stats.record(encoding, len(body), len(compressed), cpu_seconds)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                # 壓縮後是不同的表示，強 ETag 附加編碼後綴（etag_matches 比對時忽略）
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/") and etag.endswith('"'):
+                    headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                message = {**message, "body": compressed}
+
+            await send(start_message)
+            start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, status: int, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if more_body or content_type.lower().startswith(STREAMING_TYPES):
+            compression_stats.skipped["streaming"] += 1
+            return False
+        if not is_compressible(content_type):
+            compression_stats.skipped["not_compressible"] += 1
+            return False
+        if len(body) < self.minimum_size:
+            compression_stats.skipped["small"] += 1
+            return False
+        return True
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """靜態檔案 - precompress() 將可壓縮的檔案預先壓縮為 .br/.gz 存放於快取目錄，依 Accept-Encoding 直接送出
+
+    壓縮檔比來源檔案舊（啟動後修改過）時改送原始檔案，待下次 precompress() 更新
+    """
+
+    def __init__(self, *, directory: str, cache_dir: str, minimum_size: int = 1024, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.source_dir = Path(directory)
+        self.cache_dir = Path(cache_dir)
+        self.minimum_size = minimum_size
+        # 來源檔案實際路徑 -> {encoding: 壓縮檔路徑}
+        self.variants: Dict[str, Dict[str, str]] = {}
+
+    def precompress(self) -> int:
+        """預先壓縮所有可壓縮的靜態檔案（壓縮檔已較來源新時略過），返回壓縮檔數量"""
+        started = time.perf_counter()
+        encodings = (("br", ".br"), ("gzip", ".gz")) if BROTLI_AVAILABLE else (("gzip", ".gz"),)
+        variants = {}
+        for source in sorted(self.source_dir.rglob('*')):
+            content_type = mimetypes.guess_type(source.name)[0] or ""
+            if not source.is_file() or not is_compressible(content_type):
+                continue
+            source_stat = source.stat()
+            if source_stat.st_size < self.minimum_size:
+                continue
+            relative = source.relative_to(self.source_dir).as_posix()
+            body = None
+            for encoding, suffix in encodings:
+                target = self.cache_dir / (relative + suffix)
+                if not target.exists() or target.stat().st_mtime < source_stat.st_mtime:
+                    if body is None:
+                        body = source.read_bytes()
+                    compressed, _ = compress_body(body, encoding, gzip_level=9, brotli_quality=11)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    temp = target.with_name(target.name + ".tmp")
+                    temp.write_bytes(compressed)
+                    os.replace(temp, target)
+                variants.setdefault(os.path.realpath(source), {})[encoding] = str(target)
+
+        self.variants = variants
+        compression_stats.precompressed_files = sum(len(files) for files in variants.values())
+        compression_stats.precompress_seconds = round(time.perf_counter() - started, 3)
+        return compression_stats.precompressed_files
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200):
+        variants = self.variants.get(os.path.realpath(full_path))
+        if not variants:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        variant_path = variants.get(encoding)
+        variant_stat = os.stat(variant_path) if variant_path and os.path.exists(variant_path) else None
+        if variant_stat is None or variant_stat.st_mtime < stat_result.st_mtime:
+            compression_stats.static_served["identity"] += 1
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        compression_stats.static_served[encoding] += 1
+        response = super().file_response(variant_path, variant_stat, scope, status_code)
+        if isinstance(response, FileResponse):
+            compression_stats.static_bytes_saved += stat_result.st_size - variant_stat.st_size
+            response.headers["Content-Type"] = self._content_type(full_path)
+        response.headers["Content-Encoding"] = encoding
+        response.headers.add_vary_header("Accept-Encoding")
+        return response
+
+    @staticmethod
+    def _content_type(path) -> str:
+        content_type = mimetypes.guess_type(str(path))[0] or "text/plain"
+        return f"{content_type}; charset=utf-8" if content_type.startswith("text/") else content_type
+
+
+class PageCache:
+    """HTML 頁面快取 - 檔案讀入記憶體並預先壓縮各編碼版本，請求只做記憶體查找
+
+    ETag 為內容雜湊（壓縮版本附加編碼後綴，與 CompressionMiddleware 相同），並附 Last-Modified；
+    watch 模式（開發用）每次請求比對檔案修改時間，變更時重新載入。
+    """
+
+    def __init__(self, pages: Dict[str, str], watch: bool = False, compress: bool = True):
+        self.pages = {name: Path(path) for name, path in pages.items()}
+        self.watch = watch
+        self.compress = compress
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.not_modified = 0
+        self.reloads = 0
+        self.misses = 0
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """讀取並壓縮單一頁面（阻塞 I/O 與 CPU）；檔案不存在時返回 None"""
+        path = self.pages[name]
+        try:
+            stat_result = path.stat()
+            body = path.read_bytes()
+        except FileNotFoundError:
+            self._entries.pop(name, None)
+            return None
+
+        variants = {"identity": body}
+        if self.compress:
+            for encoding in (("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)):
+                variants[encoding], _ = compress_body(body, encoding, gzip_level=9, brotli_quality=11)
+        entry = {
+            "variants": variants,
+            "etag": hashlib.sha1(body).hexdigest()[:16],
+            "mtime": stat_result.st_mtime,
+            "last_modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "loaded_at": datetime.now()
+        }
+        self._entries[name] = entry
+        self.reloads += 1
+        return entry
+
+    def load_all(self) -> int:
+        return sum(self.load(name) is not None for name in self.pages)
+
+    def _is_stale(self, name: str, entry: Dict[str, Any]) -> bool:
+        try:
+            return self.pages[name].stat().st_mtime != entry["mtime"]
+        except FileNotFoundError:
+            return True
+
+    async def get(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(name)
+        if entry is None or (self.watch and self._is_stale(name, entry)):
+            self.misses += 1
+            entry = await blocking_executor.run_io(self.load, name)
+        return entry
+
+    @staticmethod
+    def _not_modified_since(request: Request, entry: Dict[str, Any]) -> bool:
+        if_modified_since = request.headers.get("if-modified-since")
+        if not if_modified_since:
+            return False
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= int(entry["mtime"])
+        except (TypeError, ValueError):
+            return False
+
+    async def response(self, request: Request, name: str) -> Optional[Response]:
+        """頁面回應；頁面不存在時返回 None"""
+        entry = await self.get(name)
+        if entry is None:
+            return None
+
+        etag = f'"{entry["etag"]}"'
+        if_none_match = request.headers.get("if-none-match")
+        not_modified = etag_matches(if_none_match, etag) if if_none_match else self._not_modified_since(request, entry)
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", "")) if self.compress else None
+        if encoding not in entry["variants"]:
+            encoding = None
+        headers = {
+            "ETag": f'"{entry["etag"]}-{encoding}"' if encoding else etag,
+            "Last-Modified": entry["last_modified"],
+            # 頁面引用的腳本可能隨時更新，每次使用前都需重新驗證
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding"
+        }
+        if not_modified:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        self.hits += 1
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=entry["variants"][encoding or "identity"], media_type="text/html; charset=utf-8", headers=headers
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "watch": self.watch,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "pages": {
+                name: {
+                    "bytes": {encoding: len(body) for encoding, body in entry["variants"].items()},
+                    "etag": entry["etag"],
+                    "loaded_at": entry["loaded_at"].isoformat()
+                }
+                for name, entry in self._entries.items()
+            }
+        }
+
+
+page_cache = PageCache(
+    {"home": os.path.join("frontend", "index.html"), "mail": os.path.join("frontend", "mail.html")},
+    watch=CONFIG['PAGE_CACHE_CONFIG']['watch'],
+    compress=CONFIG['COMPRESSION_CONFIG']['enabled']
+)
+
+
+# 初始化 FastAPI
+app = FastAPI(
+    title=CONFIG['SYSTEM_INFO']['name'],
+    description=CONFIG['SYSTEM_INFO']['description'],
+    version=CONFIG['SYSTEM_INFO']['version'],
+    docs_url="/api/docs",
+    redoc_url="/api/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
+)
+app.router.route_class = FastJSONRoute
+
+# CORS 設定
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 回應壓縮
+if CONFIG['COMPRESSION_CONFIG']['enabled']:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=CONFIG['COMPRESSION_CONFIG']['minimum_size'],
+        gzip_level=CONFIG['COMPRESSION_CONFIG']['gzip_level'],
+        brotli_quality=CONFIG['COMPRESSION_CONFIG']['brotli_quality']
+    )
+
+# 掛載靜態檔案（啟動時預先壓縮）
+static_files = PrecompressedStaticFiles(
+    directory="frontend/static",
+    cache_dir=CONFIG['COMPRESSION_CONFIG']['static_cache_dir'],
+    minimum_size=CONFIG['COMPRESSION_CONFIG']['minimum_size']
+)
+app.mount("/static", static_files, name="static")
+
+
+# Web 路由
+@app.get("/", response_class=HTMLResponse)
+async def home(request: Request):
+    """主頁面 - 顯示市場數據和黃金價格（由記憶體頁面快取回應）"""
+    response = await page_cache.response(request, "home")
+    if response is None:
+        return HTMLResponse(content="<h1>首頁檔案不存在</h1>", status_code=404)
+    return response
+
+
+@app.get("/mail", response_class=HTMLResponse)
+async def mail_page(request: Request):
+    """郵件發送頁面（由記憶體頁面快取回應）"""
+    response = await page_cache.response(request, "mail")
+    if response is None:
+        return HTMLResponse(content="<h1>郵件頁面檔案不存在</h1>", status_code=404)
+    return response
+
+
+# 全域變數 - 增強版本
+stored_data = {}
+# 數據版本計數器 - 收到新報告時遞增，作為 /api/current-data 的 ETag
+data_versions = {"stored_data": 0}
+system_stats = {
+    "total_reports": 0,
+    "today_reports": 0,
+    "last_reset": datetime.now().date(),
+    "uptime_start": datetime.now(),
+    "last_data_received": None,
+    "api_calls": 0,
+    "gold_price_calls": 0,
+    "errors": 0
+}
+
+
+class SharedState:
+    """跨 worker 同步的系統狀態 - 最新報告與系統計數器存放於狀態後端
+
+    請求路徑只讀寫本行程的 stored_data/system_stats；背景每 sync_interval 秒把計數器增量寫回後端並取回
+    所有 worker 的合計，其他 worker 收到新報告時載入該報告並推送 SSE report 事件。
+    """
+
+    COUNTERS = ("total_reports", "today_reports", "api_calls", "gold_price_calls", "errors")
+
+    def __init__(self, backend, sync_interval: float):
+        self.backend = backend
+        self.sync_interval = sync_interval
+        self._synced = {name: 0 for name in self.COUNTERS}
+        self._seen_report_version = 0
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.reports_pulled = 0
+        self.errors = 0
+        self.last_sync_at: Optional[datetime] = None
+
+    async def start(self):
+        global BOOT_ID
+        if not self.backend.shared:
+            return
+        # 所有 worker 共用後端保存的實例 ID，ETag 在各 worker 間一致，重啟後也不會與舊版本相撞
+        await blocking_executor.run_io(self.backend.add, "instance_id", BOOT_ID.encode())
+        BOOT_ID = (await blocking_executor.run_io(self.backend.get, "instance_id") or BOOT_ID.encode()).decode()
+        await self.sync()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🔗 共享狀態後端: {self.backend.name}，每 {self.sync_interval:g} 秒同步")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # 寫回最後的計數器增量
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"⚠️ 關閉前同步狀態失敗: {e}")
+
+    async def publish_report(self, report: Dict[str, Any]) -> int:
+        """保存最新報告並遞增報告版本，返回新版本"""
+        def write() -> int:
+            version = self.backend.incr({"report_version": 1})["report_version"]
+            self.backend.set("latest_report", dumps_json({"version": version, "report": report}))
+            return version
+
+        version = await blocking_executor.run_io(write)
+        self._seen_report_version = max(self._seen_report_version, version)
+        return version
+
+    async def sync(self):
+        """寫回計數器增量、取回合計；報告版本比本行程新時載入最新報告"""
+        sent = {name: system_stats[name] - self._synced[name] for name in self.COUNTERS}
+        totals = await blocking_executor.run_io(self.backend.incr, {**sent, "report_version": 0})
+        for name in self.COUNTERS:
+            # 保留同步期間本行程新增、尚未寫回的計數
+            pending = system_stats[name] - self._synced[name] - sent[name]
+            system_stats[name] = totals[name] + pending
+            self._synced[name] = totals[name]
+
+        if totals["report_version"] > self._seen_report_version:
+            self._seen_report_version = totals["report_version"]
+            await self._pull_report()
+        self.syncs += 1
+        self.last_sync_at = datetime.now()
+
+    async def _pull_report(self):
+        global stored_data
+        raw = await blocking_executor.run_io(self.backend.get, "latest_report")
+        if raw is None:
+            return
+        envelope = orjson.loads(raw)
+        if envelope["version"] <= data_versions["stored_data"]:
+            return
+        stored_data = envelope["report"]
+        data_versions["stored_data"] = envelope["version"]
+        system_stats["last_data_received"] = stored_data.get("received_timestamp")
+        self.reports_pulled += 1
+        event_broadcaster.publish("report", report_event(stored_data))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+                if self.syncs % 600 == 0:
+                    await blocking_executor.run_io(self.backend.purge_expired)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"⚠️ 共享狀態同步失敗: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "shared": self.backend.shared,
+            "workers": CONFIG['SERVER_CONFIG']['workers'],
+            "pid": os.getpid(),
+            "sync_interval": self.sync_interval,
+            "syncs": self.syncs,
+            "reports_pulled": self.reports_pulled,
+            "errors": self.errors,
+            "last_sync_at": self.last_sync_at.isoformat() if self.last_sync_at else None,
+            "storage": self.backend.stats()
+        }
+
+
+shared_state = SharedState(state_backend, CONFIG['STATE_CONFIG']['sync_interval'])
+
+
+# API 路由
+ingestion_stats = {
+    "reports": 0,
+    "rejected": 0,
+    "bytes": 0,
+    "latencies": deque(maxlen=200)
+}
+
+
+async def read_body_limited(request: Request, max_bytes: int) -> bytes:
+    """讀取請求內容並在讀取過程中檢查大小上限，超過時返回 413（不必先讀完整個請求）"""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"資料大小 {content_length} bytes 超過上限 {max_bytes} bytes")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"資料大小超過上限 {max_bytes} bytes")
+    return bytes(body)
+
+
+@app.post("/api/n8n-data")
+async def receive_n8n_data(request: Request):
+    """接收來自 N8N 的市場分析資料 - 只解析與驗證一次，大型 emailReportHtml 不重複序列化"""
+    started = time.perf_counter()
+    ingest_config = CONFIG['INGESTION_CONFIG']
+    try:
+        global stored_data, system_stats
+
+        body = await read_body_limited(request, ingest_config['max_body_bytes'])
+        # orjson 解析數 MB 的報告比標準 json 快數倍；JSONDecodeError 為 ValueError，返回 400
+        raw_data = orjson.loads(body)
+
+        # 詳細內容只在 DEBUG 且抽樣到時輸出，避免每次格式化數 MB 的內容
+        log_details = logger.isEnabledFor(logging.DEBUG) and \
+            ingestion_stats["reports"] % ingest_config['log_sample_every'] == 0
+        if log_details:
+            ingestion_logger.debug(f"📨 收到 N8N 資料: {body[:500].decode('utf-8', errors='replace')}...")
+
+        # 增強的數據處理邏輯
         if isinstance(raw_data, list) and len(raw_data) > 0:
             market_data = raw_data[0]
-            logger.info("✅ 處理陣列格式數據，取第一個元素")
         elif isinstance(raw_data, dict):
             market_data = raw_data
-            logger.info("✅ 處理字典格式數據")
         else:
-            logger.error(f"❌ 無效的資料格式: {type(raw_data)}")
+            ingestion_logger.error(f"❌ 無效的資料格式: {type(raw_data)}")
             raise HTTPException(status_code=400, detail=f"無效的資料格式: {type(raw_data)}")
-
-        # 詳細記錄接收到的數據欄位
-        logger.info(f"📊 數據欄位: {list(market_data.keys())}")
-
-        # 數據清理和轉換
-        def safe_int(value, default=0):
-            """安全地轉換為整數"""
-            try:
-                if value is None:
-                    return default
-                return int(float(value))
-            except (ValueError, TypeError):
-                return default
-
-        def safe_str(value, default=""):
-            """安全地轉換為字符串"""
-            try:
-                if value is None:
-                    return default
-                return str(value).strip()
-            except (ValueError, TypeError):
-                return default
+        if not isinstance(market_data, dict):
+            raise HTTPException(status_code=400, detail=f"無效的資料格式: {type(market_data)}")
 
         # 構建儲存的數據
         current_time = datetime.now()
@@ -272,461 +3510,928 @@ async def receive_n8n_data(request: Request):
         email_report = ""
         if "data" in market_data and isinstance(market_data["data"], dict):
             email_report = market_data["data"].get("emailReport", "")
-            logger.info(f"📧 找到emailReport內容，長度: {len(email_report)} 字元")
         elif "emailReport" in market_data:
             email_report = market_data.get("emailReport", "")
-            logger.info(f"📧 直接找到emailReport內容，長度: {len(email_report)} 字元")
-
-        # 使用安全轉換函數處理數據
-        processed_data = {
-            "positive": safe_int(market_data.get("positive", 0)),
-            "neutral": safe_int(market_data.get("neutral", 0)),
-            "negative": safe_int(market_data.get("negative", 0)),
-            "summary": safe_str(market_data.get("summary", "")),
-            "score": safe_int(market_data.get("score", 0)),
-            "label": safe_str(market_data.get("label", "")),
-            "emailReportHtml": safe_str(market_data.get("emailReportHtml", "")),
+
+        # 型別轉換與驗證都在模型中一次完成
+        try:
+            processed_data = N8NDataExtended.model_validate(market_data).model_dump()
+        except ValidationError as ve:
+            ingestion_logger.error(f"❌ 數據驗證失敗: {str(ve)}")
+            raise HTTPException(status_code=400, detail=f"數據驗證失敗: {str(ve)}")
+
+        record = {
+            **processed_data,
+            "received_time": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "received_timestamp": current_time.isoformat(),
+            "raw_data": market_data,
+            "email_report": email_report,
+            "data_source": "N8N Webhook",
+            "processing_time": datetime.now().isoformat(),
+            "validation_passed": True
+        }
+
+        # 先保存到報告歷史與共享狀態，完成後才同時切換 stored_data 與版本，
+        # 避免其他請求在 await 期間讀到尚未保存的報告或與內容不符的版本 (ETag)
+        if report_history is not None:
+            record["report_id"] = await report_history.add(record)
+        version = await shared_state.publish_report(record)
+        if version > data_versions["stored_data"]:
+            stored_data = record
+            data_versions["stored_data"] = version
+        event_broadcaster.publish("report", report_event(record))
+
+        # 更新系統統計
+        system_stats["total_reports"] += 1
+        system_stats["today_reports"] += 1
+        system_stats["last_data_received"] = current_time.isoformat()
+
+        ingestion_ms = (time.perf_counter() - started) * 1000
+        ingestion_stats["reports"] += 1
+        ingestion_stats["bytes"] += len(body)
+        ingestion_stats["latencies"].append(ingestion_ms)
+
+        ingestion_logger.info(
+            f"✅ 成功處理 N8N 資料: {len(body)} bytes，分數 {record['score']} ({record['label']})，"
+            f"情感 +{record['positive']}/={record['neutral']}/-{record['negative']}，"
+            f"耗時 {ingestion_ms:.1f} ms"
+        )
+        if log_details:
+            ingestion_logger.debug(
+                f"📊 數據欄位: {list(market_data.keys())}，摘要長度: {len(record['summary'])} 字元，"
+                f"emailReport 長度: {len(email_report)} 字元，emailReportHtml 長度: "
+                f"{len(record['emailReportHtml'])} 字元"
+            )
+
+        return {
+            "status": "success",
+            "message": "市場分析資料已接收並儲存",
+            # 精簡模式不回傳大型報告內容
+            "data": record if ingest_config['echo_data'] else {
+                key: value for key, value in record.items()
+                if key not in ("raw_data", "email_report", "emailReportHtml")
+            },
+            "received_at": current_time,
+            "processed_fields": len(record),
+            "ingestion_ms": round(ingestion_ms, 2),
+            "system_stats": system_stats
+        }
+
+    except HTTPException:
+        ingestion_stats["rejected"] += 1
+        system_stats["errors"] += 1
+        raise
+    except ValueError as ve:
+        ingestion_logger.error(f"❌ 數據驗證錯誤: {str(ve)}")
+        ingestion_stats["rejected"] += 1
+        system_stats["errors"] += 1
+        raise HTTPException(status_code=400, detail=f"數據驗證錯誤: {str(ve)}")
+    except Exception as e:
+        ingestion_logger.error(f"❌ 接收 N8N 資料失敗: {str(e)}")
+        ingestion_stats["rejected"] += 1
+        system_stats["errors"] += 1
+        raise HTTPException(status_code=500, detail=f"接收資料失敗: {str(e)}")
+
+
+@app.get("/api/stream")
+async def stream_events(request: Request):
+    """伺服器推送 (Server-Sent Events) - 收到 N8N 報告 (report) 或報價更新 (price) 時推送精簡的變更內容
+
+    連線時先送出 hello（目前的數據版本）；resync 表示事件有遺漏，客戶端應重新載入。
+    """
+    stream_config = CONFIG['STREAM_CONFIG']
+    try:
+        queue = event_broadcaster.subscribe()
+    except StreamSubscriberLimit:
+        raise HTTPException(status_code=503, detail="串流連線數已達上限，請改用輪詢")
+
+    hello = {
+        "boot_id": BOOT_ID,
+        "report_version": data_versions["stored_data"],
+        "price_version": market_data_refresher.version,
+        "heartbeat_seconds": stream_config['heartbeat_seconds']
+    }
+
+    async def events():
+        try:
+            yield f"retry: {stream_config['retry_ms']}\n".encode() + EventBroadcaster.format_event("hello", hello)
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=stream_config['heartbeat_seconds'])
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": ping\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            event_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # 關閉反向代理 (nginx) 的回應緩衝，事件才能即時送達
+        "X-Accel-Buffering": "no"
+    })
+
+
+def parse_report_time(value: Optional[str], end_of_day: bool = False) -> Optional[datetime]:
+    """解析查詢時間 - ISO 日期或日期時間；只有日期且為結束時間時包含當天整天"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"無效的時間格式: {value}（請使用 ISO 格式，例如 2025-01-31）")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return parsed
+
+
+@app.get("/api/reports")
+async def list_reports(request: Request, label: Optional[str] = None, limit: int = 50,
+                       cursor: Optional[str] = None):
+    """查詢歷史報告摘要（新到舊）- from/to 為 ISO 時間範圍，以 next_cursor 取得下一頁"""
+    if report_history is None:
+        raise HTTPException(status_code=404, detail="報告歷史未啟用")
+
+    # from 是 Python 保留字，直接從 query string 讀取
+    start = parse_report_time(request.query_params.get('from'))
+    end = parse_report_time(request.query_params.get('to'), end_of_day=True)
+    limit = min(max(1, limit), CONFIG['REPORT_HISTORY_CONFIG']['max_page_size'])
+
+    cursor_key = None
+    if cursor:
+        try:
+            received_ts, report_id = cursor.rsplit('_', 1)
+            cursor_key = (float(received_ts), int(report_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"無效的分頁游標: {cursor}")
+
+    reports, next_cursor = await report_history.query(start, end, label, limit, cursor_key)
+    return {
+        "status": "success",
+        "reports": reports,
+        "count": len(reports),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
+
+
+@app.get("/api/reports/{report_id}")
+async def get_report(report_id: int):
+    """取得單份歷史報告（含 HTML 報告內容與原始資料）"""
+    if report_history is None:
+        raise HTTPException(status_code=404, detail="報告歷史未啟用")
+    report = await report_history.get(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"找不到報告: {report_id}")
+    return {"status": "success", "report": report}
+
+
+def current_data_age() -> tuple:
+    """目前報告的數據年齡（分鐘）與新鮮度分級（fresh < 1 小時 <= stale < 1 天 <= very_old）"""
+    data_age_minutes = 0
+    if stored_data and stored_data.get('received_timestamp'):
+        try:
+            received_time = datetime.fromisoformat(stored_data['received_timestamp'])
+            data_age_minutes = (datetime.now() - received_time).total_seconds() / 60
+        except Exception as e:
+            logger.warning(f"⚠️ 無法計算數據年齡: {e}")
+    freshness = "fresh" if data_age_minutes < 60 else "stale" if data_age_minutes < 1440 else "very_old"
+    return data_age_minutes, freshness
+
+
+@app.get("/api/current-data")
+async def get_current_data(request: Request):
+    """取得目前儲存的市場分析資料 - 增強版本
+
+    ETag 由報告版本與新鮮度分級組成，未收到新報告且分級未變時返回 304；
+    每次都會變動的統計、數據年齡與時間戳記由 /api/current-data/status 提供（不快取）
+    """
+    try:
+        system_stats["api_calls"] += 1
+
+        _, data_freshness = current_data_age()
+        etag = make_etag("current", data_versions["stored_data"], data_freshness)
+        not_modified = check_not_modified(request, "current-data", etag)
+        if not_modified is not None:
+            return not_modified
+
+        response_data = {
+            "status": "success",
+            "data": stored_data,
+            "has_data": len(stored_data) > 0,
+            "data_freshness": data_freshness
         }
 
-        # 驗證處理後的數據
-        try:
-            validated_data = N8NDataExtended(**processed_data)
-            logger.info("✅ 數據驗證通過")
-        except Exception as ve:
-            logger.error(f"❌ 數據驗證失敗: {str(ve)}")
-            logger.error(f"   原始數據: {processed_data}")
-            raise HTTPException(status_code=400, detail=f"數據驗證失敗: {str(ve)}")
+        return FastJSONResponse(response_data, headers=etag_headers(etag))
+
+    except Exception as e:
+        logger.error(f"❌ 取得當前數據失敗: {str(e)}")
+        system_stats["errors"] += 1
+        raise HTTPException(status_code=500, detail=f"取得數據失敗: {str(e)}")
+
+
+@app.get("/api/current-data/status")
+async def get_current_data_status():
+    """目前報告的數據年齡、新鮮度與系統統計 - 每次請求都會變動，不帶 ETag"""
+    data_age_minutes, data_freshness = current_data_age()
+    return FastJSONResponse({
+        "status": "success",
+        "stats": system_stats,
+        "timestamp": datetime.now(),
+        "has_data": len(stored_data) > 0,
+        "report_version": data_versions["stored_data"],
+        "data_age_minutes": data_age_minutes,
+        "data_freshness": data_freshness
+    }, headers={"Cache-Control": "no-store"})
+
+
+@app.get("/api/gold-price")
+async def get_gold_price(request: Request, period: str = "1y", interval: str = "1d", format: str = "rows"):
+    """取得黃金期貨價格 - 增強版本（format=columnar 時圖表序列以共用時間軸的平行陣列返回）
+
+    ETag 為快照的數據版本，K線未更新時返回 304
+    """
+    try:
+        system_stats["gold_price_calls"] += 1
+
+        # 驗證參數
+        if period not in SUPPORTED_PERIODS:
+            logger.warning(f"無效的時間期間: {period}，使用預設值 1y")
+            period = "1y"
+
+        if interval not in SUPPORTED_INTERVALS:
+            logger.warning(f"無效的時間間隔: {interval}，使用預設值 1d")
+            interval = "1d"
+
+        if format not in RESPONSE_FORMATS:
+            logger.warning(f"無效的回應格式: {format}，使用預設值 rows")
+            format = "rows"
+
+        snapshot = await load_quote_snapshot(DEFAULT_SYMBOL, period, interval)
+        if snapshot is None:
+            logger.warning("⚠️ 主要數據源無數據，使用備選方案...")
+            return create_mock_gold_data(period, format)
+
+        etag = quote_etag(DEFAULT_SYMBOL, period, interval, format, snapshot)
+        not_modified = check_not_modified(request, "gold-price", etag)
+        if not_modified is not None:
+            return not_modified
+        return FastJSONResponse(build_quote_response(snapshot, format), headers=etag_headers(etag))
+
+    except Exception as e:
+        logger.error(f"❌ 獲取黃金價格失敗: {str(e)}")
+        system_stats["errors"] += 1
+        return create_mock_gold_data(period, format if format in RESPONSE_FORMATS else "rows")
+
+
+async def load_quote_snapshot(symbol: str, period: str, interval: str) -> Optional[Dict[str, Any]]:
+    """取得報價快照 - 由背景刷新的記憶體快照回應；尚無快照時（啟動初期或未追蹤的商品）才即時計算"""
+    snapshot = market_data_refresher.get_snapshot(symbol, period, interval)
+    if snapshot is None:
+        snapshot = await market_data_refresher.refresh(symbol, period, interval)
+    return snapshot
+
+
+def quote_etag(symbol: str, period: str, interval: str, response_format: str, snapshot: Dict[str, Any]) -> str:
+    return make_etag("quote", symbol, period, interval, response_format, snapshot["digest"])
+
+
+async def get_market_quote(symbol: str, period: str, interval: str,
+                           response_format: str = "rows") -> Optional[Dict[str, Any]]:
+    """取得商品報價回應（response_format: rows 逐點物件陣列，或 columnar 共用 time 陣列的平行數值陣列）"""
+    snapshot = await load_quote_snapshot(symbol, period, interval)
+    return build_quote_response(snapshot, response_format) if snapshot is not None else None
+
+
+def build_quote_response(snapshot: Dict[str, Any], response_format: str = "rows") -> Dict[str, Any]:
+    """由快照組裝報價回應"""
+    payload = snapshot["payload"]
+    if response_format == "columnar":
+        payload = to_columnar_payload(payload, snapshot["series"])
+
+    now = datetime.now()
+    scheduled = market_data_refresher.refreshed_by_schedule(
+        payload["data"]["symbol"], payload["data"]["period"], payload["data"]["interval"]
+    )
+    next_update = snapshot["refreshed_time"] + timedelta(
+        seconds=market_data_refresher.interval_seconds if scheduled else market_data_cache.ttl
+    )
+    return {
+        **payload,
+        "system_time": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "next_update": max(next_update, now).strftime("%Y-%m-%d %H:%M:%S"),
+        "snapshot_time": snapshot["refreshed_time"]
+    }
+
+
+def validate_quote_params(period: str, interval: str, response_format: str = "rows"):
+    """驗證報價查詢參數 - 不支援時返回 400"""
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"不支援的回應格式: {response_format}，可用: {', '.join(RESPONSE_FORMATS)}"
+        )
+    if period not in SUPPORTED_PERIODS:
+        raise HTTPException(status_code=400, detail=f"不支援的時間期間: {period}，可用: {', '.join(SUPPORTED_PERIODS)}")
+    if interval not in SUPPORTED_INTERVALS:
+        raise HTTPException(
+            status_code=400, detail=f"不支援的時間間隔: {interval}，可用: {', '.join(SUPPORTED_INTERVALS)}"
+        )
+
+
+@app.get("/api/symbols")
+async def get_symbols():
+    """列出支援的商品與背景追蹤中的商品"""
+    return {
+        "status": "success",
+        "default": DEFAULT_SYMBOL,
+        "tracked": market_data_refresher.symbols,
+        "symbols": [
+            {
+                "symbol": symbol,
+                "name": meta['name'],
+                "aliases": meta['aliases'],
+                "currency": meta['currency'],
+                "unit": meta['unit']
+            }
+            for symbol, meta in SYMBOL_REGISTRY.items()
+        ]
+    }
+
+
+@app.get("/api/quote/{symbol}")
+async def get_quote(request: Request, symbol: str, period: str = "1y", interval: str = "1d", format: str = "rows"):
+    """取得單一商品報價 - 與黃金價格相同的指標與圖表內容（代號或別名，如 SI=F、silver、dxy）"""
+    system_stats["api_calls"] += 1
+    resolved = resolve_symbol(symbol)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail=f"不支援的商品: {symbol}")
+    validate_quote_params(period, interval, format)
+
+    try:
+        snapshot = await load_quote_snapshot(resolved, period, interval)
+    except Exception as e:
+        logger.error(f"❌ 獲取 {resolved} 報價失敗: {str(e)}")
+        system_stats["errors"] += 1
+        raise HTTPException(status_code=503, detail=f"獲取報價失敗: {str(e)}")
+
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail=f"{resolved} 暫無數據")
+
+    etag = quote_etag(resolved, period, interval, format, snapshot)
+    not_modified = check_not_modified(request, "quote", etag)
+    if not_modified is not None:
+        return not_modified
+    return FastJSONResponse(build_quote_response(snapshot, format), headers=etag_headers(etag))
+
+
+@app.get("/api/quotes")
+async def get_quotes(symbols: str = "", period: str = "1y", interval: str = "1d", format: str = "rows"):
+    """批次取得多個商品報價（逗號分隔）- 未追蹤的商品以一次批次下載取得"""
+    system_stats["api_calls"] += 1
+    requested = [value.strip() for value in symbols.split(',') if value.strip()] or market_data_refresher.symbols
+    resolved = []
+    for value in requested:
+        symbol = resolve_symbol(value)
+        if symbol is None:
+            raise HTTPException(status_code=404, detail=f"不支援的商品: {value}")
+        if symbol not in resolved:
+            resolved.append(symbol)
+    validate_quote_params(period, interval, format)
+
+    # 沒有快照的商品先合併成一次批次下載填入快取
+    missing = [symbol for symbol in resolved if market_data_refresher.get_snapshot(symbol, period, interval) is None]
+    if len(missing) > 1:
+        try:
+            await prefetch_market_data(missing, period, interval)
+        except Exception as e:
+            logger.warning(f"⚠️ 批次下載 {', '.join(missing)} 失敗: {e}")
+
+    responses = await asyncio.gather(
+        *(get_market_quote(symbol, period, interval, format) for symbol in resolved), return_exceptions=True
+    )
+    quotes, errors = {}, {}
+    for symbol, response in zip(resolved, responses):
+        if isinstance(response, Exception):
+            errors[symbol] = str(response)
+        elif response is None:
+            errors[symbol] = "暫無數據"
+        else:
+            quotes[symbol] = response["data"]
+
+    return {
+        "status": "success" if quotes else "error",
+        "period": period,
+        "interval": interval,
+        "format": format,
+        "quotes": quotes,
+        "errors": errors,
+        "system_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def build_gold_price_payload(hist_data, info, latest_processing_time, period: str, interval: str,
+                             indicator_values: Optional[Dict[str, Any]] = None, symbol: str = DEFAULT_SYMBOL,
+                             quarterly_average_line: Optional[list] = None):
+    """計算報價回應內容（統計、圖表、技術指標）- 可在執行緒池或子行程中執行，統計失敗時返回 None
+
+    indicator_values: 增量指標狀態的當前值，提供時統計與技術指標不再重新掃描全序列
+    quarterly_average_line: 已在主行程計算的轉折點；未提供時在此計算並使用月份彙總快取
+    返回值的 'series' 為 columnar 格式的共用時間軸序列，與逐點的 chart_data/ma_lines/rsi_lines 同源
+    """
+    # 計算統計數據
+    stats = calculate_gold_statistics(hist_data, indicator_values)
+
+    if not stats:
+        logger.warning("⚠️ 統計計算失敗，使用備選數據")
+        return None
+
+    # 一次計算所有移動平均線，供圖表、技術指標、MA125 與交叉檢測共用
+    moving_averages = compute_moving_averages(hist_data)
+
+    # 準備圖表數據（OHLCV 欄位同時供逐點與 columnar 格式使用）
+    ohlcv = build_ohlcv_columns(hist_data, stats['current_price'])
+    chart_data = build_chart_data(hist_data, stats['current_price'], times=moving_averages['time'], columns=ohlcv)
+
+    # 計算技術指標
+    technical_indicators = calculate_technical_indicators_enhanced(hist_data, moving_averages, indicator_values)
+
+    # 計算移動平均線數據
+    ma_lines = {}
+    for window in (5, 20):
+        if len(hist_data) >= window:
+            ma_lines[f"ma_{window}"] = build_ma_line(moving_averages, window)
+
+    # 計算MA125線（替代月平均線）
+    ma_125_line = calculate_ma125_line(hist_data, moving_averages)
+
+    # 計算 RSI 副圖序列（多週期一次計算）
+    rsi_periods = CONFIG['INDICATOR_CONFIG']['rsi_periods']
+    rsi_series = calculate_rsi_series(moving_averages["close"], rsi_periods)
+    rsi_lines = build_rsi_lines(moving_averages, rsi_periods, rsi_series)
+
+    # columnar 格式的共用時間軸序列（MA125 與逐點格式相同，數據不足125根時不提供）
+    series = build_chart_series(moving_averages, ohlcv, (5, 20, 125), rsi_series)
+
+    # 計算季平均價格線（替代年平均線）
+    if quarterly_average_line is None:
+        quarterly_average_line = calculate_quarterly_average_line(hist_data, memo_key=(symbol, period, interval))
+
+    # 檢測黃金交叉和死亡交叉
+    cross_signal = detect_golden_death_cross(hist_data, moving_averages)
+
+    # 判斷市場狀態
+    market_status = determine_market_status()
+
+    # 獲取市場資訊
+    market_name = get_market_name(info, symbol)
+    symbol_meta = SYMBOL_REGISTRY.get(symbol, {})
+
+    # 計算當日高和當日低
+    today_high = None
+    today_low = None
+    try:
+        # 獲取當天的數據
+        today = datetime.now().date()
+        today_data = hist_data[hist_data.index.date == today]
+        if not today_data.empty:
+            today_high = today_data['High'].max()
+            today_low = today_data['Low'].min()
+        else:
+            # 如果沒有當天數據，使用最近一天的數據
+            if len(hist_data) > 0:
+                latest_data = hist_data.iloc[-1]
+                today_high = latest_data['High']
+                today_low = latest_data['Low']
+    except Exception as e:
+        logger.warning(f"⚠️ 計算當日高低價失敗: {e}")
+        today_high = stats['current_price']
+        today_low = stats['current_price']
+
+    # 準備回應數據
+    response_data = {
+        "status": "success",
+        "data": {
+            "symbol": symbol,
+            "name": market_name,
+            "current_price": round(stats['current_price'], 2),
+            "change": round(stats['price_change'], 2),
+            "change_percent": round(stats['price_change_pct'], 2),
+            "high_24h": round(stats['max_price'], 2),
+            "low_24h": round(stats['min_price'], 2),
+            "today_high": round(today_high, 2) if today_high else None,
+            "today_low": round(today_low, 2) if today_low else None,
+            "avg_price": round(stats['avg_price'], 2),
+            "volatility": round(stats['volatility'], 2),
+            "volume_24h": 0,  # 移除交易量顯示
+            "currency": symbol_meta.get('currency', "USD"),
+            "unit": symbol_meta.get('unit', "per ounce"),
+            "last_updated": stats['latest_date'],
+            "last_updated_formatted": latest_processing_time,
+            "chart_data": chart_data,
+            "ma_lines": ma_lines,
+            "ma_125_line": ma_125_line,
+            "rsi_lines": rsi_lines,
+            "pivot_points": quarterly_average_line,  # 轉折點數據
+            "cross_signal": cross_signal,
+            "market_status": market_status,
+            "technical_indicators": technical_indicators,
+            "period": period,
+            "interval": interval,
+            "data_points": len(chart_data),
+            "trading_days": len(hist_data),
+            "data_source_info": {
+                "primary": "Yahoo Finance",
+                "realtime_updated": len(chart_data) > 0 and
+                                    chart_data[-1]['time'].split('T')[0] == datetime.now().strftime('%Y-%m-%d')
+            }
+        },
+        "system_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "next_update": (datetime.now() + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S"),
+        "data_source": "Yahoo Finance API (Enhanced)",
+        "processing_stats": {
+            "raw_data_points": len(hist_data),
+            "processed_chart_points": len(chart_data),
+            "technical_indicators_count": len(technical_indicators),
+            "processing_time": datetime.now()
+        },
+        # 欄位式圖表序列 - 由 MarketDataRefresher 取出存放於快照，不屬於逐點格式的回應
+        "series": series
+    }
+
+    return response_data
+
+
+async def get_gold_futures_data_enhanced(period: str, interval: str, symbol: str = DEFAULT_SYMBOL, force: bool = False):
+    """獲取黃金期貨數據 - 增強版本（TTL 快取，並發請求共用同一次下載；force 略過快取重新下載）"""
+    try:
+        hist_data, info, current_price, latest_processing_time = await market_data_cache.get_or_load(
+            (symbol, period, interval),
+            lambda: _load_futures_data(symbol, period, interval),
+            force=force
+        )
+        # 回傳副本，避免下游計算修改快取中的 DataFrame
+        return hist_data.copy(), info, current_price, latest_processing_time
+
+    except Exception as e:
+        logger.error(f"❌ 獲取數據時發生錯誤: {e}")
+        return None, None, None, None
+
+
+async def get_ticker_info(symbol: str):
+    """獲取市場資訊 (.info) - 使用較長 TTL 的快取"""
+    try:
+        return await market_data_cache.get_or_load(
+            (symbol, 'info', None),
+            lambda: blocking_executor.run_io(lambda: yf.Ticker(symbol).info),
+            ttl=CONFIG['MARKET_DATA_CONFIG']['info_cache_ttl']
+        )
+    except Exception as info_error:
+        logger.warning(f"⚠️ 無法獲取市場資訊: {info_error}")
+        return None
+
+
+async def _load_futures_data(symbol: str, period: str, interval: str):
+    """快取未命中時的載入流程 - 單一商品的批次下載"""
+    results = await load_market_data_batch([symbol], period, interval)
+    if symbol not in results:
+        raise ValueError("無法獲取數據，請檢查網路連接或API狀態")
+    return results[symbol]
+
+
+async def load_market_data_batch(symbols, period: str, interval: str) -> Dict[str, tuple]:
+    """批次載入多個商品的數據 - 歷史K線與當天分鐘級數據各只需一次上游下載（在 I/O 執行緒池中進行）
+
+    返回 {symbol: (hist_data, info, current_price, latest_processing_time)}，無數據的商品不會出現在結果中
+    """
+    symbols = list(symbols)
+    history = await blocking_executor.run_io(_download_history_batch, symbols, period, interval)
+
+    # 當天分鐘級數據與 period/interval 無關，各組合共用同一次下載
+    try:
+        recent = await market_data_cache.get_or_load(
+            ('recent', tuple(sorted(symbols)), '1m'),
+            lambda: blocking_executor.run_io(download_bars, symbols, period='2d', interval='1m')
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ 獲取當天數據時出現問題: {e}")
+        recent = {}
+
+    results = {}
+    for symbol in symbols:
+        hist_data = history.get(symbol)
+        if hist_data is None or hist_data.empty:
+            continue
+        hist_data, latest_processing_time = merge_intraday_bars(hist_data, recent.get(symbol))
+        info = await get_ticker_info(symbol)
+        results[symbol] = (hist_data, info, hist_data['Close'].iloc[-1], latest_processing_time)
+    return results
 
-        stored_data = {
-            **processed_data,
-            "received_time": current_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "received_timestamp": current_time.isoformat(),
-            "raw_data": market_data,
-            "email_report": email_report,
-            "data_source": "N8N Webhook",
-            "processing_time": datetime.now().isoformat(),
-            "validation_passed": True
-        }
 
-        # 更新系統統計
-        system_stats["total_reports"] += 1
-        system_stats["today_reports"] += 1
-        system_stats["last_data_received"] = current_time.isoformat()
+async def prefetch_market_data(symbols, period: str, interval: str) -> int:
+    """以一次批次下載刷新多個商品的快取，返回成功的商品數
 
-        logger.info(f"✅ 成功處理 N8N 資料:")
-        logger.info(f"   正面情感: {stored_data['positive']}")
-        logger.info(f"   中性情感: {stored_data['neutral']}")
-        logger.info(f"   負面情感: {stored_data['negative']}")
-        logger.info(f"   情感分數: {stored_data['score']}")
-        logger.info(f"   標籤: {stored_data['label']}")
-        logger.info(f"   摘要長度: {len(stored_data['summary'])} 字元")
-        logger.info(f"   接收時間: {stored_data['received_time']}")
+    多個 worker 共用狀態後端時，其他 worker 在半個 TTL 內已下載的批次結果直接沿用，上游只下載一次
+    """
+    symbols = list(symbols)
+    results = await market_data_cache.get_or_load(
+        ('batch', tuple(symbols), period, interval),
+        lambda: load_market_data_batch(symbols, period, interval),
+        force=True,
+        max_age=market_data_cache.ttl / 2
+    )
+    await market_data_cache.set_many({(symbol, period, interval): value for symbol, value in results.items()})
+    return len(results)
 
-        return {
-            "status": "success",
-            "message": "市場分析資料已接收並儲存",
-            "data": stored_data,
-            "received_at": current_time.isoformat(),
-            "processed_fields": len(stored_data),
-            "system_stats": system_stats
-        }
 
-    except ValueError as ve:
-        logger.error(f"❌ 數據驗證錯誤: {str(ve)}")
-        system_stats["errors"] += 1
-        raise HTTPException(status_code=400, detail=f"數據驗證錯誤: {str(ve)}")
-    except Exception as e:
-        logger.error(f"❌ 接收 N8N 資料失敗: {str(e)}")
-        system_stats["errors"] += 1
-        raise HTTPException(status_code=500, detail=f"接收資料失敗: {str(e)}")
+def download_bars(symbols, **kwargs) -> Dict[str, pd.DataFrame]:
+    """以單次 yf.download 批次下載多個商品的K線（阻塞呼叫），返回 {symbol: DataFrame}"""
+    symbols = list(symbols)
+    data = yf.download(
+        symbols, group_by='ticker', auto_adjust=True, progress=False, threads=True, ignore_tz=False, **kwargs
+    )
+    frames = {}
+    if data is None or data.empty:
+        return frames
 
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            frame = data[symbol]
+        else:
+            frame = data
+        # 多商品合併時其他商品的交易時段會留下空列
+        frame = frame.dropna(how='all')
+        if frame.empty:
+            continue
+        timezone_name = SYMBOL_REGISTRY.get(symbol, {}).get('timezone')
+        if timezone_name:
+            frame = frame.copy()
+            if frame.index.tz is None:
+                frame.index = frame.index.tz_localize(timezone_name)
+            else:
+                frame.index = frame.index.tz_convert(timezone_name)
+        frames[symbol] = frame
+    return frames
 
-@app.get("/api/current-data")
-async def get_current_data():
-    """取得目前儲存的市場分析資料 - 增強版本"""
-    try:
-        system_stats["api_calls"] += 1
 
-        # 檢查數據是否過期（超過1小時）
-        data_age_minutes = 0
-        if stored_data and stored_data.get('received_timestamp'):
-            try:
-                received_time = datetime.fromisoformat(stored_data['received_timestamp'])
-                data_age_minutes = (datetime.now() - received_time).total_seconds() / 60
-            except Exception as e:
-                logger.warning(f"⚠️ 無法計算數據年齡: {e}")
+def _download_history_batch(symbols, period: str, interval: str) -> Dict[str, pd.DataFrame]:
+    """下載多個商品的歷史K線（阻塞呼叫）- 啟用本地K線儲存時只下載最後一筆之後的新K線"""
+    # 計算時間範圍
+    period_days = PERIOD_DAYS.get(period, 365)
 
-        response_data = {
-            "status": "success",
-            "data": stored_data,
-            "stats": system_stats,
-            "timestamp": datetime.now().isoformat(),
-            "has_data": len(stored_data) > 0,
-            "data_age_minutes": data_age_minutes,
-            "data_freshness": "fresh" if data_age_minutes < 60 else "stale" if data_age_minutes < 1440 else "very_old"
-        }
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=period_days)
 
-        return response_data
+    def fetch_history(batch_symbols, start: str):
+        return download_bars(batch_symbols, start=start, end=end_date.strftime('%Y-%m-%d'), interval=interval)
 
-    except Exception as e:
-        logger.error(f"❌ 取得當前數據失敗: {str(e)}")
-        system_stats["errors"] += 1
-        raise HTTPException(status_code=500, detail=f"取得數據失敗: {str(e)}")
+    if ohlcv_store is not None:
+        return ohlcv_store.sync_batch(
+            symbols, interval, start_date, fetch_history,
+            retention_days=INTERVAL_MAX_DAYS.get(interval, max(PERIOD_DAYS.values()))
+        )
+    return fetch_history(symbols, start_date.strftime('%Y-%m-%d'))
 
 
-@app.get("/api/gold-price")
-async def get_gold_price(period: str = "1y", interval: str = "1d"):
-    """取得黃金期貨價格 - 增強版本"""
+def merge_intraday_bars(hist_data, recent_data):
+    """將當天分鐘級數據合併到歷史K線，並返回 (hist_data, 最新數據時間字串)"""
+    latest_time_formatted = None
     try:
-        system_stats["gold_price_calls"] += 1
+        if recent_data is not None and not recent_data.empty:
+            today = datetime.now().date()
+            today_data = recent_data[recent_data.index.date >= today]
 
-        # 驗證參數
-        valid_periods = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y"]
-        valid_intervals = ["1m", "5m", "15m", "30m", "1h", "1d"]
+            if not today_data.empty:
+                latest_price = today_data['Close'].iloc[-1]
+                latest_time = today_data.index[-1]
 
-        if period not in valid_periods:
-            logger.warning(f"無效的時間期間: {period}，使用預設值 1y")
-            period = "1y"
+                # 更新歷史數據中的最新價格
+                if len(hist_data) > 0:
+                    last_date = hist_data.index[-1].date()
+                    if last_date == today:
+                        # 更新今天的數據
+                        hist_data.loc[hist_data.index[-1], 'Close'] = latest_price
+                        hist_data.loc[hist_data.index[-1], 'High'] = max(
+                            hist_data.loc[hist_data.index[-1], 'High'], latest_price
+                        )
+                        hist_data.loc[hist_data.index[-1], 'Low'] = min(
+                            hist_data.loc[hist_data.index[-1], 'Low'], latest_price
+                        )
+                    else:
+                        # 添加今天的數據
+                        new_row = pd.DataFrame({
+                            'Open': [today_data['Open'].iloc[0]],
+                            'High': [today_data['High'].max()],
+                            'Low': [today_data['Low'].min()],
+                            'Close': [latest_price],
+                            'Volume': [today_data['Volume'].sum()]
+                        }, index=[latest_time.replace(hour=0, minute=0, second=0, microsecond=0)])
+                        hist_data = pd.concat([hist_data, new_row])
+
+                latest_time_formatted = to_taipei_index([latest_time])[0].strftime('%Y-%m-%d %H:%M')
+            else:
+                market_logger.info("ℹ️ 當天暫無交易數據")
+        else:
+            market_logger.info("ℹ️ 無法獲取當天詳細數據")
 
-        if interval not in valid_intervals:
-            logger.warning(f"無效的時間間隔: {interval}，使用預設值 1d")
-            interval = "1d"
+    except Exception as e:
+        market_logger.warning(f"⚠️ 合併當天數據時出現問題: {e}")
 
-        # 獲取黃金期貨數據
-        try:
-            hist_data, info, current_price, latest_processing_time = await get_gold_futures_data_enhanced(period,
-                                                                                                          interval)
+    # 沒有當天數據時以最後一根K線的時間為準（台北時間）
+    if latest_time_formatted is None:
+        latest_time_formatted = to_taipei_index(hist_data.index[-1:])[0].strftime('%Y-%m-%d %H:%M')
 
-            if hist_data is None or hist_data.empty:
-                logger.warning("⚠️ 主要數據源無數據，使用備選方案...")
-                return create_mock_gold_data(period)
+    return hist_data, latest_time_formatted
 
-        except Exception as e:
-            logger.error(f"❌ yfinance 數據獲取失敗: {str(e)}")
-            return create_mock_gold_data(period)
 
-        # 計算統計數據
-        stats = calculate_gold_statistics(hist_data)
+def to_taipei_index(index) -> pd.DatetimeIndex:
+    """將時間索引一次轉換為台北時間 - 有時區時 tz_convert，無時區時假設為 UTC 並 +8 小時"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        return index + pd.Timedelta(hours=8)
+    return index.tz_convert('Asia/Taipei')
 
-        if not stats:
-            logger.warning("⚠️ 統計計算失敗，使用備選數據")
-            return create_mock_gold_data(period)
 
-        # 準備圖表數據
-        chart_data = []
-        for idx, row in hist_data.iterrows():
-            try:
-                # 修正時區問題，轉換為台北時間
-                if hasattr(idx, 'tz_localize'):
-                    if idx.tz is None:
-                        # 假設是UTC時間，轉換為台北時間
-                        idx_local = idx + timedelta(hours=8)
-                    else:
-                        # 轉換為台北時間
-                        idx_local = idx.tz_convert('Asia/Taipei')
-                else:
-                    # 假設是UTC時間，轉換為台北時間
-                    idx_local = idx + timedelta(hours=8)
-
-                data_point = {
-                    "time": idx_local.strftime('%Y-%m-%d'),
-                    "price": float(row['Close']) if not pd.isna(row['Close']) else stats['current_price'],
-                    "high": float(row['High']) if not pd.isna(row['High']) else stats['current_price'],
-                    "low": float(row['Low']) if not pd.isna(row['Low']) else stats['current_price'],
-                    "open": float(row['Open']) if not pd.isna(row['Open']) else stats['current_price'],
-                    "volume": int(row['Volume']) if not pd.isna(row['Volume']) and row['Volume'] > 0 else 0
-                }
-                chart_data.append(data_point)
-            except Exception as point_error:
-                logger.warning(f"⚠️ 處理數據點時出錯: {point_error}")
-                continue
+def format_taipei_dates(index) -> list:
+    """將時間索引格式化為台北時間的 'YYYY-MM-DD' 字串 - 以 NumPy 一次格式化，避免逐筆 strftime"""
+    local_days = to_taipei_index(index).tz_localize(None).values.astype('datetime64[D]')
+    return np.datetime_as_string(local_days, unit='D').tolist()
 
-        # 計算技術指標
-        technical_indicators = calculate_technical_indicators_enhanced(hist_data)
-
-        # 計算移動平均線數據
-        ma_lines = {}
-        if len(hist_data) >= 5:
-            ma_5_data = hist_data['Close'].rolling(window=5).mean().dropna()
-            ma_5_line_data = []
-            for idx, val in ma_5_data.items():
-                # 確保時間格式與圖表數據一致，並正確處理時區
-                if hasattr(idx, 'tz_localize'):
-                    if idx.tz is None:
-                        # 假設是UTC時間，轉換為台北時間
-                        idx_local = idx + timedelta(hours=8)
-                    else:
-                        # 轉換為台北時間
-                        idx_local = idx.tz_convert('Asia/Taipei')
-                else:
-                    # 假設是UTC時間，轉換為台北時間
-                    idx_local = idx + timedelta(hours=8)
-
-                ma_5_line_data.append({
-                    'time': idx_local.strftime('%Y-%m-%d'),
-                    'price': float(val)
-                })
-            ma_lines["ma_5"] = ma_5_line_data
-
-        if len(hist_data) >= 20:
-            ma_20_data = hist_data['Close'].rolling(window=20).mean().dropna()
-            ma_20_line_data = []
-            for idx, val in ma_20_data.items():
-                # 確保時間格式與圖表數據一致，並正確處理時區
-                if hasattr(idx, 'tz_localize'):
-                    if idx.tz is None:
-                        # 假設是UTC時間，轉換為台北時間
-                        idx_local = idx + timedelta(hours=8)
-                    else:
-                        # 轉換為台北時間
-                        idx_local = idx.tz_convert('Asia/Taipei')
-                else:
-                    # 假設是UTC時間，轉換為台北時間
-                    idx_local = idx + timedelta(hours=8)
 
-                ma_20_line_data.append({
-                    'time': idx_local.strftime('%Y-%m-%d'),
-                    'price': float(val)
-                })
-            ma_lines["ma_20"] = ma_20_line_data
+def build_ohlcv_columns(hist_data, fallback_price: float) -> Dict[str, list]:
+    """將K線整欄轉為 open/high/low/close/volume 串列 - 價格 NaN 以 fallback_price 補值，無效成交量為 0"""
+    columns = {
+        name: hist_data[column].astype(float).fillna(fallback_price).tolist()
+        for name, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'))
+    }
+    volume = hist_data['Volume'].to_numpy(dtype=float)
+    columns['volume'] = np.where(np.isnan(volume) | (volume <= 0), 0, volume).astype(np.int64).tolist()
+    return columns
 
-        # 計算MA125線（替代月平均線）
-        ma_125_line = calculate_ma125_line(hist_data)
 
-        # 計算季平均價格線（替代年平均線）
-        quarterly_average_line = calculate_quarterly_average_line(hist_data)
+def build_chart_data(hist_data, fallback_price: float, times: Optional[list] = None,
+                     columns: Optional[Dict[str, list]] = None):
+    """建立圖表數據 - 以整欄向量化處理時區轉換、日期格式化與 NaN 補值"""
+    if hist_data is None or hist_data.empty:
+        return []
 
-        # 檢測黃金交叉和死亡交叉
-        cross_signal = detect_golden_death_cross(hist_data)
+    if times is None:
+        times = format_taipei_dates(hist_data.index)
+    if columns is None:
+        columns = build_ohlcv_columns(hist_data, fallback_price)
 
-        # 判斷市場狀態
-        market_status = determine_market_status()
+    return [
+        {"time": t, "price": c, "high": h, "low": l, "open": o, "volume": v}
+        for t, c, h, l, o, v in zip(
+            times, columns['close'], columns['high'], columns['low'], columns['open'], columns['volume']
+        )
+    ]
 
-        # 獲取市場資訊
-        market_name = get_market_name(info)
 
-        # 計算當日高和當日低
-        today_high = None
-        today_low = None
-        try:
-            # 獲取當天的數據
-            today = datetime.now().date()
-            today_data = hist_data[hist_data.index.date == today]
-            if not today_data.empty:
-                today_high = float(today_data['High'].max())
-                today_low = float(today_data['Low'].min())
-            else:
-                # 如果沒有當天數據，使用最近一天的數據
-                if len(hist_data) > 0:
-                    latest_data = hist_data.iloc[-1]
-                    today_high = float(latest_data['High'])
-                    today_low = float(latest_data['Low'])
-        except Exception as e:
-            logger.warning(f"⚠️ 計算當日高低價失敗: {e}")
-            today_high = stats['current_price']
-            today_low = stats['current_price']
+def nan_to_none(values) -> list:
+    """將 NumPy 序列轉為 JSON 串列，NaN 以 None（null）表示"""
+    return [None if value != value else value for value in values.tolist()]
 
-        # 準備回應數據
-        response_data = {
-            "status": "success",
-            "data": {
-                "symbol": "GC=F",
-                "name": market_name,
-                "current_price": round(stats['current_price'], 2),
-                "change": round(stats['price_change'], 2),
-                "change_percent": round(stats['price_change_pct'], 2),
-                "high_24h": round(stats['max_price'], 2),
-                "low_24h": round(stats['min_price'], 2),
-                "today_high": round(today_high, 2) if today_high else None,
-                "today_low": round(today_low, 2) if today_low else None,
-                "avg_price": round(stats['avg_price'], 2),
-                "volatility": round(stats['volatility'], 2),
-                "volume_24h": 0,  # 移除交易量顯示
-                "currency": "USD",
-                "unit": "per ounce",
-                "last_updated": stats['latest_date'].isoformat(),
-                "last_updated_formatted": latest_processing_time,
-                "chart_data": chart_data,
-                "ma_lines": ma_lines,
-                "ma_125_line": ma_125_line,
-                "pivot_points": quarterly_average_line,  # 轉折點數據
-                "cross_signal": cross_signal,
-                "market_status": market_status,
-                "technical_indicators": technical_indicators,
-                "period": period,
-                "interval": interval,
-                "data_points": len(chart_data),
-                "trading_days": len(hist_data),
-                "data_source_info": {
-                    "primary": "Yahoo Finance",
-                    "realtime_updated": len(chart_data) > 0 and
-                                        chart_data[-1]['time'].split('T')[0] == datetime.now().strftime('%Y-%m-%d')
-                }
-            },
-            "system_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "next_update": (datetime.now() + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S"),
-            "data_source": "Yahoo Finance API (Enhanced)",
-            "processing_stats": {
-                "raw_data_points": len(hist_data),
-                "processed_chart_points": len(chart_data),
-                "technical_indicators_count": len(technical_indicators),
-                "processing_time": datetime.now().isoformat()
-            }
-        }
 
-        return response_data
+def build_chart_series(moving_averages: Dict[str, Any], ohlcv: Dict[str, list], ma_windows,
+                       rsi_series: Dict[int, Any]) -> Dict[str, list]:
+    """建立欄位式圖表數據 - 所有序列與 time 等長並共用同一時間軸，指標暖身期為 null"""
+    series = {"time": moving_averages["time"], **ohlcv}
+    count = len(series["time"])
+    for window in ma_windows:
+        if count >= window:
+            series[f"ma_{window}"] = nan_to_none(moving_averages["ma"][window])
+    for period, values in rsi_series.items():
+        series[f"rsi_{period}"] = nan_to_none(np.round(values, 2))
+    return series
 
-    except Exception as e:
-        logger.error(f"❌ 獲取黃金價格失敗: {str(e)}")
-        system_stats["errors"] += 1
-        return create_mock_gold_data(period)
 
+# 回應格式: rows 為逐點物件陣列（預設），columnar 為共用 time 陣列的平行數值陣列
+RESPONSE_FORMATS = ("rows", "columnar")
+# columnar 格式以 series 取代的逐點欄位
+ROW_SERIES_KEYS = ("chart_data", "ma_lines", "ma_125_line", "rsi_lines")
 
-async def get_gold_futures_data_enhanced(period: str, interval: str):
-    """獲取黃金期貨數據 - 增強版本"""
-    try:
-        # 計算時間範圍
-        period_days_map = {
-            '1d': 1, '5d': 5, '1mo': 30, '3mo': 90,
-            '6mo': 180, '1y': 365, '2y': 730, '5y': 1825
-        }
-        period_days = period_days_map.get(period, 365)
 
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=period_days)
+def chart_rows_to_series(chart_data: list) -> Dict[str, list]:
+    """將逐點圖表數據轉為欄位式（供模擬數據等沒有預先建立 series 的回應使用）"""
+    return {
+        "time": [point["time"] for point in chart_data],
+        "open": [point["open"] for point in chart_data],
+        "high": [point["high"] for point in chart_data],
+        "low": [point["low"] for point in chart_data],
+        "close": [point["price"] for point in chart_data],
+        "volume": [point["volume"] for point in chart_data]
+    }
 
-        # 使用yfinance獲取數據
-        gold_ticker = yf.Ticker("GC=F")
 
-        # 獲取歷史數據
-        hist_data = gold_ticker.history(
-            start=start_date.strftime('%Y-%m-%d'),
-            end=end_date.strftime('%Y-%m-%d'),
-            interval=interval
-        )
+def to_columnar_payload(payload: Dict[str, Any], series: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+    """將報價回應轉為 columnar 格式 - 只複製外層字典，series 直接引用快照中的串列"""
+    data = {key: value for key, value in payload["data"].items() if key not in ROW_SERIES_KEYS}
+    data["series"] = series if series is not None else chart_rows_to_series(payload["data"].get("chart_data", []))
+    data["format"] = "columnar"
+    return {**payload, "data": data}
 
-        # 嘗試獲取當天的分鐘級數據
-        try:
-            recent_data = gold_ticker.history(
-                period='2d',
-                interval='1m'
-            )
 
-            if not recent_data.empty:
-                today = datetime.now().date()
-                today_data = recent_data[recent_data.index.date >= today]
-
-                if not today_data.empty:
-                    latest_price = today_data['Close'].iloc[-1]
-                    latest_time = today_data.index[-1]
-
-                    # 更新歷史數據中的最新價格
-                    if len(hist_data) > 0:
-                        last_date = hist_data.index[-1].date()
-                        if last_date == today:
-                            # 更新今天的數據
-                            hist_data.loc[hist_data.index[-1], 'Close'] = latest_price
-                            hist_data.loc[hist_data.index[-1], 'High'] = max(
-                                hist_data.loc[hist_data.index[-1], 'High'], latest_price
-                            )
-                            hist_data.loc[hist_data.index[-1], 'Low'] = min(
-                                hist_data.loc[hist_data.index[-1], 'Low'], latest_price
-                            )
-                        else:
-                            # 添加今天的數據
-                            new_row = pd.DataFrame({
-                                'Open': [today_data['Open'].iloc[0]],
-                                'High': [today_data['High'].max()],
-                                'Low': [today_data['Low'].min()],
-                                'Close': [latest_price],
-                                'Volume': [today_data['Volume'].sum()]
-                            }, index=[latest_time.replace(hour=0, minute=0, second=0, microsecond=0)])
-                            hist_data = pd.concat([hist_data, new_row])
-
-                    # 修正時區問題，轉換為台北時間 (+8)
-                    if hasattr(latest_time, 'tz_localize'):
-                        # 如果是時區感知的時間，轉換為台北時間
-                        if latest_time.tz is None:
-                            # 假設是UTC時間，轉換為台北時間
-                            latest_time_local = latest_time + timedelta(hours=8)
-                        else:
-                            # 轉換為台北時間
-                            latest_time_local = latest_time.tz_convert('Asia/Taipei')
-                    else:
-                        # 假設是UTC時間，轉換為台北時間
-                        latest_time_local = latest_time + timedelta(hours=8)
+def market_data_fingerprint(hist_data) -> tuple:
+    """K線數據指紋 - 筆數、首末時間與最後一根K線的 OHLCV；新增K線或最後一根盤中更新時改變"""
+    last_bar = hist_data[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[-1].to_numpy(dtype=float)
+    return len(hist_data), hist_data.index[0], hist_data.index[-1], last_bar.tobytes()
 
-                    latest_time_formatted = latest_time_local.strftime('%Y-%m-%d %H:%M')
-                else:
-                    logger.info("ℹ️ 當天暫無交易數據")
-            else:
-                logger.info("ℹ️ 無法獲取當天詳細數據")
 
-        except Exception as e:
-            logger.warning(f"⚠️ 獲取當天數據時出現問題: {e}")
+# 移動平均引擎支援的視窗
+MA_WINDOWS = (5, 20, 50, 125)
 
-        if hist_data.empty:
-            raise ValueError("無法獲取數據，請檢查網路連接或API狀態")
 
-        # 獲取市場資訊
-        info = None
-        try:
-            info = gold_ticker.info
-        except Exception as info_error:
-            logger.warning(f"⚠️ 無法獲取市場資訊: {info_error}")
+def compute_moving_averages(hist_data, windows=MA_WINDOWS) -> Dict[str, Any]:
+    """統一移動平均引擎 - 以一次累加和計算所有視窗，時間只格式化一次
 
-        current_price = hist_data['Close'].iloc[-1] if not hist_data.empty else None
+    返回欄位式數據: {'time': [...], 'close': ndarray, 'ma': {window: ndarray}}，
+    視窗內含 NaN 或數據不足時該點為 NaN（與 rolling(window).mean() 一致）
+    """
+    close = hist_data['Close'].to_numpy(dtype=float)
+    valid = ~np.isnan(close)
+
+    # 以第一個有效價格為基準再累加，降低長序列累加和的浮點誤差
+    offset = close[valid][0] if valid.any() else 0.0
+    cumulative_sum = np.concatenate(([0.0], np.cumsum(np.where(valid, close - offset, 0.0))))
+    cumulative_count = np.concatenate(([0], np.cumsum(valid)))
+
+    averages = {}
+    for window in windows:
+        ma = np.full(len(close), np.nan)
+        if len(close) >= window:
+            window_sum = cumulative_sum[window:] - cumulative_sum[:-window]
+            window_count = cumulative_count[window:] - cumulative_count[:-window]
+            ma[window - 1:] = np.where(window_count == window, window_sum / window + offset, np.nan)
+        averages[window] = ma
 
-        # 獲取最新的處理時間
-        latest_processing_time = None
-        if 'latest_time_formatted' in locals():
-            latest_processing_time = latest_time_formatted
-        else:
-            # 修正時區問題，轉換為台北時間 (+8)
-            last_time = hist_data.index[-1]
-            if hasattr(last_time, 'tz_localize'):
-                if last_time.tz is None:
-                    # 假設是UTC時間，轉換為台北時間
-                    last_time_local = last_time + timedelta(hours=8)
-                else:
-                    # 轉換為台北時間
-                    last_time_local = last_time.tz_convert('Asia/Taipei')
-            else:
-                # 假設是UTC時間，轉換為台北時間
-                last_time_local = last_time + timedelta(hours=8)
-            latest_processing_time = last_time_local.strftime('%Y-%m-%d %H:%M')
+    return {
+        "time": format_taipei_dates(hist_data.index),
+        "close": close,
+        "ma": averages
+    }
 
-        return hist_data, info, current_price, latest_processing_time
 
-    except Exception as e:
-        logger.error(f"❌ 獲取數據時發生錯誤: {e}")
-        return None, None, None, None
+def build_ma_line(moving_averages: Dict[str, Any], window: int):
+    """將移動平均引擎的欄位數據轉為圖表線段 [{'time', 'price'}]，略過 NaN"""
+    values = moving_averages["ma"][window]
+    positions = np.flatnonzero(~np.isnan(values))
+    times = moving_averages["time"]
+    return [
+        {'time': times[pos], 'price': price}
+        for pos, price in zip(positions.tolist(), values[positions].tolist())
+    ]
 
 
-def calculate_gold_statistics(data):
-    """計算黃金統計數據"""
+def calculate_gold_statistics(data, indicator_values: Optional[Dict[str, Any]] = None):
+    """計算黃金統計數據（提供 IncrementalIndicatorState.snapshot() 時直接讀取，不再掃描全序列）"""
     if data is None or data.empty:
         return {}
 
+    if indicator_values is not None and indicator_values["count"] > 0:
+        current_price = indicator_values["current_price"]
+        yesterday_price = indicator_values["prev_price"]
+        if yesterday_price is None:
+            yesterday_price = current_price
+        daily_change = current_price - yesterday_price
+        return {
+            'current_price': current_price,
+            'max_price': indicator_values["max"],
+            'min_price': indicator_values["min"],
+            'avg_price': indicator_values["mean"],
+            'price_change': daily_change,
+            'price_change_pct': ((daily_change / yesterday_price) * 100) if yesterday_price != 0 else 0,
+            'volatility': indicator_values["std"],
+            'latest_date': indicator_values["latest_date"],
+            'yesterday_price': yesterday_price
+        }
+
     try:
         close_prices = data['Close']
 
         # 計算日變化（當前價格與昨天收盤價格的差額）
-        current_price = float(close_prices.iloc[-1])
-        yesterday_price = float(close_prices.iloc[-2]) if len(close_prices) > 1 else current_price
+        current_price = close_prices.iloc[-1]
+        yesterday_price = close_prices.iloc[-2] if len(close_prices) > 1 else current_price
 
         daily_change = current_price - yesterday_price
         daily_change_pct = ((daily_change / yesterday_price) * 100) if yesterday_price != 0 else 0
 
         # 計算年度標準差（使用整個數據集）
         # 使用 ddof=1 來計算樣本標準差，與前端的計算方法保持一致
-        annual_volatility = float(close_prices.std(ddof=1))
+        annual_volatility = close_prices.std(ddof=1)
 
         stats = {
             'current_price': current_price,
-            'max_price': float(close_prices.max()),
-            'min_price': float(close_prices.min()),
-            'avg_price': float(close_prices.mean()),
+            'max_price': close_prices.max(),
+            'min_price': close_prices.min(),
+            'avg_price': close_prices.mean(),
             'price_change': daily_change,  # 日變化
             'price_change_pct': daily_change_pct,  # 日變化百分比
             'volatility': annual_volatility,  # 年度標準差
@@ -736,36 +4441,68 @@ def calculate_gold_statistics(data):
 
         return stats
     except Exception as e:
-        logger.error(f"❌ 統計計算失敗: {e}")
+        indicator_logger.error(f"❌ 統計計算失敗: {e}")
         return {}
 
 
-def calculate_technical_indicators_enhanced(hist_data):
-    """計算技術指標 - 增強版本"""
+def calculate_technical_indicators_enhanced(hist_data, moving_averages: Optional[Dict[str, Any]] = None,
+                                            indicator_values: Optional[Dict[str, Any]] = None):
+    """計算技術指標 - 增強版本
+
+    indicator_values: IncrementalIndicatorState.snapshot() 的結果，提供時直接讀取當前值；
+    否則由 compute_moving_averages 的結果（或重新計算）取得
+    """
     technical_indicators = {}
 
     try:
-        close_prices = hist_data['Close'].dropna()
-        
-        if len(close_prices) < 20:
-            logger.warning("⚠️ 數據不足20天，無法計算完整技術指標")
-            return technical_indicators
-
-        # 計算移動平均線
-        ma_5_data = close_prices.rolling(window=5).mean()
-        ma_20_data = close_prices.rolling(window=20).mean()
-        ma_50_data = close_prices.rolling(window=50).mean()
-        
-        # 當前值
-        current_ma5 = float(ma_5_data.iloc[-1])
-        current_ma20 = float(ma_20_data.iloc[-1])
-        current_ma50 = float(ma_50_data.iloc[-1]) if not pd.isna(ma_50_data.iloc[-1]) else None
-        current_price = float(close_prices.iloc[-1])
-        
-        # 前一天值
-        prev_ma5 = float(ma_5_data.iloc[-2]) if len(ma_5_data) > 1 else current_ma5
-        prev_ma20 = float(ma_20_data.iloc[-2]) if len(ma_20_data) > 1 else current_ma20
-        prev_ma50 = float(ma_50_data.iloc[-2]) if len(ma_50_data) > 1 and not pd.isna(ma_50_data.iloc[-2]) else current_ma50
+        if indicator_values is not None:
+            if indicator_values["count"] < 20:
+                indicator_logger.warning("⚠️ 數據不足20天，無法計算完整技術指標")
+                return technical_indicators
+
+            # 由增量指標狀態讀取當前值與前一根K線的值
+            current_ma5, prev_ma5 = indicator_values["ma"][5]
+            current_ma20, prev_ma20 = indicator_values["ma"][20]
+            current_ma50, prev_ma50 = indicator_values["ma"][50]
+            prev_ma5 = prev_ma5 if prev_ma5 is not None else current_ma5
+            prev_ma20 = prev_ma20 if prev_ma20 is not None else current_ma20
+            prev_ma50 = prev_ma50 if prev_ma50 is not None else current_ma50
+            current_price = indicator_values["current_price"]
+            rsi14, prev_rsi14 = indicator_values["rsi"][14]
+            prev_rsi14 = prev_rsi14 if prev_rsi14 is not None else rsi14
+        else:
+            if moving_averages is None:
+                moving_averages = compute_moving_averages(hist_data)
+
+            # 技術指標以有效收盤價計算；含 NaN 時改用去除 NaN 後的序列
+            if np.isnan(moving_averages["close"]).any():
+                moving_averages = compute_moving_averages(hist_data[hist_data['Close'].notna()], windows=(5, 20, 50))
+
+            close_prices = moving_averages["close"]
+
+            if len(close_prices) < 20:
+                indicator_logger.warning("⚠️ 數據不足20天，無法計算完整技術指標")
+                return technical_indicators
+
+            ma_5_data = moving_averages["ma"][5]
+            ma_20_data = moving_averages["ma"][20]
+            ma_50_data = moving_averages["ma"][50]
+
+            # 當前值
+            current_ma5 = ma_5_data[-1]
+            current_ma20 = ma_20_data[-1]
+            current_ma50 = ma_50_data[-1] if not np.isnan(ma_50_data[-1]) else None
+            current_price = close_prices[-1]
+
+            # 前一天值
+            prev_ma5 = ma_5_data[-2] if len(ma_5_data) > 1 else current_ma5
+            prev_ma20 = ma_20_data[-2] if len(ma_20_data) > 1 else current_ma20
+            prev_ma50 = ma_50_data[-2] if len(ma_50_data) > 1 and not np.isnan(ma_50_data[-2]) else current_ma50
+
+            # RSI14 計算
+            rsi14 = calculate_rsi(close_prices, periods=14)
+            prev_rsi14 = calculate_rsi(close_prices[:-1], periods=14) if len(close_prices) > 14 else rsi14
+
         
         # MA5 趨勢箭頭
         ma5_trend = "↑" if current_ma5 > prev_ma5 else "↓" if current_ma5 < prev_ma5 else "="
@@ -794,9 +4531,7 @@ def calculate_technical_indicators_enhanced(hist_data):
             cross_status = "normal"
             cross_message = "正常"
         
-        # RSI14 計算
-        rsi14 = calculate_rsi(close_prices.values, periods=14)
-        prev_rsi14 = calculate_rsi(close_prices.values[:-1], periods=14) if len(close_prices) > 14 else rsi14
+        # RSI14 趨勢箭頭
         rsi14_trend = "↑" if rsi14 and prev_rsi14 and rsi14 > prev_rsi14 else "↓" if rsi14 and prev_rsi14 and rsi14 < prev_rsi14 else "=" if rsi14 else ""
         
         # 乖離率計算 - MA5與MA20之間的乖離率
@@ -806,12 +4541,7 @@ def calculate_technical_indicators_enhanced(hist_data):
         else:
             ma5_ma20_deviation = 0
         
-        # 前一天乖離率
-        prev_price = float(close_prices.iloc[-2]) if len(close_prices) > 1 else current_price
-        prev_ma5 = float(ma_5_data.iloc[-2]) if len(ma_5_data) > 1 else current_ma5
-        prev_ma20 = float(ma_20_data.iloc[-2]) if len(ma_20_data) > 1 else current_ma20
-        
-        # 使用正確公式計算前一期乖離率
+        # 前一天乖離率 - 使用正確公式計算前一期乖離率
         if prev_ma20 != 0:
             prev_ma5_ma20_deviation = ((prev_ma5 - prev_ma20) / prev_ma20) * 100
         else:
@@ -851,237 +4581,219 @@ def calculate_technical_indicators_enhanced(hist_data):
         })
 
     except Exception as e:
-        logger.warning(f"⚠️ 技術指標計算錯誤: {e}")
+        indicator_logger.warning(f"⚠️ 技術指標計算錯誤: {e}")
 
     return technical_indicators
 
 
-def calculate_rsi(prices, periods=14):
-    """計算 RSI 技術指標"""
-    try:
-        if len(prices) < periods + 1:
-            logger.warning(f"⚠️ RSI計算：數據不足，需要{periods + 1}個數據點，實際只有{len(prices)}個")
-            return None
-
-        # 轉換為numpy數組並處理NaN值
-        prices = np.array(prices, dtype=float)
-        valid_prices = prices[~np.isnan(prices)]
-
-        if len(valid_prices) < periods + 1:
-            logger.warning(f"⚠️ RSI計算：有效數據不足，需要{periods + 1}個數據點，實際只有{len(valid_prices)}個")
-            return None
-
-        # 計算價格變化
-        deltas = np.diff(valid_prices)
-
-        if len(deltas) < periods:
-            logger.warning(f"⚠️ RSI計算：價格變化數據不足，需要{periods}個數據點，實際只有{len(deltas)}個")
-            return None
+def calculate_rsi_series(prices, periods=(14,)) -> Dict[int, np.ndarray]:
+    """向量化 Wilder RSI - 一次計算多個週期的完整 RSI 序列
 
-        # 分離上漲和下跌
-        up_moves = np.where(deltas > 0, deltas, 0)
-        down_moves = np.where(deltas < 0, -deltas, 0)
+    漲跌幅只計算一次並由各週期共用；返回 {period: ndarray}，與輸入等長，
+    數據不足或原始價格為 NaN 的位置為 NaN
+    """
+    prices = np.asarray(prices, dtype=float)
+    valid = ~np.isnan(prices)
+    valid_prices = prices[valid]
+
+    deltas = np.diff(valid_prices)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+
+    result = {}
+    for period in periods:
+        rsi = np.full(len(valid_prices), np.nan)
+        if len(deltas) >= period:
+            avg_gain = wilder_average(gains, period)
+            avg_loss = wilder_average(losses, period)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = 100 - (100 / (1 + avg_gain / avg_loss))
+            # 無跌幅時為 100，完全無變化時為 50（與 rsi_from_averages 一致）
+            values = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), values)
+            values[np.isnan(avg_gain)] = np.nan
+            rsi[1:] = values
+
+        series = np.full(len(prices), np.nan)
+        series[valid] = rsi
+        result[period] = series
+
+    return result
 
-        # 計算最近periods期的平均上漲和下跌
-        if len(up_moves) >= periods and len(down_moves) >= periods:
-            avg_up = np.mean(up_moves[-periods:])
-            avg_down = np.mean(down_moves[-periods:])
 
-            # 處理除零情況
-            if avg_down == 0:
-                if avg_up == 0:
-                    return 50.0  # 如果沒有變化，返回中性值
-                else:
-                    return 100.0  # 只有上漲，返回最大值
-
-            # 計算相對強弱比和RSI
-            rs = avg_up / avg_down
-            rsi = 100 - (100 / (1 + rs))
-            
-            # 確保結果在有效範圍內
-            rsi = max(0, min(100, rsi))
-            
-            logger.info(f"✅ RSI計算成功：{rsi:.1f} (periods={periods})")
-            return round(float(rsi), 1)
-        else:
-            logger.warning(f"⚠️ RSI計算：數據點不足，up_moves={len(up_moves)}, down_moves={len(down_moves)}, 需要{periods}")
+def calculate_rsi(prices, periods=14):
+    """計算 RSI 技術指標 - 最新一筆 Wilder RSI（數據不足時返回 None）"""
+    try:
+        rsi = calculate_rsi_series(prices, periods=(periods,))[periods]
+        valid_rsi = rsi[~np.isnan(rsi)]
+        if len(valid_rsi) == 0:
+            indicator_logger.debug(f"RSI計算：數據不足，需要{periods + 1}個有效數據點")
             return None
+        return round(valid_rsi[-1], 1)
 
     except Exception as e:
-        logger.warning(f"⚠️ RSI 計算錯誤: {e}")
+        indicator_logger.warning(f"⚠️ RSI 計算錯誤: {e}")
         return None
 
 
-def calculate_quarterly_average_line(hist_data):
-    """
-    計算轉折點（Pivot Point）- 每月初計算一次，該點為前三個月最高價與最低價的平均值，每月只產生一個點，並可連成折線圖。
-    """
-    try:
-        # 確保索引為 DatetimeIndex
-        if not isinstance(hist_data.index, pd.DatetimeIndex):
-            hist_data.index = pd.to_datetime(hist_data.index)
-
-        # 統一處理時區問題，轉換為台北時間 (+8)
-        if hist_data.index.tz is None:
-            # 假設是UTC時間，轉換為台北時間
-            hist_data.index = hist_data.index + timedelta(hours=8)
-        else:
-            # 轉換為台北時間
-            hist_data.index = hist_data.index.tz_convert('Asia/Taipei')
+def build_rsi_lines(moving_averages: Dict[str, Any], periods, rsi_series: Optional[Dict[int, Any]] = None
+                    ) -> Dict[str, list]:
+    """建立 RSI 副圖數據 {'rsi_14': [{'time', 'value'}]}，與圖表共用同一時間軸（可傳入已計算的 RSI 序列）"""
+    times = moving_averages["time"]
+    if rsi_series is None:
+        rsi_series = calculate_rsi_series(moving_averages["close"], periods)
+    rsi_lines = {}
+    for period, values in rsi_series.items():
+        positions = np.flatnonzero(~np.isnan(values))
+        rsi_lines[f"rsi_{period}"] = [
+            {'time': times[pos], 'value': round(value, 2)}
+            for pos, value in zip(positions.tolist(), values[positions].tolist())
+        ]
+    return rsi_lines
 
-        # 移除時區信息，統一為本地時間
-        hist_data.index = hist_data.index.tz_localize(None)
 
-        # 確保數據按時間排序
-        hist_data = hist_data.sort_index()
+# 轉折點的已結束月份彙總快取: memo_key -> {'start', 'closed_bars', 'months'}
+_pivot_month_memo: Dict[Any, Dict[str, Any]] = {}
 
-        if len(hist_data) < 90:
-            logger.warning("⚠️ 數據不足90天，無法計算轉折點")
-            return []
 
-        points = []
+def _aggregate_months(frame):
+    """以 reduceat 一次計算各月最高價、最低價、首個交易時間及其收盤價（frame 須已依時間排序）"""
+    months = frame.index.to_period('M')
+    _, first_positions = np.unique(months.asi8, return_index=True)
+    return pd.DataFrame({
+        'high': np.fmax.reduceat(frame['High'].to_numpy(dtype=float), first_positions),
+        'low': np.fmin.reduceat(frame['Low'].to_numpy(dtype=float), first_positions),
+        'first_time': frame.index[first_positions],
+        'first_close': frame['Close'].to_numpy(dtype=float)[first_positions]
+    }, index=months[first_positions])
 
-        # 修正：使用更精確的月份計算方法
-        # 將數據按月份分組
-        hist_data['year_month'] = hist_data.index.to_period('M')
-        monthly_groups = hist_data.groupby('year_month')
 
-        # 獲取所有月份
-        all_months = sorted(monthly_groups.groups.keys())
+def _monthly_aggregates(frame, memo_key=None):
+    """取得各月彙總 - 已結束的月份依 memo_key 快取，刷新時只重新計算當月"""
+    if memo_key is None:
+        return _aggregate_months(frame)
 
-        # 從第4個月開始計算（需要前3個月的數據）
-        for i in range(3, len(all_months)):
-            current_month = all_months[i]
+    current_month_start = frame.index[-1].to_period('M').start_time
+    split = int(frame.index.searchsorted(current_month_start))
+    if split == 0:
+        return _aggregate_months(frame)
 
-            # 獲取前三個月的數據
-            prev3_months = all_months[i - 3:i]
-            prev3_data = hist_data[hist_data['year_month'].isin(prev3_months)]
+    memo = _pivot_month_memo.get(memo_key)
+    if memo is None or memo['start'] != frame.index[0] or memo['closed_bars'] != split:
+        memo = {'start': frame.index[0], 'closed_bars': split, 'months': _aggregate_months(frame.iloc[:split])}
+        _pivot_month_memo[memo_key] = memo
+
+    return pd.concat([memo['months'], _aggregate_months(frame.iloc[split:])])
 
-            if len(prev3_data) == 0:
-                logger.warning(f"⚠️ 月份 {current_month} 的前三個月數據不足")
-                continue
 
-            # 計算前三個月的最高價和最低價
-            high = prev3_data['High'].max()
-            low = prev3_data['Low'].min()
-            pivot = (high + low) / 2
+def calculate_quarterly_average_line(hist_data, memo_key=None):
+    """
+    計算轉折點（Pivot Point）- 每月初計算一次，該點為前三個月最高價與最低價的平均值，每月只產生一個點，並可連成折線圖。
+    以月彙總加上 3 個月滾動視窗一次計算，不修改傳入的 hist_data；提供 memo_key 時已結束月份的彙總會被快取。
+    """
+    try:
+        # 統一轉換為台北時間並移除時區資訊（建立新的 frame，不修改輸入）
+        local_index = to_taipei_index(hist_data.index).tz_localize(None)
+        frame = pd.DataFrame(
+            {column: hist_data[column].to_numpy() for column in ('High', 'Low', 'Close')},
+            index=local_index
+        )
+        if not frame.index.is_monotonic_increasing:
+            frame = frame.sort_index()
 
-            # 獲取當前月份的數據
-            current_month_data = hist_data[hist_data['year_month'] == current_month]
+        if len(frame) < 90:
+            indicator_logger.warning("⚠️ 數據不足90天，無法計算轉折點")
+            return []
 
-            # 修正：確保每個月都有一個轉折點，使用當月第一個交易日
-            if len(current_month_data) > 0:
-                # 使用當月第一個交易日
-                first_trading_day = current_month_data.index.min()
-                point_date = first_trading_day.strftime('%Y-%m-%d')
-            else:
-                # 如果當月沒有交易數據，使用月初日期
-                point_date = current_month.to_timestamp().strftime('%Y-%m-%d')
+        monthly = _monthly_aggregates(frame, memo_key)
+        if len(monthly) < 4:
+            return []
 
-            # 獲取當日價格進行比較
-            current_price = None
-            try:
-                # 嘗試獲取轉折點日期當天的價格
-                pivot_date = pd.to_datetime(point_date)
-                if pivot_date in hist_data.index:
-                    current_price = float(hist_data.loc[pivot_date, 'Close'])
-                else:
-                    # 如果沒有當天數據，使用最近的價格
-                    current_price = float(hist_data['Close'].iloc[-1])
-            except Exception as e:
-                logger.warning(f"⚠️ 獲取轉折點當日價格失敗: {e}")
-                current_price = float(hist_data['Close'].iloc[-1])
-            
+        # 前三個月（以有數據的月份計）的最高價與最低價
+        month_high = monthly['high'].to_numpy()
+        month_low = monthly['low'].to_numpy()
+        prev3_high = np.fmax(np.fmax(month_high[:-3], month_high[1:-2]), month_high[2:-1])
+        prev3_low = np.fmin(np.fmin(month_low[:-3], month_low[1:-2]), month_low[2:-1])
+        pivots = (prev3_high + prev3_low) / 2
+
+        # 轉折點日期為當月第一個交易日；該日 00:00 有K線時以其收盤價比較，否則使用最新價格
+        latest_close = float(frame['Close'].iloc[-1])
+        first_times = monthly['first_time'].iloc[3:]
+        has_midnight_bar = (first_times == first_times.dt.normalize()).to_numpy()
+        current_prices = np.where(has_midnight_bar, monthly['first_close'].to_numpy()[3:], latest_close)
+        point_dates = np.datetime_as_string(first_times.to_numpy().astype('datetime64[D]'), unit='D')
+        month_labels = monthly.index.astype(str)
+
+        points = []
+        for i, (point_date, pivot, high, low, current_price) in enumerate(zip(
+                point_dates.tolist(), pivots.tolist(), prev3_high.tolist(), prev3_low.tolist(),
+                current_prices.tolist())):
             # 判斷價格關係
             price_status = "bullish" if current_price > pivot else "bearish" if current_price < pivot else "neutral"
-            
             points.append({
                 'time': point_date,
-                'price': float(pivot),
-                'high': float(high),
-                'low': float(low),
-                'range': f"{prev3_months[0]}~{prev3_months[-1]}",
+                'price': pivot,
+                'high': high,
+                'low': low,
+                'range': f"{month_labels[i]}~{month_labels[i + 2]}",
                 'current_price': current_price,
                 'price_status': price_status
             })
 
-        # 按時間排序確保折線圖正確連接
-        points.sort(key=lambda x: x['time'])
-
-        logger.info(f"📊 轉折點計算完成，共 {len(points)} 個數據點")
+        indicator_logger.info(f"📊 轉折點計算完成，共 {len(points)} 個數據點")
 
         return points
 
     except Exception as e:
-        logger.warning(f"⚠️ 轉折點計算錯誤: {e}")
+        indicator_logger.warning(f"⚠️ 轉折點計算錯誤: {e}")
         return []
 
 
-def calculate_ma125_line(hist_data):
-    """計算MA125移動平均線"""
+def calculate_ma125_line(hist_data, moving_averages: Optional[Dict[str, Any]] = None):
+    """計算MA125移動平均線（可傳入 compute_moving_averages 的結果以共用移動平均）"""
     try:
-        # 確保數據有日期索引
-        if not isinstance(hist_data.index, pd.DatetimeIndex):
-            hist_data.index = pd.to_datetime(hist_data.index)
-
         if len(hist_data) < 125:
-            logger.warning("⚠️ 數據不足125天，無法計算MA125")
+            indicator_logger.warning("⚠️ 數據不足125天，無法計算MA125")
             return []
 
-        # 計算MA125
-        ma_125_data = hist_data['Close'].rolling(window=125).mean().dropna()
-
-        # 轉換為圖表數據格式，確保時間格式與圖表數據一致
-        ma_125_line_data = []
-        for idx, val in ma_125_data.items():
-            # 確保時間格式與圖表數據一致，並正確處理時區
-            if hasattr(idx, 'tz_localize'):
-                if idx.tz is None:
-                    # 假設是UTC時間，轉換為台北時間
-                    idx_local = idx + timedelta(hours=8)
-                else:
-                    # 轉換為台北時間
-                    idx_local = idx.tz_convert('Asia/Taipei')
-            else:
-                # 假設是UTC時間，轉換為台北時間
-                idx_local = idx + timedelta(hours=8)
+        if moving_averages is None or 125 not in moving_averages["ma"]:
+            moving_averages = compute_moving_averages(hist_data, windows=(125,))
 
-            ma_125_line_data.append({
-                'time': idx_local.strftime('%Y-%m-%d'),
-                'price': float(val)
-            })
+        # 轉換為圖表數據格式，時間格式與圖表數據一致
+        ma_125_line_data = build_ma_line(moving_averages, 125)
 
-        logger.info(f"📊 MA125計算完成，共 {len(ma_125_line_data)} 個數據點")
+        indicator_logger.info(f"📊 MA125計算完成，共 {len(ma_125_line_data)} 個數據點")
 
         return ma_125_line_data
 
     except Exception as e:
-        logger.warning(f"⚠️ MA125計算錯誤: {e}")
+        indicator_logger.warning(f"⚠️ MA125計算錯誤: {e}")
         return []
 
 
-def detect_golden_death_cross(hist_data):
+def detect_golden_death_cross(hist_data, moving_averages: Optional[Dict[str, Any]] = None):
     """檢測黃金交叉和死亡交叉 - 使用MA5穿越MA20（已整合到技術指標中）"""
     try:
         if len(hist_data) < 20:
             return {"golden_cross": False, "death_cross": False, "message": "", "status": "normal"}
 
-        # 計算MA20和MA5
-        ma_20 = hist_data['Close'].rolling(window=20).mean()
-        ma_5 = hist_data['Close'].rolling(window=5).mean()
+        # 取得MA20和MA5
+        if moving_averages is None:
+            moving_averages = compute_moving_averages(hist_data, windows=(5, 20))
+        ma_20 = moving_averages["ma"][20]
+        ma_5 = moving_averages["ma"][5]
 
         # 獲取最新和前一天的數據
-        current_ma20 = float(ma_20.iloc[-1])
-        current_ma5 = float(ma_5.iloc[-1])
-        prev_ma20 = float(ma_20.iloc[-2]) if len(ma_20) > 1 else current_ma20
-        prev_ma5 = float(ma_5.iloc[-2]) if len(ma_5) > 1 else current_ma5
-        current_price = float(hist_data['Close'].iloc[-1])
+        current_ma20 = ma_20[-1]
+        current_ma5 = ma_5[-1]
+        prev_ma20 = ma_20[-2] if len(ma_20) > 1 else current_ma20
+        prev_ma5 = ma_5[-2] if len(ma_5) > 1 else current_ma5
+        current_price = moving_averages["close"][-1]
 
         # 檢測黃金交叉（MA5從下方穿越MA20，且收盤價高於MA20）
-        golden_cross = bool((prev_ma5 <= prev_ma20) and (current_ma5 > current_ma20) and (current_price > current_ma20))
+        golden_cross = (prev_ma5 <= prev_ma20) and (current_ma5 > current_ma20) and (current_price > current_ma20)
 
         # 檢測死亡交叉（MA5從上方穿越MA20，且收盤價低於MA20）
-        death_cross = bool((prev_ma5 >= prev_ma20) and (current_ma5 < current_ma20) and (current_price < current_ma20))
+        death_cross = (prev_ma5 >= prev_ma20) and (current_ma5 < current_ma20) and (current_price < current_ma20)
 
         message = ""
         status = "normal"
@@ -1105,7 +4817,7 @@ def detect_golden_death_cross(hist_data):
         }
 
     except Exception as e:
-        logger.warning(f"⚠️ 交叉檢測錯誤: {e}")
+        indicator_logger.warning(f"⚠️ 交叉檢測錯誤: {e}")
         return {"golden_cross": False, "death_cross": False, "message": "", "status": "normal"}
 
 
@@ -1145,22 +4857,23 @@ def determine_market_status():
             return "closed"
 
     except Exception as e:
-        logger.error(f"❌ 市場狀態判斷失敗: {e}")
+        indicator_logger.error(f"❌ 市場狀態判斷失敗: {e}")
         return "unknown"
 
 
-def get_market_name(info):
+def get_market_name(info, symbol: str = DEFAULT_SYMBOL):
     """獲取市場名稱"""
+    default_name = SYMBOL_REGISTRY.get(symbol, {}).get('name', symbol)
     try:
         if isinstance(info, dict) and info:
-            return info.get('longName', 'Gold Futures (GC=F)')
-        return 'Gold Futures (GC=F)'
+            return info.get('longName', default_name)
+        return default_name
     except Exception as e:
         logger.error(f"❌ 獲取市場名稱失敗: {e}")
-        return 'Gold Futures (GC=F)'
+        return default_name
 
 
-def create_mock_gold_data(period: str):
+def create_mock_gold_data(period: str, response_format: str = "rows"):
     """創建模擬黃金價格數據作為備選方案"""
     logger.info("🔧 使用模擬數據作為備選方案")
 
@@ -1184,7 +4897,7 @@ def create_mock_gold_data(period: str):
         price = base_price * (1 + price_variation)
 
         chart_data.append({
-            "time": date.isoformat(),
+            "time": date,
             "price": round(price, 2),
             "high": round(price * 1.005, 2),
             "low": round(price * 0.995, 2),
@@ -1194,7 +4907,7 @@ def create_mock_gold_data(period: str):
 
     logger.info(f"🔧 生成模擬數據: {len(chart_data)} 個數據點")
 
-    return {
+    response = {
         "status": "success",
         "data": {
             "symbol": "GC=F",
@@ -1211,7 +4924,7 @@ def create_mock_gold_data(period: str):
             "volume_24h": np.random.randint(50000, 200000),
             "currency": "USD",
             "unit": "per ounce",
-            "last_updated": datetime.now().isoformat(),
+            "last_updated": datetime.now(),
             "chart_data": chart_data,
             "market_status": "open",
             "technical_indicators": {
@@ -1228,11 +4941,12 @@ def create_mock_gold_data(period: str):
         "next_update": (datetime.now() + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S"),
         "data_source": "Mock Data (Yahoo Finance 不可用)"
     }
+    return to_columnar_payload(response) if response_format == "columnar" else response
 
 
 @app.post("/api/send-mail-to-n8n")
 async def send_mail_to_n8n(mail_data: MailSenderRequest):
-    """發送郵件數據到 N8N webhook"""
+    """發送郵件數據到 N8N webhook - 排入投遞佇列後返回 202 與工作 ID"""
     try:
         if not stored_data:
             logger.error("❌ 沒有可用的市場分析資料")
@@ -1240,72 +4954,241 @@ async def send_mail_to_n8n(mail_data: MailSenderRequest):
 
         # 構建發送到 N8N 的數據結構
         send_data = {
-            **stored_data,
-            "mail_config": {
-                "recipient_email": str(mail_data.recipient_email),
-                "sender_name": mail_data.sender_name or "市場分析系統",
-                "subject": mail_data.subject or "市場分析報告",
-                "priority": mail_data.priority or "normal",
-                "mail_type": mail_data.mail_type or "daily",
-                "custom_message": mail_data.custom_message or "",
-                "include_charts": mail_data.include_charts,
-                "include_recommendations": mail_data.include_recommendations,
-                "include_risk_warning": mail_data.include_risk_warning
-            },
-            "system_info": {
-                "send_timestamp": datetime.now().isoformat(),
-                "system_version": CONFIG['SYSTEM_INFO']['version'],
-                "source": "mail-sender-page"
-            },
-            "sentiment_analysis": {
-                "score": stored_data.get("score", 0),
-                "text": get_sentiment_text(stored_data.get("score", 0)),
-                "emoji": get_market_emoji(stored_data.get("score", 0))
-            }
+            **build_mail_report_payload("mail-sender-page"),
+            "mail_config": build_mail_config(mail_data, str(mail_data.recipient_email))
         }
 
         # 新增log，記錄寄出內容
         try:
-            import json
             logger.info(f"📧 寄出郵件內容: {json.dumps(send_data, ensure_ascii=False)[:2000]}")  # 最多log前2000字
         except Exception as log_e:
             logger.warning(f"⚠️ 郵件內容log失敗: {str(log_e)}")
 
-        response = requests.post(
-            CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url'],
-            json=send_data,
-            headers={'Content-Type': 'application/json'},
-            timeout=CONFIG['WEBHOOK_CONFIG']['timeout']
+        # 排入持久化佇列後立即返回，投遞由背景 worker 負責（失敗時自動重試）
+        job_id = await mail_job_queue.enqueue(send_data, str(mail_data.recipient_email))
+        return FastJSONResponse(
+            status_code=202,
+            content={
+                "status": "queued",
+                "message": "郵件已排入發送佇列",
+                "job_id": job_id,
+                "status_url": f"/api/mail-jobs/{job_id}",
+                "queued_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "recipient": str(mail_data.recipient_email)
+            }
         )
 
-        if response.status_code == 200:
-            return {
-                "status": "success",
-                "message": f"郵件數據已成功發送到 N8N",
-                "sent_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "recipient": str(mail_data.recipient_email),
-                "n8n_response": response.text[:100] if response.text else "無回應內容"
-            }
-        else:
-            logger.error(f"❌ N8N webhook 回應錯誤: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=response.status_code, detail=f"N8N webhook 回應錯誤: {response.text}")
-
-    except requests.exceptions.Timeout:
-        logger.error("❌ 請求超時")
-        raise HTTPException(status_code=500, detail="請求超時")
-    except requests.exceptions.ConnectionError:
-        logger.error("❌ 無法連接到 N8N webhook")
-        raise HTTPException(status_code=500, detail="無法連接到 N8N webhook")
+    except HTTPException:
+        raise
+    except MailQueueFull as e:
+        logger.warning(f"⚠️ {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         logger.error(f"❌ 發送郵件到 N8N 失敗: {str(e)}")
         raise HTTPException(status_code=500, detail=f"發送失敗: {str(e)}")
 
 
+def build_mail_config(options: MailOptions, recipient_email: str) -> Dict[str, Any]:
+    """郵件設定 - 每位收件人（或每批收件人）各自的部分"""
+    return {
+        "recipient_email": recipient_email,
+        "sender_name": options.sender_name or "市場分析系統",
+        "subject": options.subject or "市場分析報告",
+        "priority": options.priority or "normal",
+        "mail_type": options.mail_type or "daily",
+        "custom_message": options.custom_message or "",
+        "include_charts": options.include_charts,
+        "include_recommendations": options.include_recommendations,
+        "include_risk_warning": options.include_risk_warning
+    }
+
+
+def build_mail_report_payload(source: str) -> Dict[str, Any]:
+    """郵件報告內容 - 所有收件人共用的部分（市場分析資料、系統資訊、情感分析）"""
+    return {
+        **stored_data,
+        "system_info": {
+            "send_timestamp": datetime.now().isoformat(),
+            "system_version": CONFIG['SYSTEM_INFO']['version'],
+            "source": source
+        },
+        "sentiment_analysis": {
+            "score": stored_data.get("score", 0),
+            "text": get_sentiment_text(stored_data.get("score", 0)),
+            "emoji": get_market_emoji(stored_data.get("score", 0))
+        }
+    }
+
+
+_email_adapter = TypeAdapter(EmailStr)
+
+
+def parse_bulk_recipients(bulk: BulkMailRequest):
+    """整理批次收件人 - 合併清單與 CSV、驗證格式並去除重複，返回 (有效收件人, 無效項目)"""
+    candidates = list(bulk.recipients)
+    if bulk.recipients_csv:
+        for row in csv.reader(io.StringIO(bulk.recipients_csv)):
+            # 每列取第一個含 @ 的欄位，標題列與空白列自然略過
+            cell = next((cell.strip() for cell in row if '@' in cell), None)
+            if cell:
+                candidates.append(cell)
+
+    recipients, invalid, seen = [], [], set()
+    for candidate in candidates:
+        try:
+            email = str(_email_adapter.validate_python(candidate.strip()))
+        except ValidationError:
+            invalid.append(candidate)
+            continue
+        if email.lower() not in seen:
+            seen.add(email.lower())
+            recipients.append(email)
+    return recipients, invalid
+
+
+# 呼叫端中斷串流後仍在執行的批次（保持引用，避免任務被回收）
+_detached_bulk_tasks: set = set()
+
+
+@app.post("/api/send-mail-to-n8n/bulk")
+async def send_bulk_mail_to_n8n(request: Request):
+    """批次發送郵件到 N8N - 報告內容只建構一次，以有限並發分批呼叫 webhook，並以 NDJSON 串流回報進度
+
+    請求內容為 BulkMailRequest JSON，或 Content-Type: text/csv 的收件人 CSV（郵件選項放在 query string）。
+    投遞失敗的批次會排入郵件投遞佇列自動重試；呼叫端中斷串流時，尚未開始的批次也改由佇列發送。
+    """
+    if not stored_data:
+        logger.error("❌ 沒有可用的市場分析資料")
+        raise HTTPException(status_code=400, detail="沒有可用的市場分析資料")
+
+    try:
+        if request.headers.get('content-type', '').startswith('text/csv'):
+            body = (await request.body()).decode('utf-8-sig')
+            bulk = BulkMailRequest(**request.query_params, recipients_csv=body)
+        else:
+            bulk = BulkMailRequest(**await request.json())
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"批次發送請求格式錯誤: {str(e)}")
+
+    bulk_config = CONFIG['MAIL_BULK_CONFIG']
+    recipients, invalid = parse_bulk_recipients(bulk)
+    if not recipients:
+        raise HTTPException(status_code=400, detail="沒有有效的收件人")
+    if len(recipients) > bulk_config['max_recipients']:
+        raise HTTPException(
+            status_code=413, detail=f"收件人數量 {len(recipients)} 超過上限 {bulk_config['max_recipients']}"
+        )
+
+    batch_size = min(max(1, bulk.batch_size), bulk_config['max_batch_size'])
+    concurrency = min(max(1, bulk.concurrency or bulk_config['concurrency']), bulk_config['concurrency'])
+    batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+
+    # 報告內容只建構一次，各批次只替換 mail_config
+    report = build_mail_report_payload("mail-bulk-sender")
+
+    def batch_payload(batch) -> str:
+        mail_config = build_mail_config(bulk, ", ".join(batch))
+        if batch_size > 1:
+            mail_config["recipients"] = batch
+        return dumps_json({**report, "mail_config": mail_config}).decode('utf-8')
+
+    logger.info(f"📧 批次發送: {len(recipients)} 位收件人，{len(batches)} 批，並發 {concurrency}")
+    semaphore = asyncio.Semaphore(concurrency)
+    aborted = False
+
+    async def send_batch(index: int, batch) -> Dict[str, Any]:
+        payload = batch_payload(batch)
+        result = {"event": "batch", "batch": index, "recipients": len(batch)}
+        async with semaphore:
+            if aborted:
+                error = "批次發送串流已中斷"
+            else:
+                started = time.perf_counter()
+                try:
+                    response = await outbound_http.request(
+                        "n8n_webhook",
+                        "POST",
+                        CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url'],
+                        content=payload.encode('utf-8'),
+                        headers={'Content-Type': 'application/json'}
+                    )
+                    result["status_code"] = response.status_code
+                    error = None if 200 <= response.status_code < 300 else f"N8N webhook 回應錯誤: {response.status_code}"
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        if error is None:
+            result["status"] = "delivered"
+            return result
+
+        # 投遞失敗時交給持久化佇列重試
+        result["error"] = error
+        try:
+            result["job_id"] = await mail_job_queue.enqueue(payload, ", ".join(batch))
+            result["status"] = "queued"
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{error}; 排入佇列失敗: {e}"
+        return result
+
+    async def progress():
+        nonlocal aborted
+        started = time.perf_counter()
+        yield dumps_json({
+            "event": "start",
+            "recipients": len(recipients),
+            "invalid": len(invalid),
+            "invalid_samples": invalid[:20],
+            "batches": len(batches),
+            "batch_size": batch_size,
+            "concurrency": concurrency
+        }) + b"\n"
+
+        counts = {"delivered": 0, "queued": 0, "failed": 0}
+        tasks = [asyncio.ensure_future(send_batch(index, batch)) for index, batch in enumerate(batches)]
+        try:
+            for completed, task in enumerate(asyncio.as_completed(tasks), start=1):
+                result = await task
+                counts[result["status"]] += result["recipients"]
+                result.update({"completed_batches": completed, "total_batches": len(batches)})
+                yield dumps_json(result) + b"\n"
+        finally:
+            # 呼叫端中斷串流時不取消批次：已送出的請求繼續完成，尚未開始的批次排入郵件投遞佇列
+            pending = [task for task in tasks if not task.done()]
+            if pending:
+                aborted = True
+                for task in pending:
+                    _detached_bulk_tasks.add(task)
+                    task.add_done_callback(_detached_bulk_tasks.discard)
+                logger.warning(f"⚠️ 批次發送串流中斷，{len(pending)} 批未完成的郵件改由郵件投遞佇列處理")
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"📧 批次發送完成: 成功 {counts['delivered']}，排入重試 {counts['queued']}，失敗 {counts['failed']}，"
+            f"耗時 {elapsed:.2f}s"
+        )
+        yield dumps_json({"event": "done", **counts, "elapsed_seconds": round(elapsed, 3)}) + b"\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+@app.get("/api/mail-jobs/{job_id}")
+async def get_mail_job(job_id: str):
+    """查詢郵件投遞狀態 - queued / sending / retrying / delivered / dead"""
+    job = await mail_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"找不到郵件工作: {job_id}")
+    return {"status": "success", "job": job}
+
+
 @app.get("/api/test-n8n-connection")
 async def test_n8n_connection():
     """測試 N8N 連接"""
     try:
-        response = requests.get(
+        response = await outbound_http.request(
+            "n8n_connection_test",
+            "GET",
             CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url'],
             timeout=10
         )
@@ -1313,6 +5196,8 @@ async def test_n8n_connection():
             "status": "success",
             "message": "N8N 連接正常",
             "status_code": response.status_code,
+            "latency_ms": outbound_http.latency_ms(response),
+            "http_version": response.http_version,
             "url": CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url']
         }
     except Exception as e:
@@ -1332,7 +5217,7 @@ async def debug_stored_data():
                 "status": "warning",
                 "message": "沒有存儲的數據",
                 "data": None,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now()
             }
 
         # 構建示例郵件數據（不實際發送）
@@ -1371,7 +5256,7 @@ async def debug_stored_data():
             "status": "success",
             "message": "當前存儲的數據結構",
             "json_data": sample_send_data,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "webhook_url": CONFIG['WEBHOOK_CONFIG']['n8n_webhook_url']
         }
 
@@ -1380,29 +5265,74 @@ async def debug_stored_data():
         return {
             "status": "error",
             "message": f"調試數據失敗: {str(e)}",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
+        }
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """系統效能指標 - 快取命中率等"""
+    return {
+        "status": "success",
+        "timestamp": datetime.now(),
+        "market_data_cache": market_data_cache.stats(),
+        "executor": blocking_executor.stats(),
+        "market_data_refresher": market_data_refresher.stats(),
+        "ohlcv_store": ohlcv_store.stats() if ohlcv_store is not None else {"enabled": False},
+        "dependencies": dependency_prober.results,
+        "outbound_http": outbound_http.stats(),
+        "mail_queue": await mail_job_queue.stats(),
+        "logging": logging_stats(),
+        "compression": compression_stats.stats(),
+        "conditional_get": conditional_get_summary(),
+        "stream": event_broadcaster.stats(),
+        "page_cache": page_cache.stats(),
+        "state": shared_state.stats(),
+        "report_history": await report_history.stats() if report_history is not None else {"enabled": False},
+        "ingestion": {
+            "reports": ingestion_stats["reports"],
+            "rejected": ingestion_stats["rejected"],
+            "bytes": ingestion_stats["bytes"],
+            **summarize_latencies(ingestion_stats["latencies"])
+        }
+    }
+
+
+@app.get("/health/live")
+async def health_live():
+    """存活檢查 - 不進行任何 I/O，供 Docker HEALTHCHECK 與負載平衡器頻繁探測"""
+    return {
+        "status": "alive",
+        "timestamp": datetime.now(),
+        "uptime": str(datetime.now() - system_stats["uptime_start"]).split('.')[0]
+    }
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """就緒檢查 - 返回背景探測快取的依賴服務狀態，啟動預熱完成前返回 503"""
+    readiness = dependency_prober.readiness()
+    return FastJSONResponse(
+        status_code=503 if readiness in ("warming", "starting") else 200,
+        content={
+            "status": readiness,
+            "timestamp": datetime.now(),
+            "startup": startup_state,
+            "probe_interval_seconds": dependency_prober.interval_seconds,
+            "dependencies": dependency_prober.results
         }
+    )
 
 
 @app.get("/health")
 async def health_check():
-    """系統健康檢查 - 增強版本"""
+    """系統健康檢查 - 增強版本（依賴服務狀態來自背景探測快取）"""
     uptime = datetime.now() - system_stats["uptime_start"]
-
-    # 測試黃金價格 API
-    gold_api_status = "healthy"
-    try:
-        import yfinance as yf
-        test_ticker = yf.Ticker("GC=F")
-        test_data = test_ticker.history(period="1d", interval="1d")
-        if test_data.empty:
-            gold_api_status = "degraded"
-    except Exception:
-        gold_api_status = "unhealthy"
+    gold_api_status = dependency_prober.status("yfinance")
 
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.now(),
         "system": CONFIG['SYSTEM_INFO']['name'],
         "version": CONFIG['SYSTEM_INFO']['version'],
         "has_market_data": len(stored_data) > 0,
@@ -1417,9 +5347,10 @@ async def health_check():
         },
         "services": {
             "yfinance": gold_api_status,
-            "n8n_webhook": "unknown",
+            "n8n_webhook": dependency_prober.status("n8n_webhook"),
             "static_files": "healthy"
-        }
+        },
+        "dependencies": dependency_prober.results
     }
 
 
@@ -1464,14 +5395,15 @@ def get_market_emoji(score: float) -> str:
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP異常: {exc.status_code} - {exc.detail}")
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "status": "error",
             "message": exc.detail,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "path": str(request.url)
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -1479,24 +5411,37 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"未處理的異常: {str(exc)}")
     system_stats["errors"] += 1
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content={
             "status": "error",
             "message": "內部服務器錯誤",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.now(),
             "path": str(request.url)
         }
     )
 
 
 def main():
+    server_config = CONFIG['SERVER_CONFIG']
+    reload = server_config.get('debug', False)
+    workers = server_config['workers']
+    if workers > 1 and reload:
+        logger.warning("⚠️ DEBUG 自動重新載入模式只支援單一 worker，忽略 WORKERS 設定")
+        workers = 1
+    if workers > 1 and not state_backend.shared:
+        logger.warning(
+            f"⚠️ {workers} 個 worker 使用 memory 狀態後端，各 worker 的報告與計數器不一致；"
+            "請設定 STATE_BACKEND=sqlite 或 redis"
+        )
+    # 多 worker 與自動重新載入需以匯入字串啟動，每個 worker 行程各自匯入應用
     uvicorn.run(
-        app,
-        host=CONFIG['SERVER_CONFIG']['host'],
-        port=CONFIG['SERVER_CONFIG']['port'],
+        "main:app" if workers > 1 or reload else app,
+        host=server_config['host'],
+        port=server_config['port'],
         log_level="info",
-        reload=CONFIG['SERVER_CONFIG'].get('debug', False)
+        reload=reload,
+        workers=workers
     )
 
 
@@ -0,0 +1,94 @@
+"""
+圖表數據建構效能測試 - 比較逐列 iterrows 迴圈與向量化 build_chart_data
+
+執行方式: python test/benchmark_chart_data.py
+"""
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# main.py 以相對路徑建立日誌檔，需在專案根目錄匯入
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+from main import build_chart_data  # noqa: E402
+
+BAR_COUNTS = [1_000, 10_000, 100_000]
+REPEAT = 3
+
+
+def make_bars(n, freq='1min'):
+    """產生帶時區的模擬 OHLCV 數據（含少量 NaN）"""
+    rng = np.random.default_rng(42)
+    index = pd.date_range(end=pd.Timestamp('2025-01-01', tz='America/New_York'), periods=n, freq=freq)
+    close = 2000 + np.cumsum(rng.normal(0, 1, n))
+    data = pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, n),
+        'High': close + 2,
+        'Low': close - 2,
+        'Close': close,
+        'Volume': rng.integers(0, 5000, n).astype(float)
+    }, index=index)
+    data.iloc[::97, data.columns.get_loc('Close')] = np.nan
+    data.iloc[::89, data.columns.get_loc('Volume')] = np.nan
+    return data
+
+
+def legacy_chart_data(hist_data, current_price):
+    """原本 get_gold_price 內的逐列實作"""
+    chart_data = []
+    for idx, row in hist_data.iterrows():
+        if hasattr(idx, 'tz_localize'):
+            if idx.tz is None:
+                idx_local = idx + timedelta(hours=8)
+            else:
+                idx_local = idx.tz_convert('Asia/Taipei')
+        else:
+            idx_local = idx + timedelta(hours=8)
+
+        chart_data.append({
+            "time": idx_local.strftime('%Y-%m-%d'),
+            "price": float(row['Close']) if not pd.isna(row['Close']) else current_price,
+            "high": float(row['High']) if not pd.isna(row['High']) else current_price,
+            "low": float(row['Low']) if not pd.isna(row['Low']) else current_price,
+            "open": float(row['Open']) if not pd.isna(row['Open']) else current_price,
+            "volume": int(row['Volume']) if not pd.isna(row['Volume']) and row['Volume'] > 0 else 0
+        })
+    return chart_data
+
+
+def best_of(func, *args):
+    timings = []
+    result = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    print(f"{'bars':>8} | {'iterrows (s)':>12} | {'vectorized (s)':>14} | {'speedup':>8}")
+    print("-" * 52)
+    for n in BAR_COUNTS:
+        data = make_bars(n)
+        fallback = float(data['Close'].dropna().iloc[-1])
+
+        legacy_time, legacy = best_of(legacy_chart_data, data, fallback)
+        fast_time, fast = best_of(build_chart_data, data, fallback)
+
+        if legacy != fast:
+            print(f"❌ {n} 筆數據輸出不一致")
+            sys.exit(1)
+
+        print(f"{n:>8} | {legacy_time:>12.4f} | {fast_time:>14.4f} | {legacy_time / fast_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+圖表回應格式效能測試 - 比較逐點物件陣列（rows）與共用時間軸的 columnar 格式
+
+rows 格式的 chart_data、ma_lines、ma_125_line、rsi_lines 每個數據點都重複 time 與鍵名；
+columnar 格式只有一個 time 陣列，其餘序列為等長的平行數值陣列。
+量測序列化後的大小（含 gzip）、伺服器序列化時間與客戶端解析時間。
+
+執行方式: python test/benchmark_columnar.py
+"""
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# main.py 以相對路徑建立日誌檔，需在專案根目錄匯入
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+from main import build_gold_price_payload, dumps_json, to_columnar_payload  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+# (名稱, K線數, 頻率)
+SCENARIOS = [
+    ('1y 日線', 252, '1D'),
+    ('5y 日線', 5 * 252, '1D'),
+    ('1mo 小時線', 22 * 23, '1h'),
+    ('5d 1分鐘線', 5 * 23 * 60, '1min'),
+]
+REPEAT = 20
+
+
+def make_bars(n, freq):
+    """產生帶時區的模擬 OHLCV 數據"""
+    rng = np.random.default_rng(42)
+    index = pd.date_range(end=pd.Timestamp.now(tz='America/New_York').floor('min'), periods=n, freq=freq)
+    close = 2000 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, n),
+        'High': close + 2,
+        'Low': close - 2,
+        'Close': close,
+        'Volume': rng.integers(0, 5000, n).astype(float)
+    }, index=index)
+
+
+def best_of(func, *args):
+    timings = []
+    result = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    print(f"{'scenario':>12} | {'bars':>6} | {'rows KB':>8} | {'columnar KB':>11} | {'rows gz KB':>10} | "
+          f"{'col gz KB':>9} | {'dumps rows/col (ms)':>19} | {'parse rows/col (ms)':>19}")
+    print("-" * 116)
+    for label, bars, freq in SCENARIOS:
+        hist_data = make_bars(bars, freq)
+        payload = build_gold_price_payload(
+            hist_data, {}, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), '1y', '1d', None, 'GC=F'
+        )
+        series = payload.pop('series')
+        columnar = to_columnar_payload(payload, series)
+
+        dumps_rows, rows_bytes = best_of(dumps_json, payload)
+        dumps_columnar, columnar_bytes = best_of(dumps_json, columnar)
+        parse_rows, _ = best_of(json.loads, rows_bytes)
+        parse_columnar, _ = best_of(json.loads, columnar_bytes)
+        print(f"{label:>12} | {bars:>6} | {len(rows_bytes) / 1024:>8.1f} | {len(columnar_bytes) / 1024:>11.1f} | "
+              f"{len(gzip.compress(rows_bytes)) / 1024:>10.1f} | {len(gzip.compress(columnar_bytes)) / 1024:>9.1f} | "
+              f"{dumps_rows * 1000:>8.2f} / {dumps_columnar * 1000:>8.2f} | "
+              f"{parse_rows * 1000:>8.2f} / {parse_columnar * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+N8N 資料接收效能測試 - 比較原本的 receive_n8n_data 與精簡接收流程
+
+原本的流程為了記錄大小與前 500 字元把整個請求 json.dumps 兩次、每份報告約 15 行 INFO 日誌，
+並先以 safe_int/safe_str 轉換一次再交給 N8NDataExtended 驗證一次；
+精簡流程只解析、驗證一次，讀取時檢查大小上限，並以抽樣的 DEBUG 日誌取代詳細 INFO。
+
+執行方式: python test/benchmark_ingestion.py
+"""
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# main.py 以相對路徑建立日誌檔，需在專案根目錄匯入
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+import main  # noqa: E402
+
+# 保留日誌格式化的成本，但不寫入專案的日誌檔
+for handler in logging.root.handlers[:]:
+    logging.root.removeHandler(handler)
+logging.root.addHandler(logging.StreamHandler(open(os.devnull, 'w', encoding='utf-8')))
+
+REPORT_SIZES = {'10KB': 10 * 1024, '1MB': 1024 * 1024, '10MB': 10 * 1024 * 1024}
+ROUNDS = {'10KB': 300, '1MB': 30, '10MB': 5}
+logger = logging.getLogger('legacy_ingestion')
+
+
+def make_report(size: int) -> bytes:
+    """產生 emailReportHtml 約為指定大小的 N8N 報告"""
+    row = "<tr><td>黃金</td><td>2,345.60</td><td>+0.8%</td><td>市場情緒偏多</td></tr>\n"
+    html = "<html><body><table>\n" + row * (size // len(row.encode('utf-8')) + 1) + "</table></body></html>"
+    return json.dumps([{
+        "positive": 12, "neutral": 5, "negative": 3,
+        "summary": "黃金價格受美元走弱支撐，市場情緒偏多。",
+        "score": 64, "label": "樂觀",
+        "emailReportHtml": html
+    }], ensure_ascii=False).encode('utf-8')
+
+
+legacy_app = FastAPI()
+
+
+@legacy_app.post("/api/n8n-data")
+async def legacy_receive_n8n_data(request: Request):
+    """原本的 receive_n8n_data 主要流程"""
+    raw_data = await request.json()
+    logger.info(f"📨 收到 N8N 原始資料大小: {len(json.dumps(raw_data, ensure_ascii=False))} 字元")
+    logger.info(f"📨 收到 N8N 資料: {json.dumps(raw_data, ensure_ascii=False)[:500]}...")
+    market_data = raw_data[0] if isinstance(raw_data, list) else raw_data
+    logger.info("✅ 處理陣列格式數據，取第一個元素")
+    logger.info(f"📊 數據欄位: {list(market_data.keys())}")
+
+    def safe_int(value, default=0):
+        try:
+            return default if value is None else int(float(value))
+        except (ValueError, TypeError):
+            return default
+
+    def safe_str(value, default=""):
+        return default if value is None else str(value).strip()
+
+    current_time = datetime.now()
+    processed_data = {
+        "positive": safe_int(market_data.get("positive", 0)),
+        "neutral": safe_int(market_data.get("neutral", 0)),
+        "negative": safe_int(market_data.get("negative", 0)),
+        "summary": safe_str(market_data.get("summary", "")),
+        "score": safe_int(market_data.get("score", 0)),
+        "label": safe_str(market_data.get("label", "")),
+        "emailReportHtml": safe_str(market_data.get("emailReportHtml", "")),
+    }
+    main.N8NDataExtended(**processed_data)
+    logger.info("✅ 數據驗證通過")
+    stored_data = {
+        **processed_data,
+        "received_time": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "received_timestamp": current_time.isoformat(),
+        "raw_data": market_data,
+        "email_report": "",
+        "data_source": "N8N Webhook",
+        "processing_time": datetime.now().isoformat(),
+        "validation_passed": True
+    }
+    logger.info("✅ 成功處理 N8N 資料:")
+    for key in ('positive', 'neutral', 'negative', 'score', 'label', 'received_time'):
+        logger.info(f"   {key}: {stored_data[key]}")
+    logger.info(f"   摘要長度: {len(stored_data['summary'])} 字元")
+    return {"status": "success", "data": stored_data, "received_at": current_time.isoformat()}
+
+
+def measure(client: TestClient, body: bytes, rounds: int) -> float:
+    """返回每秒處理的報告數"""
+    headers = {'content-type': 'application/json'}
+    client.post("/api/n8n-data", content=body, headers=headers)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        response = client.post("/api/n8n-data", content=body, headers=headers)
+        if response.status_code != 200:
+            print(f"❌ HTTP {response.status_code}: {response.text[:200]}")
+            sys.exit(1)
+    return rounds / (time.perf_counter() - started)
+
+
+def main_benchmark():
+    legacy_client = TestClient(legacy_app)
+    # 不使用 with，避免觸發 lifespan 的背景預熱
+    client = TestClient(main.app)
+
+    print(f"{'report':>6} | {'legacy (req/s)':>14} | {'lean (req/s)':>12} | {'lean no-echo':>12} | {'speedup':>8}")
+    print("-" * 66)
+    for label, size in REPORT_SIZES.items():
+        body = make_report(size)
+        rounds = ROUNDS[label]
+
+        main.CONFIG['INGESTION_CONFIG']['echo_data'] = True
+        legacy = measure(legacy_client, body, rounds)
+        lean = measure(client, body, rounds)
+        main.CONFIG['INGESTION_CONFIG']['echo_data'] = False
+        lean_no_echo = measure(client, body, rounds)
+
+        print(f"{label:>6} | {legacy:>14.1f} | {lean:>12.1f} | {lean_no_echo:>12.1f} | "
+              f"{lean_no_echo / legacy:>7.1f}x")
+
+    latency = main.summarize_latencies(main.ingestion_stats["latencies"])
+    print(f"\n伺服器端接收延遲 (最近 {len(main.ingestion_stats['latencies'])} 筆): "
+          f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,105 @@
+"""
+JSON 序列化效能測試 - 比較 FastAPI 預設流程（jsonable_encoder + 標準庫 json）與 FastJSONResponse（orjson）
+
+原本的流程先以 jsonable_encoder 逐值遞迴轉換整個回應，再交給標準庫 json.dumps；
+FastJSONRoute 讓 dict 回應直接交給 orjson，NumPy 純量與 datetime 不需先手動轉換。
+標準庫流程的輸入為已轉成純 Python 型別的相同內容（即原本手寫 float()/isoformat() 的結果）。
+
+執行方式: python test/benchmark_json.py
+"""
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# main.py 以相對路徑建立日誌檔，需在專案根目錄匯入
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+from main import FastJSONResponse, build_gold_price_payload, to_columnar_payload  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+REPEAT = 20
+
+
+def make_bars(n):
+    """產生帶時區的模擬日線 OHLCV 數據"""
+    rng = np.random.default_rng(42)
+    index = pd.date_range(end=pd.Timestamp.now(tz='America/New_York').floor('D'), periods=n, freq='1D')
+    close = 2000 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, n),
+        'High': close + 2,
+        'Low': close - 2,
+        'Close': close,
+        'Volume': rng.integers(0, 5000, n).astype(float)
+    }, index=index)
+
+
+def make_stored_data(html_size: int):
+    """模擬 N8N 報告的 stored_data（raw_data 與報告 HTML 各一份）"""
+    row = "<tr><td>黃金</td><td>2,345.60</td><td>+0.8%</td><td>市場情緒偏多</td></tr>\n"
+    html = "<html><body><table>\n" + row * (html_size // len(row.encode('utf-8')) + 1) + "</table></body></html>"
+    report = {"positive": 12, "neutral": 5, "negative": 3, "summary": "黃金價格受美元走弱支撐。",
+              "score": 64, "label": "樂觀", "emailReportHtml": html}
+    now = datetime.now()
+    return {
+        "status": "success",
+        "data": {**report, "received_time": now.strftime("%Y-%m-%d %H:%M:%S"), "received_timestamp": now,
+                 "raw_data": report, "email_report": html, "data_source": "N8N Webhook"},
+        "timestamp": now
+    }
+
+
+def best_of(func, *args):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def legacy_render(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_render(content):
+    return FastJSONResponse(content).body
+
+
+def main():
+    payload = build_gold_price_payload(
+        make_bars(5 * 252), {}, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), '5y', '1d', None, 'GC=F'
+    )
+    series = payload.pop('series')
+    scenarios = [
+        ('gold-price 5y rows', payload),
+        ('gold-price 5y columnar', to_columnar_payload(payload, series)),
+        ('stored_data 100KB HTML', make_stored_data(100 * 1024)),
+        ('stored_data 2MB HTML', make_stored_data(2 * 1024 * 1024)),
+    ]
+
+    print(f"{'response':>24} | {'size KB':>8} | {'jsonable_encoder+json (ms)':>26} | {'orjson (ms)':>11} | {'speedup':>8}")
+    print("-" * 90)
+    for label, content in scenarios:
+        # 標準庫流程的輸入: 與原本手動轉換後相同的純 Python 型別
+        plain = json.loads(FastJSONResponse(content).body)
+        legacy = best_of(legacy_render, plain)
+        fast = best_of(fast_render, content)
+        size = len(fast_render(content)) / 1024
+        print(f"{label:>24} | {size:>8.1f} | {legacy * 1000:>26.2f} | {fast * 1000:>11.2f} | {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+RSI 效能測試 - 比較原本的單值 calculate_rsi 與向量化 Wilder calculate_rsi_series
+
+原本的函式每次只返回最後一個 RSI，要畫出 RSI 副圖必須對每根K線各呼叫一次；
+向量化版本一次返回 7/14/21 三個週期的完整序列。
+
+執行方式: python test/benchmark_rsi.py
+"""
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# main.py 以相對路徑建立日誌檔，需在專案根目錄匯入
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+from main import calculate_rsi_series  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+# 5 年小時線（期貨約 23 小時/日 × 252 日）
+BARS = 5 * 252 * 23
+PERIODS = (7, 14, 21)
+# 逐根呼叫的舊版本為 O(n²)，只量測最後這些K線再推算全序列
+LEGACY_SAMPLE = 2_000
+
+
+def legacy_rsi(prices, periods=14):
+    """原本的 calculate_rsi - 最近 periods 期漲跌幅的簡單平均"""
+    if len(prices) < periods + 1:
+        return None
+    prices = np.array(prices, dtype=float)
+    valid_prices = prices[~np.isnan(prices)]
+    if len(valid_prices) < periods + 1:
+        return None
+    deltas = np.diff(valid_prices)
+    up_moves = np.where(deltas > 0, deltas, 0)
+    down_moves = np.where(deltas < 0, -deltas, 0)
+    avg_up = np.mean(up_moves[-periods:])
+    avg_down = np.mean(down_moves[-periods:])
+    if avg_down == 0:
+        return 50.0 if avg_up == 0 else 100.0
+    rsi = 100 - (100 / (1 + avg_up / avg_down))
+    return round(float(max(0, min(100, rsi))), 1)
+
+
+def main():
+    rng = np.random.default_rng(7)
+    prices = 2000 + np.cumsum(rng.normal(0, 1.5, BARS))
+    print(f"📊 數據: {BARS} 根小時K線，RSI 週期 {PERIODS}")
+
+    started = time.perf_counter()
+    legacy_rsi(prices, 14)
+    single_call = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for end in range(BARS - LEGACY_SAMPLE, BARS):
+        for period in PERIODS:
+            legacy_rsi(prices[:end + 1], period)
+    legacy_sample = time.perf_counter() - started
+    legacy_full = legacy_sample * BARS / LEGACY_SAMPLE
+
+    started = time.perf_counter()
+    series = calculate_rsi_series(prices, PERIODS)
+    vectorized = time.perf_counter() - started
+
+    print(f"舊版單次呼叫 (只有最後一個值):       {single_call * 1000:10.3f} ms")
+    print(f"舊版逐根呼叫 {LEGACY_SAMPLE} 根 × {len(PERIODS)} 週期:   {legacy_sample * 1000:10.1f} ms")
+    print(f"舊版逐根呼叫全序列 (推算):           {legacy_full * 1000:10.1f} ms")
+    print(f"向量化完整序列 × {len(PERIODS)} 週期:            {vectorized * 1000:10.3f} ms")
+    print(f"加速倍數 (全序列):                   {legacy_full / vectorized:10.0f}x")
+    print("最新 RSI: " + ", ".join(f"RSI{p}={series[p][-1]:.1f}" for p in PERIODS))
+
+
+if __name__ == "__main__":
+    main()
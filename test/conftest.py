@@ -0,0 +1,27 @@
+"""
+pytest 共用設定 - main.py 以相對路徑讀取 frontend/ 並建立日誌檔，需在專案根目錄匯入；
+數據、快取與日誌寫入暫存目錄，不影響專案的 data/ 與 logs/
+
+執行方式: python -m pytest -q test/test_*.py
+"""
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.mkdtemp(prefix="market_analysis_test_")
+os.environ.setdefault("DATA_DIR", os.path.join(_TMP, "data"))
+os.environ.setdefault("CACHE_DIR", os.path.join(_TMP, "cache"))
+os.environ.setdefault("LOG_FILE", os.path.join(_TMP, "logs", "test.log"))
+
+# tvdatafeed_test.py、yfinance_api.py 等為需要網路或額外套件的手動腳本，不納入自動測試
+collect_ignore = ["tvdatafeed_test.py", "yfinance_api.py", "test_webhook.py"]
+
+import main  # noqa: E402,F401
+
+logging.disable(logging.CRITICAL)
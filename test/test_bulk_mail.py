@@ -0,0 +1,44 @@
+"""批次發送郵件 - 各批次的 webhook 內容與投遞結果"""
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    """以 MockTransport 取代 N8N webhook，記錄收到的請求內容"""
+    received = []
+
+    def handler(request):
+        received.append(json.loads(request.content))
+        return httpx.Response(200, text="ok")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main.outbound_http, '_client', client)
+    monkeypatch.setattr(main, 'stored_data', {
+        'score': 62, 'label': '樂觀', 'summary': '摘要', 'emailReportHtml': '<p>報告</p>', 'mail_config': 'stale'
+    })
+    return received
+
+
+def test_each_batch_gets_full_report_and_own_mail_config(webhook):
+    client = TestClient(main.app)
+    recipients = [f"user{i}@example.com" for i in range(5)] + ["not-an-email"]
+    response = client.post('/api/send-mail-to-n8n/bulk',
+                           json={'recipients': recipients, 'batch_size': 2, 'subject': '週報'})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]['invalid'] == 1
+    assert events[-1]['event'] == 'done' and events[-1]['delivered'] == 5
+
+    assert len(webhook) == 3
+    batches = sorted(payload['mail_config']['recipients'] for payload in webhook)
+    assert batches == [recipients[0:2], recipients[2:4], recipients[4:5]]
+    for payload in webhook:
+        assert payload['score'] == 62 and payload['emailReportHtml'] == '<p>報告</p>'
+        assert payload['mail_config']['subject'] == '週報'
+        assert payload['mail_config']['recipient_email'] == ", ".join(payload['mail_config']['recipients'])
@@ -0,0 +1,90 @@
+"""EventBroadcaster - 慢速訂閱者的背壓與 resync"""
+import asyncio
+
+import orjson
+import pytest
+
+from main import EventBroadcaster, StreamSubscriberLimit
+
+
+def drain(queue):
+    frames = []
+    while not queue.empty():
+        frames.append(queue.get_nowait())
+    return frames
+
+
+def parse(frame):
+    lines = frame.decode().strip().split("\n")
+    fields = dict(line.split(": ", 1) for line in lines)
+    return fields["event"], orjson.loads(fields["data"])
+
+
+async def slow_and_fast():
+    broadcaster = EventBroadcaster(queue_size=4, max_subscribers=10)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    received = []
+    for n in range(10):
+        broadcaster.publish("price", {"n": n})
+        # 快速訂閱者每次都讀取，慢速訂閱者從不讀取
+        received.extend(drain(fast))
+    return broadcaster, slow, received
+
+
+def test_slow_subscriber_is_resynced_without_affecting_others():
+    broadcaster, slow, fast_frames = asyncio.run(slow_and_fast())
+    assert [parse(frame)[1]["n"] for frame in fast_frames] == list(range(10))
+
+    # 溢出時積壓被丟棄，只留 resync（觸發的事件也不排入），之後的事件照常排入
+    events = [parse(frame) for frame in drain(slow)]
+    assert events == [("resync", {"reason": "slow_consumer"}), ("price", {"n": 9})]
+    assert broadcaster.resyncs == 2
+    # 慢速訂閱者收到 0-3、5-7 與 9
+    assert broadcaster.stats()["delivered"] == 10 + 8
+
+
+def test_resync_repeats_while_subscriber_lags():
+    async def scenario():
+        broadcaster = EventBroadcaster(queue_size=2, max_subscribers=10)
+        queue = broadcaster.subscribe()
+        for n in range(7):
+            broadcaster.publish("report", {"n": n})
+        return broadcaster, drain(queue)
+
+    broadcaster, frames = asyncio.run(scenario())
+    # 每次溢出都以單一 resync 取代積壓，佇列不超過上限
+    assert [parse(frame)[0] for frame in frames] == ["resync"]
+    assert broadcaster.resyncs == 3
+    assert broadcaster.last_event["report"] == {"n": 6}
+
+
+def test_frame_is_serialized_once_for_all_subscribers():
+    async def scenario():
+        broadcaster = EventBroadcaster(queue_size=4, max_subscribers=10)
+        queues = [broadcaster.subscribe() for _ in range(3)]
+        broadcaster.publish("price", {"symbol": "GC=F"})
+        return [queue.get_nowait() for queue in queues]
+
+    frames = asyncio.run(scenario())
+    assert all(frame is frames[0] for frame in frames)
+    assert frames[0].startswith(b"event: price\nid: 1\n")
+
+
+def test_subscriber_limit_and_close():
+    async def scenario():
+        broadcaster = EventBroadcaster(queue_size=4, max_subscribers=2)
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        with pytest.raises(StreamSubscriberLimit):
+            broadcaster.subscribe()
+        broadcaster.unsubscribe(second)
+        third = broadcaster.subscribe()
+
+        broadcaster.publish("price", {"n": 1})
+        broadcaster.close()
+        return broadcaster, drain(first), drain(third)
+
+    broadcaster, first, third = asyncio.run(scenario())
+    # 關閉時丟棄未送出的事件，只留結束標記
+    assert first == [None] and third == [None]
+    assert broadcaster.stats()["rejected"] == 1
+    assert broadcaster.stats()["connections"] == 3
@@ -0,0 +1,116 @@
+"""條件式 GET 與回應壓縮的標頭處理"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import etag_matches, negotiate_encoding
+
+ETAG = '"boot-current-5"'
+RECEIVED = datetime(2025, 3, 1, 9, 0)
+
+
+class Clock(datetime):
+    """可推進的 datetime.now()，以模擬兩次請求之間經過的時間"""
+    current = RECEIVED
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.mark.parametrize('if_none_match', [
+    '"boot-current-5"',
+    'W/"boot-current-5"',
+    # 壓縮中介層（例如 nginx gzip、CDN brotli）附加的後綴
+    '"boot-current-5-gzip"',
+    '"boot-current-5-br"',
+    'W/"boot-current-5-gzip"',
+    '"boot-current-4", "boot-current-5"',
+    '*',
+])
+def test_etag_matches(if_none_match):
+    assert etag_matches(if_none_match, ETAG)
+
+
+@pytest.mark.parametrize('if_none_match', [
+    None,
+    '',
+    '"boot-current-4"',
+    '"boot-current-5-deflate"',
+    '"boot-current-55"',
+    '"boot-current-5-gzip-br"',
+])
+def test_etag_does_not_match(if_none_match):
+    assert not etag_matches(if_none_match, ETAG)
+
+
+def test_current_data_revalidation_keeps_age_and_freshness(monkeypatch):
+    monkeypatch.setattr(main, 'datetime', Clock)
+    monkeypatch.setattr(main, 'stored_data', {'score': 58, 'label': '中性',
+                                              'received_timestamp': RECEIVED.isoformat()})
+    monkeypatch.setitem(main.data_versions, 'stored_data', 7)
+    client = TestClient(main.app)
+
+    def advance(minutes):
+        monkeypatch.setattr(Clock, 'current', RECEIVED + timedelta(minutes=minutes))
+        return client.get('/api/current-data/status').json()
+
+    assert advance(30)['data_freshness'] == 'fresh'
+    first = client.get('/api/current-data')
+    assert first.json()['data_freshness'] == 'fresh'
+    etag = first.headers['etag']
+
+    # 同一新鮮度分級內重新驗證返回 304，年齡由不快取的 status 端點提供
+    status = advance(45)
+    assert client.get('/api/current-data', headers={'If-None-Match': etag}).status_code == 304
+    assert status['data_age_minutes'] == pytest.approx(45)
+    assert status['data_freshness'] == 'fresh' and status['report_version'] == 7
+
+    # 跨過 1 小時後分級改變，舊 ETag 不再命中
+    status = advance(90)
+    response = client.get('/api/current-data', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['data_freshness'] == 'stale' and response.headers['etag'] != etag
+    assert status['data_age_minutes'] == pytest.approx(90) and status['data_freshness'] == 'stale'
+    assert 'etag' not in client.get('/api/current-data/status').headers
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('GZIP;Q=0.5', 'gzip'),
+    ('gzip;q=0', None),
+    ('gzip;q=0.0, *;q=1', None),
+    ('*;q=0.1', 'gzip'),
+    ('*;q=0', None),
+    ('identity', None),
+    ('gzip;q=abc', None),
+    ('', None),
+    # 未安裝 brotli 時不選 br
+    ('br', None),
+    ('br;q=1, gzip;q=0.1', 'gzip'),
+])
+def test_negotiate_encoding_without_brotli(monkeypatch, accept_encoding, expected):
+    monkeypatch.setattr(main, 'BROTLI_AVAILABLE', False)
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    # q 值相同時依伺服器偏好
+    ('gzip, br', 'br'),
+    ('gzip;q=0.5, br;q=0.5', 'br'),
+    # 選 q 值最高的格式
+    ('br;q=0.2, gzip;q=0.8', 'gzip'),
+    ('br;q=0.9, gzip;q=0.8', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    # 未列出的格式沿用 * 的 q 值
+    ('deflate, *;q=0.5', 'br'),
+    ('br;q=0.3, *;q=0.6', 'gzip'),
+    ('gzip;q=0.4, *', 'br'),
+    ('*;q=0.5, br;q=0', 'gzip'),
+    ('br;q=0, gzip;q=0', None),
+])
+def test_negotiate_encoding_with_brotli(monkeypatch, accept_encoding, expected):
+    monkeypatch.setattr(main, 'BROTLI_AVAILABLE', True)
+    assert negotiate_encoding(accept_encoding) == expected
@@ -0,0 +1,66 @@
+"""IncrementalIndicatorState - 增量同步的結果須與由完整序列重建一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from main import IncrementalIndicatorState
+
+RSI_PERIODS = (7, 14)
+
+
+def make_closes(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=n, freq='D', tz='America/New_York')
+    close = 2000 + np.cumsum(rng.normal(0, 1, n))
+    close[[50, 51, n - 10]] = np.nan
+    return pd.DataFrame({'Close': close}, index=index)
+
+
+def rebuilt(frame):
+    state = IncrementalIndicatorState(rsi_periods=RSI_PERIODS)
+    state.sync(frame)
+    return state.snapshot()
+
+
+def assert_same(actual, expected):
+    for key in ('count', 'current_price', 'prev_price', 'mean', 'std', 'max', 'min'):
+        assert actual[key] == pytest.approx(expected[key], nan_ok=True), key
+    for window, values in expected['ma'].items():
+        assert actual['ma'][window] == pytest.approx(values), f"ma{window}"
+    assert actual['rsi'] == expected['rsi']
+
+
+def test_incremental_updates_match_rebuild():
+    data = make_closes()
+    state = IncrementalIndicatorState(rsi_periods=RSI_PERIODS)
+    for end in range(300, len(data)):
+        frame = data.iloc[:end].copy()
+        # 最後一根K線盤中修正
+        frame.iloc[-1, 0] += 0.5
+        state.sync(frame)
+        assert_same(state.snapshot(), rebuilt(frame))
+
+    assert state.rebuilds == 1
+    assert state.incremental_updates == len(data) - 301
+
+
+def test_window_slide_rebuilds_consistently():
+    data = make_closes()
+    state = IncrementalIndicatorState(rsi_periods=RSI_PERIODS)
+    state.sync(data.iloc[:300])
+    state.sync(data.iloc[10:310])
+
+    assert state.rebuilds == 2
+    assert_same(state.snapshot(), rebuilt(data.iloc[10:310]))
+
+
+def test_revised_history_rebuilds():
+    data = make_closes()
+    state = IncrementalIndicatorState(rsi_periods=RSI_PERIODS)
+    state.sync(data.iloc[:300])
+    # 中間插入一根K線：最後一根的列位置改變
+    revised = pd.concat([data.iloc[:100], data.iloc[100:101].shift(1, freq='h'), data.iloc[100:301]]).sort_index()
+    state.sync(revised)
+
+    assert state.rebuilds == 2
+    assert_same(state.snapshot(), rebuilt(revised))
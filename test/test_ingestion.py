@@ -0,0 +1,55 @@
+"""/api/n8n-data - 解析、驗證與失敗統計"""
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+REPORT = {"score": 58, "label": "中性", "summary": "摘要", "emailReportHtml": "<p>" + "x" * 100000 + "</p>"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.event_broadcaster, 'publish', lambda *args, **kwargs: None)
+    # 測試結束後還原目前的報告與版本
+    monkeypatch.setattr(main, 'stored_data', main.stored_data)
+    monkeypatch.setitem(main.data_versions, 'stored_data', main.data_versions['stored_data'])
+    return TestClient(main.app)
+
+
+def rejected():
+    return main.ingestion_stats["rejected"]
+
+
+def test_accepts_list_and_object_payloads(client):
+    response = client.post('/api/n8n-data', content=orjson.dumps([REPORT]),
+                           headers={'content-type': 'application/json'})
+    assert response.status_code == 200
+    assert main.stored_data['score'] == 58
+    assert main.stored_data['emailReportHtml'] == REPORT['emailReportHtml']
+    assert response.json()['data']['report_id'] == main.stored_data['report_id']
+
+    assert client.post('/api/n8n-data', json={**REPORT, "score": 61}).status_code == 200
+    assert main.stored_data['score'] == 61
+
+
+@pytest.mark.parametrize('body', [b'{"score": ', b'"just a string"', b'[1, 2]', b'{"score": 150}'])
+def test_invalid_payloads_are_rejected(client, body):
+    before = rejected()
+    response = client.post('/api/n8n-data', content=body, headers={'content-type': 'application/json'})
+    assert response.status_code == 400
+    assert rejected() == before + 1
+
+
+def test_unexpected_failure_counts_as_rejected(client, monkeypatch):
+    async def backend_down(report):
+        raise ConnectionError("state backend unavailable")
+
+    monkeypatch.setattr(main.shared_state, 'publish_report', backend_down)
+    previous = main.stored_data
+    before = rejected()
+    response = client.post('/api/n8n-data', json=REPORT)
+    assert response.status_code == 500
+    assert rejected() == before + 1
+    # 報告未保存成功時不切換目前的報告
+    assert main.stored_data is previous
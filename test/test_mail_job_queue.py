@@ -0,0 +1,80 @@
+"""MailJobQueue - 多個 worker 共用佇列時的取件互斥與 sending 租約"""
+import threading
+import time
+
+import pytest
+
+from main import MailJobQueue
+
+
+def make_queue(db_path, sending_lease=300):
+    return MailJobQueue(db_path, concurrency=1, max_attempts=3, retry_base=1, retry_max=10,
+                        max_pending=1000, poll_interval=1, sending_lease=sending_lease)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "mail_jobs.db"
+
+
+def test_claim_is_exclusive_across_workers(db_path):
+    job_ids = {make_queue(db_path)._enqueue({"n": i}, f"u{i}@example.com") for i in range(50)}
+    # 每個 worker 各自的連線，模擬多個行程共用同一個資料庫
+    workers = [make_queue(db_path) for _ in range(4)]
+    claimed = [[] for _ in workers]
+
+    def drain(queue, out):
+        while True:
+            job = queue._claim()
+            if job is None:
+                if queue._counts().get('queued', 0) == 0:
+                    return
+                continue
+            out.append(job['id'])
+
+    threads = [threading.Thread(target=drain, args=(queue, out)) for queue, out in zip(workers, claimed)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    all_claimed = [job_id for out in claimed for job_id in out]
+    assert len(all_claimed) == len(set(all_claimed))
+    assert set(all_claimed) == job_ids
+
+
+def test_recover_only_requeues_expired_leases(db_path):
+    queue = make_queue(db_path, sending_lease=60)
+    queue._enqueue({"n": 1}, "a@example.com")
+    queue._enqueue({"n": 2}, "b@example.com")
+    stale = queue._claim()
+    active = queue._claim()
+    conn = queue._connect()
+    conn.execute("UPDATE mail_jobs SET claimed_at = ? WHERE id = ?", (time.time() - 120, stale['id']))
+    conn.commit()
+
+    # 另一個 worker 啟動時只接手租約已過期的工作
+    restarted = make_queue(db_path, sending_lease=60)
+    assert restarted._recover() == 1
+    assert restarted._get(stale['id'])['status'] == 'retrying'
+    assert restarted._get(active['id'])['status'] == 'sending'
+    assert restarted._claim()['id'] == stale['id']
+
+
+def test_legacy_database_gains_lease_column(db_path):
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE mail_jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, recipient TEXT, payload TEXT NOT NULL, "
+        "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, created_at TEXT NOT NULL, "
+        "updated_at TEXT NOT NULL, delivered_at TEXT, last_error TEXT, response_status INTEGER, response_text TEXT)"
+    )
+    conn.execute("INSERT INTO mail_jobs (id, status, payload, next_attempt_at, created_at, updated_at) "
+                 "VALUES ('old', 'sending', '{}', 0, 't', 't')")
+    conn.commit()
+    conn.close()
+
+    queue = make_queue(db_path)
+    assert queue._recover() == 1
+    assert queue._get('old')['status'] == 'retrying'
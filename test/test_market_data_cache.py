@@ -0,0 +1,112 @@
+"""MarketDataCache - 並發未命中只觸發一次下載、TTL 到期後重新載入，以及命中統計"""
+import asyncio
+import time
+
+import pytest
+
+from main import MarketDataCache
+
+
+class CountingLoader:
+    """記錄呼叫次數的 loader，delay 期間讓其他請求有機會同時到達"""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return {"call": self.calls}
+
+
+def test_concurrent_misses_share_one_download():
+    cache = MarketDataCache(ttl=60)
+    loader = CountingLoader()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load(("GC=F", "1y", "1d"), loader) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert loader.calls == 1
+    assert all(result is results[0] for result in results)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["inflight"]) == (1, 9, 0, 0)
+
+
+def test_hits_until_ttl_expires():
+    cache = MarketDataCache(ttl=0.1)
+    loader = CountingLoader(delay=0)
+    key = ("GC=F", "1y", "1d")
+
+    async def scenario():
+        first = await cache.get_or_load(key, loader)
+        again = await cache.get_or_load(key, loader)
+        await asyncio.sleep(0.15)
+        expired = await cache.get_or_load(key, loader)
+        return first, again, expired
+
+    first, again, expired = asyncio.run(scenario())
+    assert again is first
+    assert expired == {"call": 2}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_ratio"] == pytest.approx(1 / 3, abs=1e-4)
+
+
+def test_per_call_ttl_and_force():
+    cache = MarketDataCache(ttl=0.05)
+    loader = CountingLoader(delay=0)
+    key = ("GC=F", "info", None)
+
+    async def scenario():
+        await cache.get_or_load(key, loader, ttl=60)
+        await asyncio.sleep(0.1)
+        # 個別 TTL 較長，尚未過期
+        cached = await cache.get_or_load(key, loader, ttl=60)
+        forced = await cache.get_or_load(key, loader, ttl=60, force=True)
+        return cached, forced
+
+    cached, forced = asyncio.run(scenario())
+    assert cached == {"call": 1}
+    assert forced == {"call": 2}
+
+
+def test_failed_load_is_shared_and_not_cached():
+    cache = MarketDataCache(ttl=60)
+    failing = CountingLoader(fail=True)
+    key = ("GC=F", "1y", "1d")
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_load(key, failing) for _ in range(3)),
+                                       return_exceptions=True)
+        # 失敗不寫入快取，下一次請求重新下載
+        recovered = await cache.get_or_load(key, CountingLoader(delay=0))
+        return results, recovered
+
+    results, recovered = asyncio.run(scenario())
+    assert failing.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert recovered == {"call": 1}
+    assert cache.stats()["errors"] == 1
+
+
+def test_cancelled_waiter_does_not_cancel_shared_download():
+    cache = MarketDataCache(ttl=60)
+    loader = CountingLoader(delay=0.1)
+    key = ("GC=F", "1y", "1d")
+
+    async def scenario():
+        impatient = asyncio.ensure_future(cache.get_or_load(key, loader))
+        patient = asyncio.ensure_future(cache.get_or_load(key, loader))
+        await asyncio.sleep(0.02)
+        impatient.cancel()
+        return await patient
+
+    started = time.monotonic()
+    assert asyncio.run(scenario()) == {"call": 1}
+    assert loader.calls == 1
+    assert time.monotonic() - started >= 0.1
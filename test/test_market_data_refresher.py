@@ -0,0 +1,81 @@
+"""MarketDataRefresher - 未追蹤組合的快照過期與 LRU 上限"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from main import MarketDataRefresher
+
+
+def make_history(seed):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=300, freq='D', tz='America/New_York')
+    close = 2000 + np.cumsum(rng.normal(0, 5, len(index)))
+    return pd.DataFrame({
+        'Open': close, 'High': close + 3, 'Low': close - 3, 'Close': close, 'Volume': 0.0
+    }, index=index)
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """以合成K線取代上游下載，記錄每個組合的下載次數"""
+    calls = {}
+
+    async def fake_download(period, interval, symbol=main.DEFAULT_SYMBOL, force=False):
+        key = (symbol, period, interval)
+        calls[key] = calls.get(key, 0) + 1
+        return make_history(calls[key]), {}, None, '2024-10-26 05:00'
+
+    monkeypatch.setattr(main, 'get_gold_futures_data_enhanced', fake_download)
+    monkeypatch.setattr(main.event_broadcaster, 'publish', lambda *args, **kwargs: None)
+    return calls
+
+
+async def while_running(refresher, scenario):
+    # 以閒置的任務代表背景排程正在運行，不實際啟動刷新循環
+    refresher._task = asyncio.create_task(asyncio.sleep(3600))
+    try:
+        return await scenario()
+    finally:
+        refresher._task.cancel()
+
+
+def test_untracked_snapshot_expires_while_refresher_runs(downloads, monkeypatch):
+    monkeypatch.setattr(main.market_data_cache, 'ttl', 60)
+    refresher = MarketDataRefresher(['GC=F'], [('1y', '1d')], interval_seconds=60, concurrency=1)
+
+    async def scenario():
+        tracked = await refresher.refresh('GC=F', '1y', '1d')
+        on_demand = await refresher.refresh('SI=F', '1y', '1d')
+        for snapshot in (tracked, on_demand):
+            snapshot['refreshed_at'] -= 120
+        return (refresher.get_snapshot('GC=F', '1y', '1d'), refresher.get_snapshot('SI=F', '1y', '1d'),
+                refresher.get_snapshot('GC=F', '6mo', '1d'))
+
+    tracked, on_demand, untracked_period = asyncio.run(while_running(refresher, scenario))
+    # 追蹤中的組合由排程刷新，不因 TTL 失效；其他商品與 period 超過 TTL 後須重新計算
+    assert tracked is not None
+    assert on_demand is None
+    assert untracked_period is None
+    assert refresher.refreshed_by_schedule('GC=F', '1y', '1d') is False
+
+
+def test_on_demand_snapshots_are_bounded_lru(downloads):
+    refresher = MarketDataRefresher(['GC=F'], [('1y', '1d')], interval_seconds=60, concurrency=1,
+                                    max_on_demand=2)
+
+    async def scenario():
+        await refresher.refresh('GC=F', '1y', '1d')
+        await refresher.refresh('SI=F', '1y', '1d')
+        await refresher.refresh('SI=F', '6mo', '1d')
+        # 讀取使 SI=F 1y 成為最近使用
+        assert refresher.get_snapshot('SI=F', '1y', '1d') is not None
+        await refresher.refresh('SI=F', '3mo', '1d')
+
+    asyncio.run(scenario())
+    assert set(refresher._snapshots) == {('GC=F', '1y', '1d'), ('SI=F', '1y', '1d'), ('SI=F', '3mo', '1d')}
+    assert set(refresher._indicator_states) == set(refresher._snapshots)
+    assert refresher.evictions == 1
+    assert refresher.stats()['evictions'] == 1
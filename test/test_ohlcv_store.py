@@ -0,0 +1,154 @@
+"""OHLCVStore - 寫入、追加、壓縮後重新載入的欄位須保持對齊"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from main import OHLCVStore
+
+
+def make_bars(start, periods, freq='1h', seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=periods, freq=freq, tz='America/New_York')
+    close = 2000 + np.cumsum(rng.normal(0, 1, periods))
+    return pd.DataFrame({
+        'Open': close - 0.5, 'High': close + 1.0, 'Low': close - 1.0, 'Close': close,
+        'Volume': np.arange(periods, dtype=float),
+    }, index=index)
+
+
+def assert_frame_equal(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    for column in OHLCVStore.COLUMNS:
+        np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy())
+
+
+def test_append_overwrites_overlapping_tail(tmp_path):
+    store = OHLCVStore(tmp_path)
+    bars = make_bars('2024-01-01', 100)
+    store.upsert('GC=F', '1h', bars.iloc[:60])
+
+    revised = bars.iloc[55:].copy()
+    revised.loc[revised.index[0], 'Close'] += 10
+    store.upsert('GC=F', '1h', revised)
+
+    expected = pd.concat([bars.iloc[:55], revised])
+    assert_frame_equal(OHLCVStore(tmp_path).load('GC=F', '1h'), expected)
+
+
+def test_compaction_round_trip(tmp_path):
+    store = OHLCVStore(tmp_path)
+    bars = make_bars('2024-01-01', 24 * 20)
+    store.upsert('GC=F', '1h', bars.iloc[:24 * 10])
+    # 保留 2 天 × RETENTION_FACTOR，超過的舊數據被壓縮
+    tail = bars.iloc[24 * 10 - 5:24 * 10 + 5]
+    store.upsert('GC=F', '1h', tail, retention_days=2)
+    assert store.compactions == 1
+
+    path = store._path('GC=F', '1h')
+    meta = store._read_meta(path)
+    assert meta['generation'] == 1
+    # 舊世代的欄位檔已刪除
+    assert sorted(f.name for f in path.glob('*.bin')) == sorted(
+        f"{name}.g1.bin" for name in ('timestamp',) + OHLCVStore.COLUMNS
+    )
+
+    loaded = OHLCVStore(tmp_path).load('GC=F', '1h')
+    cutoff = tail.index[-1] - pd.Timedelta(days=2 * OHLCVStore.RETENTION_FACTOR)
+    assert_frame_equal(loaded, bars[(bars.index >= cutoff) & (bars.index <= tail.index[-1])])
+
+    # 壓縮後繼續追加
+    more = make_bars(tail.index[-1] + pd.Timedelta(hours=1), 10, seed=1)
+    store.upsert('GC=F', '1h', more)
+    assert_frame_equal(OHLCVStore(tmp_path).load('GC=F', '1h'), pd.concat([loaded, more]))
+
+
+def test_interrupted_compaction_keeps_previous_generation(tmp_path):
+    store = OHLCVStore(tmp_path)
+    bars = make_bars('2024-01-01', 200)
+    store.upsert('GC=F', '1h', bars)
+
+    # 模擬壓縮寫到一半中斷：下一代的部分欄位檔已存在，但 meta.json 尚未切換
+    path = store._path('GC=F', '1h')
+    np.zeros(3, dtype='<i8').tofile(store._column_file(path, 'timestamp', 1))
+    np.zeros(3, dtype='<f8').tofile(store._column_file(path, 'Open', 1))
+
+    assert_frame_equal(OHLCVStore(tmp_path).load('GC=F', '1h'), bars)
+
+
+def test_sync_falls_back_to_full_fetch(tmp_path):
+    store = OHLCVStore(tmp_path)
+    bars = make_bars(pd.Timestamp.now().normalize() - pd.Timedelta(days=5), 24 * 3)
+    store.upsert('GC=F', '1h', bars)
+    start_date = bars.index[0].tz_localize(None).to_pydatetime()
+    full = make_bars(bars.index[0], 24 * 5, seed=2)
+    calls = []
+
+    def fetch(start):
+        calls.append(start)
+        if len(calls) == 1:
+            raise ConnectionError("upstream down")
+        return full
+
+    result = store.sync('GC=F', '1h', start_date, fetch)
+    assert calls == [bars.index[-1].strftime('%Y-%m-%d'), start_date.strftime('%Y-%m-%d')]
+    assert store.full_fallbacks == 1
+    assert_frame_equal(result, full)
+
+
+def test_sync_batch_refetches_when_history_is_too_old(tmp_path):
+    store = OHLCVStore(tmp_path)
+    # 最後一筆早於 5m 的上游回溯範圍，增量下載無法補齊缺口
+    old = make_bars(pd.Timestamp.now().normalize() - pd.Timedelta(days=90), 50, freq='5min')
+    store.upsert('GC=F', '5m', old)
+    start_date = old.index[0].tz_localize(None).to_pydatetime()
+    calls = []
+
+    def fetch(symbols, start):
+        calls.append((tuple(symbols), start))
+        return {}
+
+    store.sync_batch(['GC=F'], '5m', start_date, fetch)
+    assert calls == [(('GC=F',), start_date.strftime('%Y-%m-%d'))]
+    assert store.full_fallbacks == 1
+
+
+@pytest.mark.parametrize('retention_days', [None, 1])
+def test_reload_matches_after_many_upserts(tmp_path, retention_days):
+    store = OHLCVStore(tmp_path)
+    bars = make_bars('2024-01-01', 24 * 6)
+    for end in range(24, len(bars) + 1, 24):
+        store.upsert('GC=F', '1h', bars.iloc[max(0, end - 30):end], retention_days=retention_days)
+
+    loaded = OHLCVStore(tmp_path).load('GC=F', '1h')
+    expected = bars
+    if retention_days:
+        assert store.compactions > 0
+        expected = bars.loc[loaded.index[0]:]
+        assert loaded.index[0] >= bars.index[-1] - pd.Timedelta(days=retention_days * OHLCVStore.RETENTION_FACTOR + 1)
+    assert_frame_equal(loaded, expected)
+
+
+def _upsert_worker(root, seed):
+    store = OHLCVStore(root)
+    bars = make_bars('2024-01-01', 24 * 10)
+    rng = np.random.default_rng(seed)
+    for _ in range(40):
+        end = int(rng.integers(24, len(bars) + 1))
+        store.upsert('GC=F', '1h', bars.iloc[max(0, end - 48):end], retention_days=int(rng.integers(1, 4)))
+
+
+def test_concurrent_processes_keep_columns_aligned(tmp_path):
+    import multiprocessing
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_upsert_worker, args=(str(tmp_path), seed)) for seed in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    loaded = OHLCVStore(tmp_path).load('GC=F', '1h')
+    assert loaded.index.is_monotonic_increasing and loaded.index.is_unique
+    bars = make_bars('2024-01-01', 24 * 10)
+    assert_frame_equal(loaded, bars.loc[loaded.index])
@@ -0,0 +1,85 @@
+"""PageCache - 檔案修改時間變更時重新載入頁面"""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import PageCache
+
+
+def write_page(path, html, mtime):
+    path.write_text(html, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def page(tmp_path):
+    path = tmp_path / "index.html"
+    write_page(path, "<h1>v1</h1>", 1_700_000_000)
+    return path
+
+
+def serve(monkeypatch, cache):
+    monkeypatch.setattr(main, 'page_cache', cache)
+    return TestClient(main.app)
+
+
+def test_watch_reloads_when_mtime_changes(page, monkeypatch):
+    cache = PageCache({"home": page}, watch=True)
+    client = serve(monkeypatch, cache)
+
+    first = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert first.text == "<h1>v1</h1>"
+    assert client.get('/').text == "<h1>v1</h1>"
+    assert cache.reloads == 1
+
+    write_page(page, "<h1>v2</h1>", 1_700_000_060)
+    second = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert second.text == "<h1>v2</h1>"
+    assert second.headers['etag'] != first.headers['etag']
+    assert second.headers['last-modified'] != first.headers['last-modified']
+    assert cache.reloads == 2
+    # 舊 ETag 不再返回 304
+    assert client.get('/', headers={'If-None-Match': first.headers['etag']}).status_code == 200
+
+
+def test_same_mtime_is_served_from_memory(page, monkeypatch):
+    cache = PageCache({"home": page}, watch=True)
+    client = serve(monkeypatch, cache)
+    client.get('/')
+    # 內容改變但修改時間相同時不重新讀取
+    write_page(page, "<h1>v9</h1>", 1_700_000_000)
+    assert client.get('/').text == "<h1>v1</h1>"
+    assert cache.reloads == 1 and cache.misses == 1
+
+
+def test_without_watch_keeps_loaded_page(page, monkeypatch):
+    cache = PageCache({"home": page}, watch=False)
+    assert cache.load_all() == 1
+    client = serve(monkeypatch, cache)
+    write_page(page, "<h1>v2</h1>", 1_700_000_060)
+    assert client.get('/').text == "<h1>v1</h1>"
+    assert cache.misses == 0
+
+
+def test_deleted_page_returns_404(page, monkeypatch):
+    cache = PageCache({"home": page}, watch=True)
+    client = serve(monkeypatch, cache)
+    assert client.get('/').status_code == 200
+    page.unlink()
+    assert client.get('/').status_code == 404
+    assert "home" not in cache.stats()["pages"]
+
+
+def test_revalidation_and_compressed_variant(page, monkeypatch):
+    cache = PageCache({"home": page}, watch=True)
+    client = serve(monkeypatch, cache)
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['etag'].endswith('-gzip"')
+    assert response.text == "<h1>v1</h1>"
+
+    assert client.get('/', headers={'If-None-Match': response.headers['etag']}).status_code == 304
+    assert client.get('/', headers={'If-Modified-Since': response.headers['last-modified']}).status_code == 304
+    assert cache.not_modified == 2
@@ -0,0 +1,103 @@
+"""多商品報價 - 批次下載、/api/quote/{symbol} 與 /api/quotes"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+def fake_bars(symbol, start, end, freq):
+    index = pd.date_range(start, end, freq=freq, tz='UTC', inclusive='left')
+    base = 100 + sum(map(ord, symbol)) % 50
+    close = base + np.sin(np.arange(len(index)) / 10)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1.0},
+                        index=index)
+
+
+class FakeDownload:
+    """yf.download 的替身 - 以 group_by='ticker' 的 MultiIndex 欄位返回各商品K線，並記錄每次下載的商品"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbols, **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.calls.append((tuple(symbols), kwargs.get('interval')))
+        if kwargs.get('period') == '2d':
+            end = pd.Timestamp.now(tz='UTC').floor('min')
+            start, freq = end - pd.Timedelta(hours=2), '1min'
+        else:
+            start, end, freq = kwargs['start'], kwargs['end'], '1D'
+        frames = {symbol: fake_bars(symbol, start, end, freq) for symbol in symbols}
+        return pd.concat(frames, axis=1)
+
+    def history_calls(self):
+        return [symbols for symbols, interval in self.calls if interval != '1m']
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    download = FakeDownload()
+    monkeypatch.setattr(main.yf, 'download', download)
+    monkeypatch.setattr(main.yf, 'Ticker', lambda symbol: type('Ticker', (), {'info': {'shortName': symbol}})())
+    # 每個測試使用空的快取、快照與K線儲存，避免互相影響
+    monkeypatch.setattr(main, 'ohlcv_store', None)
+    monkeypatch.setattr(main, 'market_data_cache', main.MarketDataCache(60))
+    monkeypatch.setattr(main, 'market_data_refresher', main.MarketDataRefresher(
+        ['GC=F'], [('1y', '1d')], interval_seconds=60, concurrency=1
+    ))
+    monkeypatch.setattr(main.event_broadcaster, 'publish', lambda *args, **kwargs: None)
+    return download
+
+
+def test_download_bars_splits_batch_per_symbol(upstream):
+    frames = main.download_bars(['GC=F', '^TNX'], start='2024-01-01', end='2024-02-01', interval='1d')
+    assert list(frames) == ['GC=F', '^TNX']
+    assert upstream.calls == [(('GC=F', '^TNX'), '1d')]
+    # 依登錄的交易所時區轉換
+    assert str(frames['GC=F'].index.tz) == 'America/New_York'
+    assert str(frames['^TNX'].index.tz) == 'America/Chicago'
+    assert list(frames['GC=F'].columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def test_load_batch_downloads_history_once(upstream):
+    results = asyncio.run(main.load_market_data_batch(['GC=F', 'SI=F', 'DX-Y.NYB'], '1y', '1d'))
+    assert set(results) == {'GC=F', 'SI=F', 'DX-Y.NYB'}
+    assert upstream.history_calls() == [('GC=F', 'SI=F', 'DX-Y.NYB')]
+    hist_data, info, current_price, _ = results['SI=F']
+    assert info == {'shortName': 'SI=F'}
+    assert current_price == hist_data['Close'].iloc[-1]
+
+
+def test_quotes_endpoint_batches_untracked_symbols(upstream):
+    client = TestClient(main.app)
+    response = client.get('/api/quotes', params={'symbols': 'silver,dxy,SI=F', 'period': '6mo'})
+    assert response.status_code == 200
+    body = response.json()
+    assert list(body['quotes']) == ['SI=F', 'DX-Y.NYB']
+    assert body['errors'] == {}
+    assert body['quotes']['DX-Y.NYB']['unit'] == 'index'
+    assert upstream.history_calls() == [('SI=F', 'DX-Y.NYB')]
+
+    # 快照仍在 TTL 內，不再下載
+    client.get('/api/quotes', params={'symbols': 'silver,dxy', 'period': '6mo'})
+    assert len(upstream.history_calls()) == 1
+
+
+def test_quote_endpoint_resolves_alias_and_validates(upstream):
+    client = TestClient(main.app)
+    response = client.get('/api/quote/xag', params={'period': '6mo'})
+    assert response.status_code == 200
+    assert response.json()['data']['symbol'] == 'SI=F'
+
+    etag = response.headers['etag']
+    assert client.get('/api/quote/silver', params={'period': '6mo'},
+                      headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.get('/api/quote/unknown').status_code == 404
+    assert client.get('/api/quotes', params={'symbols': 'gold,unknown'}).status_code == 404
+    assert client.get('/api/quote/gold', params={'period': '7y'}).status_code == 400
+    assert client.get('/api/quote/gold', params={'format': 'xml'}).status_code == 400
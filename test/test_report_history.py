@@ -0,0 +1,100 @@
+"""/api/reports - 時間範圍、標籤篩選與 keyset 分頁游標的邊界"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+BASE = datetime(2025, 3, 1, 9, 0)
+
+
+def report_at(received, label, score=50):
+    return {
+        "received_time": received.strftime("%Y-%m-%d %H:%M:%S"),
+        "received_timestamp": received.isoformat(),
+        "score": score, "label": label, "positive": 1, "neutral": 1, "negative": 1,
+        "summary": f"{label} {received:%m-%d %H:%M}", "data_source": "test",
+        "emailReportHtml": "<p>x</p>", "email_report": "", "raw_data": {"score": score},
+    }
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    store = main.ReportHistoryStore(tmp_path / "reports.db")
+    labels = ["樂觀", "中性", "悲觀"]
+    ids = {}
+    for day in range(6):
+        for slot in range(2):
+            # 每天兩份報告的時間相同，分頁須以 id 區分先後
+            received = BASE + timedelta(days=day)
+            report_id = asyncio.run(store.add(report_at(received, labels[(day + slot) % 3], score=day * 10 + slot)))
+            ids[report_id] = (received, labels[(day + slot) % 3])
+    monkeypatch.setattr(main, 'report_history', store)
+    return ids
+
+
+def fetch_all(client, **params):
+    """依 next_cursor 取完所有頁，返回每頁的報告 id"""
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({'cursor': cursor} if cursor else {}))
+        body = client.get('/api/reports', params=query).json()
+        pages.append([report['id'] for report in body['reports']])
+        cursor = body['next_cursor']
+        assert body['has_more'] is (cursor is not None)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_all_reports_once_in_order(history):
+    client = TestClient(main.app)
+    pages = fetch_all(client, limit=5)
+    ids = [report_id for page in pages for report_id in page]
+    # 新到舊；同時間的報告以 id 由大到小
+    expected = sorted(history, key=lambda report_id: (history[report_id][0], report_id), reverse=True)
+    assert ids == expected
+    assert [len(page) for page in pages] == [5, 5, 2]
+
+
+def test_exact_page_size_has_no_extra_page(history):
+    client = TestClient(main.app)
+    assert [len(page) for page in fetch_all(client, limit=6)] == [6, 6]
+    # 游標落在同時間的兩份報告之間
+    assert [len(page) for page in fetch_all(client, limit=3)] == [3, 3, 3, 3]
+
+
+def test_date_range_and_label_filters(history):
+    client = TestClient(main.app)
+    # to 只有日期時包含當天整天
+    body = client.get('/api/reports', params={'from': '2025-03-02', 'to': '2025-03-03', 'limit': 50}).json()
+    days = {history[report['id']][0].date().isoformat() for report in body['reports']}
+    assert days == {'2025-03-02', '2025-03-03'} and body['count'] == 4
+
+    pages = fetch_all(client, label='悲觀', limit=1)
+    ids = [report_id for page in pages for report_id in page]
+    assert ids and all(history[report_id][1] == '悲觀' for report_id in ids)
+    assert len(ids) == sum(1 for _, label in history.values() if label == '悲觀')
+
+    assert client.get('/api/reports', params={'to': '2025-02-28'}).json()['count'] == 0
+
+
+def test_invalid_parameters(history):
+    client = TestClient(main.app)
+    assert client.get('/api/reports', params={'cursor': 'abc'}).status_code == 400
+    assert client.get('/api/reports', params={'cursor': '1.5_x'}).status_code == 400
+    assert client.get('/api/reports', params={'from': '03/01/2025'}).status_code == 400
+    # limit 限制在 1 到 REPORT_PAGE_MAX 之間
+    assert client.get('/api/reports', params={'limit': 0}).json()['count'] == 1
+    max_page = main.CONFIG['REPORT_HISTORY_CONFIG']['max_page_size']
+    assert client.get('/api/reports', params={'limit': max_page + 100}).json()['count'] == min(12, max_page)
+
+
+def test_report_detail(history):
+    client = TestClient(main.app)
+    report_id = next(iter(history))
+    report = client.get(f'/api/reports/{report_id}').json()['report']
+    assert report['emailReportHtml'] == '<p>x</p>'
+    assert report['raw_data'] == {'score': report['score']}
+    assert client.get('/api/reports/999999').status_code == 404
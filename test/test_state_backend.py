@@ -0,0 +1,109 @@
+"""共享狀態 - SQLite 後端的鎖與計數器、快取值的資料序列化（不使用 pickle）"""
+import threading
+import time
+
+import numpy as np
+import orjson
+import pandas as pd
+import pytest
+
+from main import SQLiteStateBackend, dumps_shared_entry, loads_shared_entry
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "state.db"
+
+
+def test_sqlite_add_is_exclusive_across_connections(db_path):
+    # 每個 worker 各自的連線，模擬多個行程同時搶同一個下載鎖
+    backends = [SQLiteStateBackend(db_path) for _ in range(8)]
+    barrier = threading.Barrier(len(backends))
+    results = []
+
+    def acquire(backend):
+        barrier.wait()
+        results.append(backend.add("lock:market", b"1", 30))
+
+    threads = [threading.Thread(target=acquire, args=(backend,)) for backend in backends]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert sorted(results) == [False] * 7 + [True]
+    assert backends[0].get("lock:market") == b"1"
+
+
+def test_sqlite_add_replaces_expired_value(db_path):
+    backend = SQLiteStateBackend(db_path)
+    assert backend.add("lock", b"a", 0.05)
+    assert not backend.add("lock", b"b", 0.05)
+    time.sleep(0.1)
+    assert backend.get("lock") is None
+    assert backend.add("lock", b"c", 30)
+    assert backend.get("lock") == b"c"
+    backend.delete("lock")
+    assert backend.add("lock", b"d")
+
+
+def test_sqlite_incr_aggregates_across_connections(db_path):
+    backends = [SQLiteStateBackend(db_path) for _ in range(4)]
+
+    def bump(backend):
+        for _ in range(50):
+            backend.incr({"api_calls": 1, "errors": 2})
+
+    threads = [threading.Thread(target=bump, args=(backend,)) for backend in backends]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    # 增量為 0 時只讀取目前的合計，未出現過的名稱從 0 開始
+    assert backends[0].incr({"api_calls": 0, "errors": 0, "report_version": 0}) == {
+        "api_calls": 200, "errors": 400, "report_version": 0
+    }
+    assert SQLiteStateBackend(db_path).incr({"report_version": 1}) == {"report_version": 1}
+
+
+def make_frame():
+    index = pd.date_range('2024-01-01', periods=5, freq='1h', tz='America/New_York', name='Datetime')
+    return pd.DataFrame({
+        'Open': [1.0, 2.0, np.nan, 4.0, 5.0],
+        'Close': np.arange(5, dtype=float),
+        'Volume': np.arange(5, dtype=np.int64),
+    }, index=index)
+
+
+def test_market_data_round_trip():
+    frame = make_frame()
+    value = {'GC=F': (frame, {'shortName': 'Gold', 'regularMarketPrice': 2000.5}, np.float64(4.0), '2024-01-01 05:00')}
+
+    stored_at, decoded = loads_shared_entry(dumps_shared_entry(123.0, value))
+    assert stored_at == 123.0
+    hist_data, info, current_price, processing_time = decoded['GC=F']
+    pd.testing.assert_frame_equal(hist_data, frame, check_freq=False)
+    assert info == value['GC=F'][1]
+    assert current_price == 4.0
+    assert processing_time == '2024-01-01 05:00'
+
+
+def test_naive_index_round_trip():
+    frame = make_frame().tz_localize(None)
+    _, decoded = loads_shared_entry(dumps_shared_entry(0.0, frame))
+    pd.testing.assert_frame_equal(decoded, frame, check_freq=False)
+
+
+def test_rejects_non_data_values():
+    with pytest.raises(TypeError):
+        dumps_shared_entry(0.0, pd.DataFrame({'name': ['x']}, index=pd.DatetimeIndex(['2024-01-01'])))
+    with pytest.raises(TypeError):
+        dumps_shared_entry(0.0, object())
+
+    # 讀取端只接受數值欄位
+    raw = dumps_shared_entry(0.0, make_frame())
+    entry = orjson.loads(raw)
+    entry['value']['__frame__']['dtypes'][0] = '|O'
+    with pytest.raises(ValueError):
+        loads_shared_entry(orjson.dumps(entry))